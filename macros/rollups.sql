@@ -0,0 +1,75 @@
+{% macro money(column) -%}
+    {#- monetary cell as a number: empty and NaN cells of the workbook count as 0 -#}
+    coalesce(nullif(({{ column }})::numeric, 'NaN'), 0)
+{%- endmacro %}
+
+{% macro changed_groups_only(relation_alias, key_columns, group_column) -%}
+    {#-
+        On incremental runs keep every rollup row of the groups (group_column values,
+        the unique_key) holding a row that is new, whose row_hash differs from the stored
+        one, or that is stored but no longer produced, so delete+insert rewrites those
+        groups whole and drops their vanished rows. Groups gone altogether are deleted
+        by delete_vanished_months.
+    -#}
+    {% if is_incremental() %}
+    where {{ relation_alias }}.{{ group_column }} in (
+        select changed.{{ group_column }}
+        from {{ relation_alias }} as changed
+        where not exists (
+            select 1
+            from {{ this }} as stored
+            where {% for column in key_columns %}stored.{{ column }} = changed.{{ column }} and {% endfor %}stored.row_hash = changed.row_hash
+        )
+        union
+        select stored.{{ group_column }}
+        from {{ this }} as stored
+        where not exists (
+            select 1
+            from {{ relation_alias }} as produced
+            where {% for column in key_columns %}produced.{{ column }} = stored.{{ column }}{% if not loop.last %} and {% endif %}{% endfor %}
+        )
+    )
+    {% endif %}
+{%- endmacro %}
+
+{% macro changed_years(monthly) -%}
+    {#-
+        Years of the monthly rollup to recompute: those with months refreshed since the
+        last run, and those whose stored month count no longer matches (months removed).
+    -#}
+    select year
+    from {{ monthly }}
+    where refreshed_at > (select coalesce(max(refreshed_at), '-infinity') from {{ this }})
+    union
+    select stored.year
+    from {{ this }} as stored
+    group by stored.year
+    having sum(stored.months) <> (select count(*) from {{ monthly }} as m where m.year = stored.year)
+{%- endmacro %}
+
+{% macro delete_vanished_months(date_relations) -%}
+    {#-
+        post_hook of the incremental monthly rollups: delete the months none of
+        date_relations (staging models keyed by date_id) has a row in any more, which
+        delete+insert never sees.
+    -#}
+    {% if is_incremental() %}
+    delete from {{ this }} as stored
+    where not exists (
+        select 1
+        from {{ ref('stg_dates') }} as d
+        join (
+            {% for relation in date_relations %}select date_id from {{ relation }}{% if not loop.last %} union {% endif %}{% endfor %}
+        ) as produced on produced.date_id = d.date_id
+        where d.month_id = stored.month_id
+    )
+    {% endif %}
+{%- endmacro %}
+
+{% macro delete_vanished_years(monthly) -%}
+    {#- post_hook of the yearly rollups: delete the years the monthly rollup no longer has -#}
+    {% if is_incremental() %}
+    delete from {{ this }} as stored
+    where not exists (select 1 from {{ monthly }} as m where m.year = stored.year)
+    {% endif %}
+{%- endmacro %}
@@ -0,0 +1,88 @@
+
+-- Monthly income vs spend: needs, wishes, savings, invested capital and the savings
+-- rate, one row per month. Rewrites only the months whose figures changed, and deletes
+-- the months without spend or income left.
+
+{{ config(
+    unique_key='month_id',
+    post_hook="{{ delete_vanished_months([ref('stg_spend'), ref('stg_income')]) }}",
+    indexes=[
+        {'columns': ['month_id'], 'unique': True},
+        {'columns': ['year']},
+        {'columns': ['refreshed_at']},
+    ]
+) }}
+
+with spend as (
+    select
+        month_id,
+        sum(amount) filter (where area = 'needs') as needs,
+        sum(amount) filter (where area = 'wishes') as wishes
+    from {{ ref('fct_monthly_spend') }}
+    group by month_id
+),
+
+income as (
+    select
+        d.month_id,
+        sum(i.net_income) as net_income,
+        sum(i.gross_income) as gross_income,
+        sum(i.savings) as savings,
+        -- invested capital is a balance: the last value of the month
+        (array_agg(i.invested order by d.date desc))[1] as invested
+    from {{ ref('stg_income') }} as i
+    join {{ ref('stg_dates') }} as d on d.date_id = i.date_id
+    group by d.month_id
+),
+
+months as (
+    select month_id from spend
+    union
+    select month_id from income
+),
+
+monthly as (
+    select
+        m.month_id,
+        to_date(m.month_id::text, 'YYYYMM') as month_start,
+        m.month_id / 100 as year,
+        coalesce(i.net_income, 0) as net_income,
+        coalesce(i.gross_income, 0) as gross_income,
+        coalesce(s.needs, 0) as needs,
+        coalesce(s.wishes, 0) as wishes,
+        coalesce(s.needs, 0) + coalesce(s.wishes, 0) as total_spend,
+        coalesce(i.savings, 0) as savings,
+        coalesce(i.invested, 0) as invested
+    from months as m
+    left join spend as s on s.month_id = m.month_id
+    left join income as i on i.month_id = m.month_id
+),
+
+hashed as (
+    select
+        *,
+        net_income - total_spend as net_cashflow,
+        savings / nullif(net_income, 0) as savings_rate,
+        needs / nullif(net_income, 0) as needs_to_income,
+        md5(row(net_income, gross_income, needs, wishes, savings, invested)::text) as row_hash
+    from monthly
+)
+
+select
+    month_id,
+    month_start,
+    year,
+    net_income,
+    gross_income,
+    needs,
+    wishes,
+    total_spend,
+    net_cashflow,
+    savings,
+    savings_rate,
+    needs_to_income,
+    invested,
+    row_hash,
+    now() as refreshed_at
+from hashed
+{{ changed_groups_only('hashed', ['month_id'], 'month_id') }}
@@ -0,0 +1,49 @@
+
+-- Monthly spend per area and category. Incremental: every run aggregates the staging
+-- rows by month (date_id -> stg_dates), but only the months with a changed, new or
+-- removed category are rewritten whole (changed_groups_only), and months without any
+-- spend left are deleted, so dashboards read a table refreshed month by month.
+
+{{ config(
+    unique_key='month_id',
+    post_hook="{{ delete_vanished_months([ref('stg_spend')]) }}",
+    indexes=[
+        {'columns': ['month_id', 'area', 'category'], 'unique': True},
+        {'columns': ['year']},
+        {'columns': ['refreshed_at']},
+    ]
+) }}
+
+with monthly as (
+    select
+        d.month_id,
+        min(d.month_start) as month_start,
+        min(d.year) as year,
+        s.area,
+        s.category,
+        sum(s.amount) as amount,
+        count(*) as entries
+    from {{ ref('stg_spend') }} as s
+    join {{ ref('stg_dates') }} as d on d.date_id = s.date_id
+    group by d.month_id, s.area, s.category
+),
+
+hashed as (
+    select
+        *,
+        md5(row(amount, entries)::text) as row_hash
+    from monthly
+)
+
+select
+    month_id,
+    month_start,
+    year,
+    area,
+    category,
+    amount,
+    entries,
+    row_hash,
+    now() as refreshed_at
+from hashed
+{{ changed_groups_only('hashed', ['month_id', 'area', 'category'], 'month_id') }}
@@ -0,0 +1,48 @@
+
+-- Yearly income vs spend, rolled up from fct_monthly_cashflow. Incremental: only the
+-- years with months refreshed or removed since the last run are recomputed, and the
+-- years without months left are deleted.
+
+{{ config(
+    unique_key='year',
+    post_hook="{{ delete_vanished_years(ref('fct_monthly_cashflow')) }}",
+    indexes=[
+        {'columns': ['year'], 'unique': True},
+    ]
+) }}
+
+with yearly as (
+    select
+        year,
+        sum(net_income) as net_income,
+        sum(gross_income) as gross_income,
+        sum(needs) as needs,
+        sum(wishes) as wishes,
+        sum(total_spend) as total_spend,
+        sum(net_cashflow) as net_cashflow,
+        sum(savings) as savings,
+        (array_agg(invested order by month_id desc))[1] as invested,
+        count(*) as months,
+        max(refreshed_at) as refreshed_at
+    from {{ ref('fct_monthly_cashflow') }}
+    {% if is_incremental() %}
+    where year in ({{ changed_years(ref('fct_monthly_cashflow')) }})
+    {% endif %}
+    group by year
+)
+
+select
+    year,
+    net_income,
+    gross_income,
+    needs,
+    wishes,
+    total_spend,
+    net_cashflow,
+    savings,
+    savings / nullif(net_income, 0) as savings_rate,
+    needs / nullif(net_income, 0) as needs_to_income,
+    invested,
+    months,
+    refreshed_at
+from yearly
@@ -0,0 +1,27 @@
+
+-- Yearly spend per area and category, rolled up from fct_monthly_spend. Incremental:
+-- only the years with months refreshed or removed since the last run are recomputed
+-- (whole: a category gone from a year goes with it), and the years without months left
+-- are deleted.
+
+{{ config(
+    unique_key='year',
+    post_hook="{{ delete_vanished_years(ref('fct_monthly_spend')) }}",
+    indexes=[
+        {'columns': ['year', 'area', 'category'], 'unique': True},
+    ]
+) }}
+
+select
+    year,
+    area,
+    category,
+    sum(amount) as amount,
+    sum(entries) as entries,
+    count(*) as months,
+    max(refreshed_at) as refreshed_at
+from {{ ref('fct_monthly_spend') }}
+{% if is_incremental() %}
+where year in ({{ changed_years(ref('fct_monthly_spend')) }})
+{% endif %}
+group by year, area, category
@@ -0,0 +1,200 @@
+"""
+Multi-workbook batch: load a directory or glob of workbooks (one tracker per person
+and year) in one run. Workbooks are extracted and transformed in parallel on a
+process pool, the calendar years of every workbook's dates are filled once into
+dates.dates, and every row is tagged with its source workbook (SOURCE_COLUMN). Each table is
+reloaded per source under a Postgres advisory lock, so concurrent batch runs neither
+interleave nor duplicate their loads.
+"""
+
+import functools
+import glob
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from config import (
+    SOURCE_COLUMN, ETL_PARALLEL, ETL_WORKERS, ETL_SINGLE_TRANSACTION, LOAD_MODE,
+    ETL_BULK_LOAD, FK_NOT_VALID, PARTITION_MIN_ROWS
+)
+import metrics
+
+logger = logging.getLogger(__name__)
+
+WORKBOOK_EXTENSIONS = (".xlsx", ".xlsm")
+
+def resolve_workbooks(pattern):
+    """
+    Workbook paths of a directory (its .xlsx/.xlsm files) or a glob pattern, sorted.
+    Excel lock files (~$name.xlsx) are skipped.
+    """
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+    else:
+        paths = glob.glob(pattern)
+    paths = sorted(
+        p for p in paths
+        if os.path.isfile(p) and p.lower().endswith(WORKBOOK_EXTENSIONS) and not os.path.basename(p).startswith("~$")
+    )
+    if not paths:
+        raise FileNotFoundError("No workbooks found for %r" % pattern)
+    return paths
+
+def source_name(path):
+    """
+    Tag stored in SOURCE_COLUMN for the rows of a workbook: its file name.
+    """
+    return os.path.basename(path)
+
+def _extract_workbook(path):
+    """
+    Pool task: extract the sheets of one workbook, tagging every sheet but
+    dates.dates with the source column.
+    """
+    from extractor import extract_sheets
+    frames = extract_sheets(path)
+    source = source_name(path)
+    for key, df in frames.items():
+        if key != ("dates", "dates"):
+            frames[key] = df.assign(**{SOURCE_COLUMN: source})
+    return frames
+
+def _transform_workbook(frames, plans):
+    """
+    Pool task: convert the sheets of one workbook with the run's column plans.
+    Returns ({ (schema, table): (column_values, n_rows) }, distinct dates).
+    """
+    from etl import prepare_table_columns
+    out = {}
+    dates = set()
+    for key, df in frames.items():
+        plan = plans[key]
+        # workbooks missing a column of the merged sheet get it empty
+        df = df.reindex(columns=plan.names)
+        _, column_values, date_values = prepare_table_columns(df, plan)
+        out[key] = (column_values, len(df))
+        dates.update(date_values)
+    return out, dates
+
+def _run_in_process(func, *args):
+    """
+    Process wrapper: run func and hand its stage records back to the parent.
+    """
+    metrics.reset()
+    return func(*args), metrics.records()
+
+def _map_pool(func, items, workers):
+    """
+    Run func(*item) for every item on a process pool of workers processes (inline
+    with one worker or one item). Returns the results in order.
+    """
+    if workers <= 1 or len(items) <= 1:
+        return [func(*item) for item in items]
+    from scheduler import _init_process_worker
+    wrapped = functools.partial(_run_in_process, func)
+    with ProcessPoolExecutor(max_workers=min(workers, len(items)), initializer=_init_process_worker) as pool:
+        results = list(pool.map(wrapped, *zip(*items)))
+    for _, records in results:
+        metrics.merge(records)
+    return [result for result, _ in results]
+
+def merge_frames(extracted):
+    """
+    One DataFrame per (schema, table) across workbooks (columns unioned in first-seen
+    order), used to compile DDL plans whose types fit every workbook.
+    Returns (merged frames without dates.dates, dates.dates columns or None).
+    """
+    import pandas as pd
+    by_table = {}
+    dates_columns = None
+    for frames in extracted:
+        for key, df in frames.items():
+            if key == ("dates", "dates"):
+                dates_columns = dates_columns or list(df.columns)
+                continue
+            by_table.setdefault(key, []).append(df)
+    merged = {key: pd.concat(dfs, ignore_index=True, sort=False) for key, dfs in by_table.items()}
+    return merged, dates_columns
+
+def load_sources(schema, table, df, plans, prepared, sources):
+    """
+    Scheduler task: replace the rows of the batch's sources in schema.table with the
+    prepared rows of every workbook, in one transaction under the table's advisory lock.
+    Rows without a source (loaded by a single-workbook run, which doesn't tag them) are
+    deleted too: they are the same trackers, and would otherwise be loaded twice.
+    prepared: { (schema, table): [ (column_values, n_rows) ] of the workbooks holding the sheet }
+    """
+    from db import advisory_lock, transaction, load_columns
+    from etl import map_date_columns
+    from psycopg2 import sql
+    plan = plans[(schema, table)]
+    prepared = prepared[(schema, table)]
+    name = metrics.table_name(schema, table)
+    with advisory_lock(name):
+        # date_ids (and the partitions they fall in) before the load transaction opens
+        for column_values, _ in prepared:
+            map_date_columns(plan, column_values)
+        with metrics.stage("load", name) as rec, transaction() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("DELETE FROM {}.{} WHERE {} = ANY(%s) OR {} IS NULL").format(
+                    sql.Identifier(schema), sql.Identifier(table), sql.Identifier(SOURCE_COLUMN),
+                    sql.Identifier(SOURCE_COLUMN)), (sources,))
+                deleted = cur.rowcount
+                rec["rows"] = load_columns(cur, schema, table, plan.names, [values for values, _ in prepared])
+    logger.info("Loaded %s.%s: %d rows from %d workbooks (%d replaced)", schema, table, rec["rows"], len(prepared), deleted)
+
+def main_workbooks(pattern):
+    """
+    Batch run over the workbooks of pattern (directory or glob):
+     - extract every workbook on a process pool (ETL_WORKERS processes)
+     - compile one DDL plan from the merged sheets and migrate the schema, under an advisory lock
+     - convert every workbook on the process pool with that plan
+     - fill the calendar years of the dates of all workbooks at once
+     - reload each table's rows of these sources (scheduler.run_tables, thread workers)
+    """
+    from ddl_plan import compile_ddl_plan
+    from db import run_session, advisory_lock, ensure_calendar, supports
+    from migrator import migrate, apply_post_load
+    from scheduler import run_tables
+
+    paths = resolve_workbooks(pattern)
+    sources = [source_name(p) for p in paths]
+    if len(set(sources)) != len(sources):
+        raise ValueError("Workbooks with the same file name can't be told apart by %s: %s" % (SOURCE_COLUMN, paths))
+    logger.info("Starting financial ETL over %d workbooks (%s)", len(paths), pattern)
+    if LOAD_MODE == "incremental":
+        logger.warning("LOAD_MODE=incremental is ignored by the multi-workbook batch: sources are reloaded whole")
+    workers = 1 if ETL_PARALLEL == "sequential" else ETL_WORKERS
+
+    extracted = _map_pool(_extract_workbook, [(p,) for p in paths], workers)
+    merged, dates_columns = merge_frames(extracted)
+    ddl = compile_ddl_plan(merged, dates_columns, PARTITION_MIN_ROWS if supports("partitioning") else 0)
+
+    with run_session():
+        with metrics.stage("ddl"), advisory_lock("ddl"):
+            post_load = migrate(ddl, defer_foreign_keys=ETL_BULK_LOAD, not_valid=FK_NOT_VALID)
+
+        plans = ddl.sheet_plans
+        tasks = [({k: df for k, df in frames.items() if k in plans}, plans) for frames in extracted]
+        del extracted
+        transformed = _map_pool(_transform_workbook, tasks, workers)
+        del tasks
+
+        # one calendar fill for the dates of every workbook: the loads compute their date_ids
+        all_dates = set().union(*(dates for _, dates in transformed))
+        with metrics.stage("dates", None, len(all_dates)):
+            ensure_calendar(all_dates)
+
+        prepared = {}
+        for tables, _ in transformed:
+            for key, values in tables.items():
+                prepared.setdefault(key, []).append(values)
+        del transformed
+
+        # loads are I/O bound: threads, which share the prepared rows without pickling them
+        mode = "thread" if ETL_PARALLEL == "process" else ETL_PARALLEL
+        if ETL_SINGLE_TRANSACTION and mode != "sequential":
+            logger.warning("ETL_SINGLE_TRANSACTION shares one connection: running tables sequentially")
+            mode = "sequential"
+        task = functools.partial(load_sources, plans=plans, prepared=prepared, sources=sources)
+        run_tables(merged, task=task, mode=mode)
+        apply_post_load(post_load)
@@ -0,0 +1,94 @@
+"""
+Benchmark: db.bulk_insert load paths (execute_values vs COPY text vs COPY binary).
+
+Run it against a throwaway local Postgres, e.g.:
+    PGHOST=localhost PGDATABASE=postgres PGUSER=postgres PGPASSWORD=... \
+        python benchmarks/bench_bulk_insert.py --rows 100000
+
+A scratch schema (bench_bulk) is created and dropped at the end. Every method
+loads the same rows and the resulting tables are compared for equality.
+"""
+
+import argparse
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import get_connection, bulk_insert  # noqa: E402
+
+SCHEMA = "bench_bulk"
+COLUMNS = ["id", "date", "rent_value", "car_gas", "installment"]
+
+
+def synthetic_rows(n_rows):
+    """
+    Rows shaped like a prepared financialTracker table: id, date_id, decimals and NULLs.
+    """
+    rows = []
+    for i in range(n_rows):
+        rows.append((
+            i,
+            (i % 240) + 1,
+            Decimal(i % 500000) / 100 if i % 5 else None,
+            Decimal("-%d.%04d" % (i % 1000, i % 10000)),
+            Decimal(i % 1000) if i % 7 else Decimal("NaN"),
+        ))
+    return rows
+
+
+def run(methods, n_rows, repeat):
+    rows = synthetic_rows(n_rows)
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DROP SCHEMA IF EXISTS %s CASCADE" % SCHEMA)
+            cur.execute("CREATE SCHEMA %s" % SCHEMA)
+        results = {}
+        for method in methods:
+            table = "load_%s" % method
+            best = None
+            for _ in range(repeat):
+                with conn.cursor() as cur:
+                    cur.execute("DROP TABLE IF EXISTS %s.%s" % (SCHEMA, table))
+                    cur.execute(
+                        "CREATE TABLE %s.%s (id INTEGER PRIMARY KEY, date INTEGER, rent_value DECIMAL(18,4), "
+                        "car_gas DECIMAL(18,4), installment DECIMAL(18,4))" % (SCHEMA, table)
+                    )
+                start = time.perf_counter()
+                bulk_insert(SCHEMA, table, COLUMNS, rows, method=method)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[method] = best
+            print("%-12s %10d rows  %8.3f s  %12.0f rows/sec" % (method, n_rows, best, n_rows / best))
+
+        # all methods must produce identical tables
+        with conn.cursor() as cur:
+            reference = None
+            for method in methods:
+                cur.execute("SELECT t::text FROM %s.load_%s t ORDER BY id" % (SCHEMA, method))
+                data = cur.fetchall()
+                if reference is None:
+                    reference = data
+                elif data != reference:
+                    print("MISMATCH: %s differs from %s" % (method, methods[0]))
+                    sys.exit(1)
+            cur.execute("DROP SCHEMA IF EXISTS %s CASCADE" % SCHEMA)
+    finally:
+        conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--methods", default="insert,copy,copy_binary")
+    args = parser.parse_args()
+    run(args.methods.split(","), args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
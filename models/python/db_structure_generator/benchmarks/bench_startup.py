@@ -0,0 +1,80 @@
+"""
+Benchmark: cold start of the CLI stages, each run in a fresh interpreter.
+
+    help        python cli.py --help (argparse and config only)
+    provision   python cli.py provision of a generated DDL script
+    model       python cli.py model on a generated workbook (extraction cache warm)
+
+Every command runs --repeat times; the wall time of the whole process and the startup
+the CLI reports (its imports up to the stage's work) are summarized by their median.
+With --target duckdb (default) provision runs on an in-memory DuckDB database, so no
+server is needed; with --target postgres it applies the script to the PG* database,
+which should be a throwaway one: the script creates the generated workbook's tables.
+
+Usage (from models/python/db_structure_generator):
+    python benchmarks/bench_startup.py --repeat 10
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from generate_workbook import generate_workbook  # noqa: E402
+
+COMMANDS = ["help", "provision", "model"]
+_STARTUP_RE = re.compile(r"startup ([0-9.]+) s")
+
+
+def run_cli(args, env):
+    """
+    Run cli.py once; returns (wall seconds, reported startup seconds or None).
+    """
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "cli.py"] + args, cwd=ROOT, env=env,
+                         stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    elapsed = time.perf_counter() - start
+    if out.returncode:
+        raise RuntimeError("cli.py %s failed:\n%s" % (" ".join(args), out.stdout))
+    match = _STARTUP_RE.search(out.stdout)
+    return elapsed, float(match.group(1)) if match else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=1000, help="rows of the generated workbook")
+    parser.add_argument("--target", choices=["duckdb", "postgres"], default="duckdb")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench_startup_")
+    workbook = os.path.join(HERE, "data", "synthetic_%d.xlsx" % args.rows)
+    if not os.path.exists(workbook):
+        generate_workbook(workbook, args.rows)
+    env = dict(os.environ, EXCEL_FILE=workbook, DDL_FILE=os.path.join(work, "ddl.sql"),
+               LOG_FILE=os.path.join(work, "etl.log"), RUN_REPORT_FILE="off")
+    if args.target == "duckdb":
+        env.update(DB_BACKEND="duckdb", DUCKDB_PATH=":memory:")
+    # writes the script provision applies and warms the extraction cache of model
+    run_cli(["model"], env)
+
+    stage_args = {"help": ["--help"], "provision": ["provision"], "model": ["model"]}
+    print("%-10s %10s %10s" % ("command", "wall", "startup"))
+    for command in COMMANDS:
+        runs = [run_cli(stage_args[command], env) for _ in range(args.repeat)]
+        wall = statistics.median(r[0] for r in runs)
+        startups = [r[1] for r in runs if r[1] is not None]
+        startup = "%8.3f s" % statistics.median(startups) if startups else "%10s" % "-"
+        print("%-10s %8.3f s %s" % (command, wall, startup))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Recording fake database target for the benchmarks.
+
+recording_session() routes every db helper (db.connection, db.transaction,
+ensure_calendar, bulk_insert, ...) to an in-memory RecordingConnection instead of
+Postgres: statements are rendered client-side exactly as psycopg2 would send
+them, counted and dropped. This measures the client side of the ETL (row
+preparation, SQL building, COPY encoding) without a server.
+
+Limits: SELECTs return no rows (date_ids are computed client-side and
+never read back), so incremental loads always see an empty state, and
+BULK_LOAD_METHOD=copy_binary (which reads column types from the catalog)
+needs a real Postgres.
+"""
+
+import threading
+from contextlib import contextmanager
+
+import psycopg2.extensions as ext
+from psycopg2 import sql
+
+
+def _quote_ident(name):
+    return '"%s"' % name.replace('"', '""')
+
+
+def _quote_literal(value):
+    a = ext.adapt(value)
+    if hasattr(a, "encoding"):
+        a.encoding = "utf-8"
+    q = a.getquoted()
+    return q.decode("utf-8") if isinstance(q, bytes) else q
+
+
+def render(query):
+    """
+    Render a str/bytes/psycopg2.sql query the way it would be sent (without a connection).
+    """
+    if isinstance(query, bytes):
+        return query.decode("utf-8")
+    if isinstance(query, str):
+        return query
+    if isinstance(query, sql.Composed):
+        return "".join(render(q) for q in query.seq)
+    if isinstance(query, sql.SQL):
+        return query.string
+    if isinstance(query, sql.Identifier):
+        return ".".join(_quote_ident(s) for s in query.strings)
+    if isinstance(query, sql.Literal):
+        return _quote_literal(query.wrapped)
+    if isinstance(query, sql.Placeholder):
+        return "%%(%s)s" % query.name if query.name else "%s"
+    raise TypeError("Cannot render %r" % (query,))
+
+
+class RecordingCursor:
+    """
+    Minimal psycopg2 cursor stand-in: execute/mogrify/copy_expert/fetch*.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = -1
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def mogrify(self, query, args=None):
+        query = render(query)
+        if args is None:
+            out = query
+        elif isinstance(args, dict):
+            out = query % {k: _quote_literal(v) for k, v in args.items()}
+        else:
+            out = query % tuple(_quote_literal(v) for v in args)
+        return out.encode("utf-8")
+
+    def execute(self, query, args=None):
+        text = self.mogrify(query, args)
+        self._result = []
+        self.rowcount = -1
+        self.connection.record(len(text))
+
+    def executemany(self, query, args_list):
+        for args in args_list:
+            self.execute(query, args)
+
+    def copy_expert(self, query, file, size=8192):
+        n_bytes = 0
+        n_rows = 0
+        while True:
+            block = file.read(size)
+            if not block:
+                break
+            n_bytes += len(block)
+            n_rows += block.count(b"\n") if isinstance(block, bytes) else block.count("\n")
+        self.rowcount = n_rows
+        self.connection.record(len(render(query)) + n_bytes, copy_bytes=n_bytes)
+
+    def fetchone(self):
+        return self._result.pop(0) if self._result else None
+
+    def fetchall(self):
+        rows, self._result = self._result, []
+        return rows
+
+
+class RecordingConnection:
+    """
+    Connection stand-in that counts round trips and bytes sent.
+    """
+    encoding = "UTF8"
+
+    def __init__(self):
+        self.autocommit = True
+        self.closed = 0
+        self.statements = 0
+        self.bytes_sent = 0
+        self.copy_bytes = 0
+        self.commits = 0
+        self._lock = threading.Lock()
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def record(self, n_bytes, copy_bytes=0):
+        with self._lock:
+            self.statements += 1
+            self.bytes_sent += n_bytes
+            self.copy_bytes += copy_bytes
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+    def stats(self):
+        return {
+            "statements": self.statements,
+            "bytes_sent": self.bytes_sent,
+            "copy_bytes": self.copy_bytes,
+        }
+
+
+@contextmanager
+def recording_session():
+    """
+    Route every db helper to a fresh RecordingConnection for the duration of the block.
+    Identifiers and literals composed with psycopg2.sql are quoted client-side (psycopg2
+    needs a real connection for that). Yields the connection, whose stats() hold the totals.
+    """
+    import db
+    conn = RecordingConnection()
+    original_quote_ident = ext.quote_ident
+
+    def quote_ident(name, scope):
+        if isinstance(scope, (RecordingConnection, RecordingCursor)):
+            return _quote_ident(name)
+        return original_quote_ident(name, scope)
+
+    original_literal = sql.Literal.as_string
+
+    def literal_as_string(self, context):
+        if isinstance(context, (RecordingConnection, RecordingCursor)):
+            return _quote_literal(self.wrapped)
+        return original_literal(self, context)
+
+    previous = db._run_conn
+    ext.quote_ident = quote_ident
+    sql.Literal.as_string = literal_as_string
+    db._run_conn = conn
+    try:
+        yield conn
+    finally:
+        db._run_conn = previous
+        ext.quote_ident = original_quote_ident
+        sql.Literal.as_string = original_literal
@@ -0,0 +1,138 @@
+"""
+Synthetic financialTracker workbook generator.
+
+Writes a workbook with the same sheet layout as data/financialTracker.xlsx
+(schema.table sheet names for needs/savings/wishes/salaries, a dates.dates sheet
+and a public.overview sheet that the extractor skips), filled with
+European-formatted amounts ("1.234,56 €", "12345,67") and month-year dates
+("September-25", "09/2025"), scaling from thousands to millions of rows.
+
+Usage (from models/python/db_structure_generator):
+    python benchmarks/generate_workbook.py --rows 100000 --out benchmarks/data/synthetic_100k.xlsx
+"""
+
+import argparse
+import os
+import random
+from datetime import date
+
+# (sheet, amount columns); the last column is the sheet total, as in the real workbook
+SHEETS = [
+    ("needs.rents", ["rent_value"]),
+    ("needs.loans", ["silvia_loan", "mom_loan", "dad_loan", "loan_value"]),
+    ("needs.connections", ["sim", "internet", "connection_value"]),
+    ("needs.installments", ["klarna", "scalapay", "cofidis", "installment_value"]),
+    ("savings.savings", ["ral", "gross_salary", "net_salary", "saving_value"]),
+    ("savings.investments", ["Importo", "Azioni", "Obbligazioni", "Crypto", "Totale"]),
+    ("wishes.subscriptions", ["cigars", "Prime", "Netflix", "iCloud", "subscriptions_value"]),
+    ("wishes.holidays", ["flight", "home", "taxes", "holidays_value"]),
+    ("salaries.salaries", ["ral", "gross_salary", "net_salary", "thirteenth", "salary_value"]),
+]
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December"]
+
+# one Excel sheet holds at most 1,048,576 rows (header included)
+MAX_SHEET_ROWS = 1048575
+
+
+def european(value):
+    """
+    Format an amount the Italian way: "1.234,56 €".
+    """
+    return "{:,.2f} €".format(value).replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def month_label(month_index, style):
+    """
+    Month number month_index (0 = January 2015) as "September-25" or "09/2025".
+    """
+    year, month = divmod(month_index, 12)
+    year += 2015
+    if style == "name":
+        return "%s-%02d" % (MONTHS[month], year % 100)
+    return "%02d/%d" % (month + 1, year)
+
+
+def amount_cell(rnd, style):
+    """
+    One amount cell: European text, plain float or empty (about 10%).
+    """
+    r = rnd.random()
+    if r < 0.1:
+        return None
+    value = round(rnd.uniform(0, 5000), 2)
+    if style == "euro":
+        return european(value)
+    if style == "comma":
+        return ("%.2f" % value).replace(".", ",")
+    return value
+
+
+def sheet_plan(total_rows):
+    """
+    Return [(sheet_name, columns, n_rows)] spreading total_rows over SHEETS.
+    Sheets larger than the Excel limit are split into name_2, name_3, ...
+    """
+    per_sheet = max(1, total_rows // len(SHEETS))
+    plan = []
+    for name, columns in SHEETS:
+        remaining = per_sheet
+        part = 1
+        while remaining > 0:
+            n = min(remaining, MAX_SHEET_ROWS)
+            plan.append((name if part == 1 else "%s_%d" % (name, part), columns, n))
+            remaining -= n
+            part += 1
+    return plan
+
+
+def generate_workbook(path, total_rows, seed=42, months=240):
+    """
+    Write a synthetic workbook of about total_rows data rows to path.
+    Each sheet cycles over `months` months; rows of the same month are several
+    movements of that month. Returns the list of (sheet_name, n_rows) written.
+    """
+    from openpyxl import Workbook
+    rnd = random.Random(seed)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    wb = Workbook(write_only=True)
+
+    overview = wb.create_sheet("public.overview")
+    overview.append(["generated", "rows"])
+    overview.append([date.today().isoformat(), total_rows])
+
+    dates = wb.create_sheet("dates.dates")
+    dates.append(["id", "date"])
+    for i in range(months):
+        year, month = divmod(i, 12)
+        dates.append([i + 1, date(2015 + year, month + 1, 1)])
+
+    written = []
+    for i, (name, columns, n_rows) in enumerate(sheet_plan(total_rows)):
+        date_style = "name" if i % 2 == 0 else "slash"
+        amount_style = ("euro", "comma", "float")[i % 3]
+        ws = wb.create_sheet(name)
+        ws.append(["date"] + columns)
+        for r in range(n_rows):
+            values = [amount_cell(rnd, amount_style) for _ in columns[:-1]]
+            total = sum(v for v in values if isinstance(v, float)) if amount_style == "float" else None
+            ws.append([month_label(r % months, date_style)] + values + [total if total is not None else amount_cell(rnd, amount_style)])
+        written.append((name, n_rows))
+    wb.save(path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="total data rows over all sheets")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "synthetic.xlsx"))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    for name, n_rows in generate_workbook(args.out, args.rows, args.seed):
+        print("%-28s %10d rows" % (name, n_rows))
+    print("Written %s (%d bytes)" % (args.out, os.path.getsize(args.out)))
+
+
+if __name__ == "__main__":
+    main()
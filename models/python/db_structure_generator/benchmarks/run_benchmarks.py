@@ -0,0 +1,225 @@
+"""
+ETL benchmark suite: times each stage on a synthetic (or given) workbook and
+saves the results to JSON, so runs of different commits can be compared.
+
+Stages:
+    extract     extractor.extract_sheets (cache off)
+    prepare     etl.prepare_table_rows on every sheet (column plan included)
+    dates       db.ensure_calendar with the dates of every sheet (one fill of their years)
+    insert      db.bulk_insert of every sheet
+    main        the full main.main() run on the workbook
+
+Targets:
+    fake        benchmarks/fake_db.py: statements are rendered and counted, nothing is sent
+    duckdb      the embedded DuckDB backend (DB_BACKEND=duckdb) on an in-memory database:
+                the whole load runs locally, no server needed (pip install duckdb)
+    postgres    the Postgres of the PG* settings. Use a THROWAWAY database: the insert
+                stage writes to a scratch schema (bench_etl, dropped at the end), but
+                the main stage creates and fills the workbook schemas like a real run.
+
+Usage (from models/python/db_structure_generator):
+    python benchmarks/run_benchmarks.py --rows 100000
+    python benchmarks/run_benchmarks.py --rows 1000000 --target postgres --stages extract,prepare,insert
+    python benchmarks/run_benchmarks.py --rows 100000 --target duckdb
+    python benchmarks/run_benchmarks.py --rows 100000 --compare benchmarks/results/<previous>.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from generate_workbook import generate_workbook  # noqa: E402
+
+STAGES = ["extract", "prepare", "dates", "insert", "main"]
+SCRATCH_SCHEMA = "bench_etl"
+# a stage slower than the compared run by more than this is reported as a regression
+REGRESSION_THRESHOLD = 1.10
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except Exception:
+        return None
+
+
+def timed(results, stage, func, rows=None):
+    """
+    Run func(), store wall time, rows and rows/sec of the stage in results. Returns func's result.
+    """
+    start = time.perf_counter()
+    out = func()
+    elapsed = time.perf_counter() - start
+    entry = {"seconds": round(elapsed, 4)}
+    if rows is not None:
+        entry["rows"] = rows
+        entry["rows_per_sec"] = round(rows / elapsed) if elapsed else None
+    results[stage] = entry
+    print("%-8s %8.3f s%s" % (stage, elapsed, "  %12.0f rows/sec" % (rows / elapsed) if rows and elapsed else ""))
+    return out
+
+
+@contextmanager
+def target_session(target):
+    """
+    Yield a stats() callable for the chosen target (fake: recorded totals, postgres/duckdb: empty).
+    """
+    if target == "fake":
+        from fake_db import recording_session
+        with recording_session() as conn:
+            yield conn.stats
+    else:
+        yield dict
+
+
+def run(workbook, target, stages):
+    from extractor import extract_sheets
+    from column_plan import build_sheet_plan
+    from etl import prepare_table_rows
+    from db import ensure_calendar, bulk_insert, exec_statements
+    from ddl_builder import build_create_schema, build_create_table
+    from psycopg2 import sql
+
+    stages_out = {}
+    db_stats = {}
+    frames = extract_sheets(workbook, cache_mode="off")
+    frames.pop(("dates", "dates"), None)
+    n_rows = sum(len(df) for df in frames.values())
+
+    if "extract" in stages:
+        timed(stages_out, "extract", lambda: extract_sheets(workbook, cache_mode="off"), n_rows)
+
+    plans = {k: build_sheet_plan(k[0], k[1], df) for k, df in frames.items()}
+    prepared = {}
+
+    def prepare():
+        for k, df in frames.items():
+            prepared[k] = prepare_table_rows(df)
+    if "prepare" in stages:
+        timed(stages_out, "prepare", prepare, n_rows)
+    elif "dates" in stages or "insert" in stages:
+        prepare()
+
+    with target_session(target) as stats:
+        if "dates" in stages:
+            all_dates = {d for _, _, dates in prepared.values() for d in dates}
+            timed(stages_out, "dates", lambda: ensure_calendar(all_dates), len(all_dates))
+        if "insert" in stages:
+            exec_statements([build_create_schema(SCRATCH_SCHEMA)])
+            for (schema, table), plan in plans.items():
+                scratch = sql.Identifier(SCRATCH_SCHEMA, "%s_%s" % (schema, table))
+                exec_statements([sql.SQL("DROP TABLE IF EXISTS {}").format(scratch)])
+                exec_statements(build_create_table(SCRATCH_SCHEMA, "%s_%s" % (schema, table), plan.names, plan=plan))
+
+            def insert():
+                for (schema, table), (cols, rows, _) in prepared.items():
+                    # the scratch date columns stay NULL: their foreign keys need the calendar
+                    bulk_insert(SCRATCH_SCHEMA, "%s_%s" % (schema, table), cols, _without_dates(rows, plans[(schema, table)]))
+            timed(stages_out, "insert", insert, n_rows)
+            if target == "postgres":
+                exec_statements(["DROP SCHEMA IF EXISTS %s CASCADE" % SCRATCH_SCHEMA])
+        if "main" in stages:
+            import extractor
+            import main as main_module
+            main_module.EXCEL_FILE = workbook
+            # keep sql/ddl/financial_tracker_ddl.sql describing the real workbook
+            main_module.DDL_FILE = "off"
+            extractor.EXTRACT_CACHE = "off"
+            if target in ("fake", "duckdb") and main_module.ETL_PARALLEL == "process":
+                # worker processes would open real connections
+                main_module.ETL_PARALLEL = "thread"
+            timed(stages_out, "main", main_module.main, n_rows)
+        db_stats = stats()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "target": target,
+        "workbook": os.path.basename(workbook),
+        "workbook_bytes": os.path.getsize(workbook),
+        "rows": n_rows,
+        "sheets": len(frames),
+        "python": platform.python_version(),
+        "stages": stages_out,
+        "db": db_stats,
+    }
+
+
+def _without_dates(rows, plan):
+    """
+    Null out the date columns of prepared rows (the calendar may not hold their date_ids).
+    """
+    idx = [i for i, c in enumerate(plan.columns) if c.kind == "DATE"]
+    if not idx:
+        return rows
+    return [tuple(None if i in idx else v for i, v in enumerate(r)) for r in rows]
+
+
+def compare(current, previous):
+    """
+    Print per-stage time ratios against a previous result file; returns True on regressions.
+    """
+    regressed = False
+    print("\ncompared with %s (%s)" % (previous.get("commit"), previous.get("timestamp")))
+    for stage, entry in current["stages"].items():
+        before = previous.get("stages", {}).get(stage)
+        if not before:
+            continue
+        ratio = entry["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+        flag = "  REGRESSION" if ratio > REGRESSION_THRESHOLD else ""
+        regressed = regressed or bool(flag)
+        print("%-8s %8.3f s -> %8.3f s  (x%.2f)%s" % (stage, before["seconds"], entry["seconds"], ratio, flag))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="rows of the generated workbook")
+    parser.add_argument("--excel", help="benchmark this workbook instead of generating one")
+    parser.add_argument("--target", choices=["fake", "postgres", "duckdb"], default="fake")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--out", help="result JSON path (default benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="previous result JSON to compare with")
+    args = parser.parse_args()
+
+    stages = args.stages.split(",")
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error("unknown stages: %s" % ", ".join(sorted(unknown)))
+
+    workbook = args.excel
+    if workbook is None:
+        workbook = os.path.join(HERE, "data", "synthetic_%d.xlsx" % args.rows)
+        if not os.path.exists(workbook):
+            print("Generating %s" % workbook)
+            generate_workbook(workbook, args.rows)
+
+    if args.target == "duckdb":
+        # read by config.py, imported by run() after this point
+        os.environ["DB_BACKEND"] = "duckdb"
+        os.environ["DUCKDB_PATH"] = ":memory:"
+    result = run(workbook, args.target, stages)
+    out = args.out or os.path.join(
+        HERE, "results", "%s-%s.json" % (datetime.now().strftime("%Y%m%d-%H%M%S"), result["commit"] or "nogit"))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print("Results written to %s" % out)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            if compare(result, json.load(f)):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
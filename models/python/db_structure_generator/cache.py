@@ -0,0 +1,200 @@
+"""
+Extraction cache: parsed workbooks stored on disk as pickled DataFrames,
+keyed by the workbook content hash and the extractor version.
+
+Usage:
+    python cache.py clear     # remove every cached entry
+    python cache.py list      # show cached entries
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sys
+import time
+from contextlib import contextmanager
+from config import EXTRACT_CACHE_DIR, EXTRACT_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+MANIFEST_LOCK = "manifest.lock"
+
+def file_hash(path: str) -> str:
+    """
+    Return the SHA-256 of the file content.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def cache_key(path: str, version: str) -> str:
+    """
+    Cache key of a workbook: content hash plus extractor version.
+    """
+    return "%s-%s" % (file_hash(path), version)
+
+@contextmanager
+def _manifest_lock(cache_dir):
+    """
+    Hold an exclusive lock on the cache manifest while it is read, changed and rewritten:
+    batch workers and concurrent runs update it from several processes.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, MANIFEST_LOCK), "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _tmp_path(path):
+    # one temporary file per process: concurrent runs (or batch workers) may write the same entry
+    return "%s.%d.tmp" % (path, os.getpid())
+
+def _write_manifest(cache_dir, manifest):
+    tmp = _tmp_path(os.path.join(cache_dir, MANIFEST))
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(cache_dir, MANIFEST))
+
+def load(key: str, cache_dir: str = None):
+    """
+    Return the cached object for key, or None on a miss.
+    Hits take no lock and leave the manifest alone: the entry file's mtime is its last
+    access, which eviction reads.
+    """
+    cache_dir = cache_dir or EXTRACT_CACHE_DIR
+    entry = _read_manifest(cache_dir).get(key)
+    if entry is None:
+        return None
+    path = os.path.join(cache_dir, entry["file"])
+    try:
+        with open(path, "rb") as f:
+            obj = pickle.load(f)
+    except FileNotFoundError:
+        # evicted after the manifest was read
+        return None
+    except Exception as e:
+        logger.warning("Dropping unreadable cache entry %s: %s", key, e)
+        with _manifest_lock(cache_dir):
+            manifest = _read_manifest(cache_dir)
+            if manifest.pop(key, None) is not None:
+                _write_manifest(cache_dir, manifest)
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return obj
+
+def store(key: str, obj, source: str = None, cache_dir: str = None, max_bytes: int = None):
+    """
+    Pickle obj under key, then evict least recently used entries above max_bytes.
+    """
+    cache_dir = cache_dir or EXTRACT_CACHE_DIR
+    max_bytes = EXTRACT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    os.makedirs(cache_dir, exist_ok=True)
+    name = key + ".pkl"
+    tmp = _tmp_path(os.path.join(cache_dir, name))
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # the entry file appears together with its manifest entry, so under the lock
+    # every .pkl missing from the manifest is an orphan
+    with _manifest_lock(cache_dir):
+        os.replace(tmp, os.path.join(cache_dir, name))
+        manifest = _read_manifest(cache_dir)
+        manifest[key] = {
+            "file": name,
+            "size": os.path.getsize(os.path.join(cache_dir, name)),
+            "source": source,
+            "created": time.time(),
+        }
+        _evict(cache_dir, manifest, max_bytes)
+        _write_manifest(cache_dir, manifest)
+
+def _last_access(cache_dir, entry):
+    """
+    Last access time of an entry: the mtime of its file, touched by every hit.
+    """
+    try:
+        return os.path.getmtime(os.path.join(cache_dir, entry["file"]))
+    except OSError:
+        return 0.0
+
+def _evict(cache_dir, manifest, max_bytes):
+    """
+    Remove .pkl files missing from the manifest (left by an interrupted run), then the
+    least recently used entries until the total size fits max_bytes.
+    """
+    listed = {e["file"] for e in manifest.values()}
+    for name in os.listdir(cache_dir):
+        if name.endswith(".pkl") and name not in listed:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+                logger.info("Removed orphan cache file %s", name)
+            except OSError:
+                pass
+    total = sum(e["size"] for e in manifest.values())
+    for key, entry in sorted(manifest.items(), key=lambda kv: _last_access(cache_dir, kv[1])):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, entry["file"]))
+        except OSError:
+            pass
+        total -= entry["size"]
+        del manifest[key]
+        logger.info("Evicted cache entry %s (%d bytes)", key, entry["size"])
+
+def clear(cache_dir: str = None):
+    """
+    Remove every cache entry and the manifest. Returns the number of entries removed.
+    """
+    cache_dir = cache_dir or EXTRACT_CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return 0
+    with _manifest_lock(cache_dir):
+        manifest = _read_manifest(cache_dir)
+        for name in os.listdir(cache_dir):
+            if name.endswith(".pkl") or name == MANIFEST:
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                except OSError:
+                    pass
+    logger.info("Cleared extraction cache %s (%d entries)", cache_dir, len(manifest))
+    return len(manifest)
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if cmd == "clear":
+        print("Removed %d cache entries from %s" % (clear(), EXTRACT_CACHE_DIR))
+    elif cmd == "list":
+        for key, entry in sorted(_read_manifest(EXTRACT_CACHE_DIR).items(),
+                                 key=lambda kv: -_last_access(EXTRACT_CACHE_DIR, kv[1])):
+            print("%s  %10d bytes  %s" % (key, entry["size"], entry.get("source")))
+    else:
+        print(__doc__)
+        sys.exit(2)
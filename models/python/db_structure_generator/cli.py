@@ -0,0 +1,147 @@
+"""
+Command line entry point, one subcommand per stage of the CI workflow:
+
+    python cli.py model      compile the DDL plan from the workbook and write it to DDL_FILE (no database)
+    python cli.py provision  apply DDL_FILE to the database (psycopg2 only: no pandas, no workbook)
+    python cli.py etl        load the workbook(s): schema migration, tables, post-load indexes, run report
+    python cli.py all        model, provision and etl in one process
+
+Only argparse and config are imported up front: each stage imports what it needs when
+it runs, so provisioning the DDL doesn't pay for pandas, the extractor and the ETL
+modules. The startup time (from this module's import to the start of the first stage's
+work, its own imports included) is logged, printed and stored in the run report.
+"""
+
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse  # noqa: E402
+import logging  # noqa: E402
+import os  # noqa: E402
+from config import LOG_FILE, DDL_FILE  # noqa: E402
+
+logger = logging.getLogger("financial_etl")
+
+STAGES = ["model", "provision", "etl", "all"]
+# set by the first stage that runs (startup_seconds)
+_startup = None
+
+def setup_logging():
+    """
+    Log to LOG_FILE (creating its directory). Called by the entry points, never on import.
+    """
+    os.makedirs(os.path.dirname(LOG_FILE) or ".", exist_ok=True)
+    logging.basicConfig(
+        filename=LOG_FILE,
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s [%(name)s] %(message)s'
+    )
+
+def startup_seconds():
+    """
+    Seconds from this module's import to the start of the first stage's work (its
+    imports included): the cold start of the process, fixed once a stage has started.
+    """
+    global _startup
+    if _startup is None:
+        _startup = time.perf_counter() - _STARTED
+    return _startup
+
+def _started(stage):
+    cold = _startup is None
+    startup = startup_seconds()
+    if cold:
+        logger.info("Stage %s started after %.3f s of startup", stage, startup)
+        print("%s: startup %.3f s" % (stage, startup))
+    else:
+        logger.info("Stage %s started", stage)
+    return startup
+
+def run_model(report_file=None, profile=None):
+    """
+    Compile the DDL plan from EXCEL_FILE and write it to DDL_FILE, without connecting.
+    """
+    import main
+    startup = _started("model")
+    main.main(profile=profile, report_file=report_file, plan_only=True, startup=startup)
+    return DDL_FILE
+
+def run_provision(ddl_file=None):
+    """
+    Apply the DDL script (default DDL_FILE) in one round trip. The script is a
+    BEGIN ... COMMIT of guarded statements, so applying it again changes nothing.
+    Returns the seconds spent applying it.
+    """
+    path = ddl_file or DDL_FILE
+    if not path or path.lower() == "off":
+        raise ValueError("No DDL script to provision: set DDL_FILE or pass --ddl")
+    if not os.path.exists(path):
+        raise FileNotFoundError("DDL script %s not found: run the model stage first" % path)
+    from db import exec_script, run_session
+    _started("provision")
+    with open(path, "r", encoding="utf-8") as f:
+        script = f.read()
+    start = time.perf_counter()
+    # the script commits on its own: never nest it in a run transaction
+    with run_session(single_transaction=False):
+        exec_script(script)
+    elapsed = time.perf_counter() - start
+    logger.info("Provisioned %s (%d bytes) in %.3f s", path, len(script), elapsed)
+    print("provision: applied %s in %.3f s" % (path, elapsed))
+    return elapsed
+
+def run_etl(profile=None, report_file=None, workbooks=None, resume=None):
+    """
+    The full ETL of main.main (migration of what the catalog is missing, load, post-load
+    indexes and foreign keys) with the run report.
+    """
+    import main
+    startup = _started("etl")
+    main.main(profile=profile, report_file=report_file, workbooks=workbooks, startup=startup, resume=resume)
+
+def run_all(profile=None, report_file=None, workbooks=None, resume=None):
+    """
+    model, provision and etl in this process: modules, the extraction cache and (with
+    DB_BACKEND=duckdb) the embedded database are shared by the stages.
+    The run report is the etl stage's.
+    """
+    run_model(report_file="off")
+    run_provision()
+    run_etl(profile=profile, report_file=report_file, workbooks=workbooks, resume=resume)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Financial tracker workflow stages: model, provision, etl.")
+    commands = parser.add_subparsers(dest="command", metavar="{%s}" % ",".join(STAGES))
+    commands.required = True
+
+    model = commands.add_parser("model", help="write the DDL script to DDL_FILE, without connecting")
+    model.add_argument("--report", help="run report path, or off (default RUN_REPORT_FILE)")
+
+    provision = commands.add_parser("provision", help="apply the DDL script to the database")
+    provision.add_argument("--ddl", help="DDL script to apply (default DDL_FILE)")
+
+    for name, help_text in (("etl", "load the workbook(s) into the database"),
+                            ("all", "model, provision and etl in one process")):
+        sub = commands.add_parser(name, help=help_text)
+        sub.add_argument("--profile", choices=["off", "cprofile", "sample"], help="profile the run (default ETL_PROFILE)")
+        sub.add_argument("--report", help="run report path, or off (default RUN_REPORT_FILE)")
+        sub.add_argument("--workbooks", help="directory or glob of workbooks to load in one batch (default EXCEL_SOURCES)")
+        sub.add_argument("--resume", action="store_true", default=None,
+                         help="skip tables already loaded and continue partial ones (default ETL_RESUME)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_logging()
+    if args.command == "model":
+        run_model(report_file=args.report)
+    elif args.command == "provision":
+        run_provision(args.ddl)
+    elif args.command == "etl":
+        run_etl(profile=args.profile, report_file=args.report, workbooks=args.workbooks, resume=args.resume)
+    else:
+        run_all(profile=args.profile, report_file=args.report, workbooks=args.workbooks, resume=args.resume)
+
+if __name__ == "__main__":
+    main()
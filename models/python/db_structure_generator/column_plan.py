@@ -0,0 +1,193 @@
+"""
+Column plan: data-driven typing of a sheet.
+Each column is profiled once (distinct values only) and the result is a SheetPlan
+shared by ddl_builder.build_create_table (column types) and the ETL (one converter
+per column), so types are never re-inferred per cell.
+"""
+
+import logging
+import re
+from typing import NamedTuple, Optional, Tuple
+from config import MONEY_SCALE
+from utils import infer_column_type, sanitize_identifier, parse_date_column, parse_money_column
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# values that look like amounts ("12.345,67 €", "-12345.6"); anything else is text
+_NUMERIC_TEXT_RE = re.compile(r"^\s*-?\s*€?\s*\d[\d.,' ]*\s*€?\s*$")
+
+_INTEGER_TYPES = (("SMALLINT", 2 ** 15), ("INTEGER", 2 ** 31), ("BIGINT", 2 ** 63))
+
+class ColumnPlan(NamedTuple):
+    """
+    Type of one column.
+    kind: INTEGER, DECIMAL, DATE, BOOLEAN or STRING (the infer_column_type kinds)
+    sql_type: Postgres type of the column (date columns are INTEGER FKs outside dates.dates)
+    scale: decimal places of DECIMAL columns
+    """
+    name: str
+    kind: str
+    sql_type: str
+    scale: int = 0
+    primary_key: bool = False
+
+class SheetPlan(NamedTuple):
+    """
+    Column plans of schema.table, in sheet order.
+    partition_column: date column the table is range-partitioned on (None: not partitioned)
+    """
+    schema: str
+    table: str
+    columns: Tuple[ColumnPlan, ...]
+    partition_column: Optional[str] = None
+
+    @property
+    def names(self):
+        return [c.name for c in self.columns]
+
+    def date_columns(self):
+        return [c.name for c in self.columns if c.kind == "DATE"]
+
+def _is_dates_table(schema, table):
+    return sanitize_identifier(schema) == "dates" and sanitize_identifier(table) == "dates"
+
+def _integer_type(lo, hi, minimum="SMALLINT"):
+    """
+    Narrowest integer type holding [lo, hi], not narrower than minimum.
+    """
+    names = [t for t, _ in _INTEGER_TYPES]
+    for name, bound in _INTEGER_TYPES[names.index(minimum):]:
+        if -bound <= lo and hi < bound:
+            return name
+    return "NUMERIC(%d,0)" % max(len(str(abs(lo))), len(str(abs(hi))))
+
+def _varchar_type(max_len):
+    """
+    VARCHAR(50) (the historical default) up to 50 chars, VARCHAR(255) up to 255, TEXT beyond.
+    """
+    if max_len <= 50:
+        return "VARCHAR(50)"
+    if max_len <= 255:
+        return "VARCHAR(255)"
+    return "TEXT"
+
+def _column(name, kind, sql_type, scale=0, dates_table=False):
+    if kind == "DATE" and not dates_table:
+        # altrove le date sono FK verso dates.dates(date_id)
+        sql_type = "INTEGER"
+    return ColumnPlan(name, kind, sql_type, scale, name.lower() == "id")
+
+def plan_from_names(schema: str, table: str, columns):
+    """
+    Name-only plan (no values to profile), using infer_column_type on the headers:
+    ids INTEGER, *date* columns DATE, everything else VARCHAR(50).
+    """
+    dates_table = _is_dates_table(schema, table)
+    plans = []
+    for col in columns:
+        kind = infer_column_type(col)
+        sql_type = {"INTEGER": "INTEGER", "DATE": "DATE", "STRING": "VARCHAR(50)"}[kind]
+        plans.append(_column(col, kind, sql_type, dates_table=dates_table))
+    return SheetPlan(schema, table, tuple(plans))
+
+def profile_column(name: str, series, dates_table: bool = False, sample: bool = False) -> ColumnPlan:
+    """
+    Scan the distinct values of one column and return the narrowest correct ColumnPlan.
+    Header hints still apply (id columns are INTEGER, *date* columns DATE when their
+    values parse as dates). Other numeric columns are amounts and always get
+    DECIMAL(18,MONEY_SCALE), whatever the values and the mode. sample=True means series
+    is only the first part of the sheet (streaming): text then gets TEXT, so later rows
+    still fit.
+    """
+    import pandas as pd
+    name_kind = infer_column_type(name)
+    values = series.dropna()
+    uniques = pd.unique(values)
+    if values.dtype == object:
+        uniques = pd.unique(pd.Series([v for v in uniques if not (isinstance(v, str) and v.strip() == "")], dtype=object))
+
+    if len(uniques) == 0:
+        # nothing to profile: trust the header, empty columns are amounts to be filled in
+        if name_kind == "STRING":
+            return _column(name, "DECIMAL", "DECIMAL(18,%d)" % MONEY_SCALE, MONEY_SCALE)
+        return _column(name, name_kind, name_kind, dates_table=dates_table)
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return _column(name, "DATE", "DATE", dates_table=dates_table)
+    if name_kind == "DATE":
+        dates, _ = parse_date_column(uniques.tolist())
+        if all(d is not None for d in dates):
+            return _column(name, "DATE", "DATE", dates_table=dates_table)
+        logger.info("Column %s: header says date but values don't parse, profiling values", name)
+
+    if pd.api.types.is_bool_dtype(values) or all(isinstance(v, bool) for v in uniques.tolist()):
+        return _column(name, "BOOLEAN", "BOOLEAN")
+
+    numeric = pd.api.types.is_numeric_dtype(values) or all(
+        not isinstance(v, bool) and (isinstance(v, (int, float)) or (
+            isinstance(v, str) and _NUMERIC_TEXT_RE.match(v) is not None))
+        for v in uniques.tolist()
+    )
+    if numeric:
+        try:
+            rng = _numeric_range(values, uniques)
+        except ValueError:
+            # beyond DECIMAL(18,MONEY_SCALE)
+            return _column(name, "DECIMAL", "NUMERIC", MONEY_SCALE)
+        if rng is not None:
+            lo, hi, scale = rng
+            if name.lower() == "id" or (scale == 0 and name_kind == "INTEGER"):
+                return _column(name, "INTEGER", _integer_type(lo, hi, "INTEGER"))
+            # importi: scala fissa, il tipo non dipende dai valori di oggi né dalla modalità
+            return _column(name, "DECIMAL", "DECIMAL(18,%d)" % MONEY_SCALE, MONEY_SCALE)
+
+    if sample:
+        return _column(name, "STRING", "TEXT")
+    max_len = int(pd.Series(uniques).astype(str).str.len().max())
+    return _column(name, "STRING", _varchar_type(max_len))
+
+def _numeric_range(values, uniques):
+    """
+    (min, max, scale) of a numeric column, scale being the decimal places actually
+    used (at most MONEY_SCALE, float noise is rounded away). None if some text value
+    doesn't parse as an amount; ValueError if values don't fit DECIMAL(18,MONEY_SCALE).
+    """
+    import pandas as pd
+    if pd.api.types.is_integer_dtype(values):
+        return int(values.min()), int(values.max()), 0
+    scaled, null = parse_money_column(pd.Series(uniques), MONEY_SCALE)
+    if null.any():
+        return None
+    factor = 10 ** MONEY_SCALE
+    scale = next(s for s in range(MONEY_SCALE + 1) if not (scaled % 10 ** (MONEY_SCALE - s)).any())
+    return int(scaled.min()) // factor, -(-int(scaled.max()) // factor), scale
+
+def sheet_columns(df):
+    """
+    Yield (column_name, series) for the stripped header names of df. A header that is
+    not stripped in the frame itself yields an all-None series (its lookup never matched).
+    """
+    import pandas as pd
+    positions = {}
+    for i, c in enumerate(df.columns):
+        positions.setdefault(c, i)
+    for col in (str(c).strip() for c in df.columns):
+        if col not in positions:
+            yield col, pd.Series([None] * len(df), dtype=object)
+        else:
+            yield col, df.iloc[:, positions[col]]
+
+def build_sheet_plan(schema: str, table: str, df, sample: bool = False) -> SheetPlan:
+    """
+    Profile every column of df once and return the SheetPlan of schema.table.
+    """
+    dates_table = _is_dates_table(schema, table)
+    with metrics.stage("plan", metrics.table_name(schema, table), len(df)):
+        plan = SheetPlan(schema, table, tuple(
+            profile_column(col, series, dates_table=dates_table, sample=sample) for col, series in sheet_columns(df)
+        ))
+    logger.info(
+        "Column plan %s.%s: %s", schema, table, ", ".join("%s %s" % (c.name, c.sql_type) for c in plan.columns)
+    )
+    return plan
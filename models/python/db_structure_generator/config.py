@@ -13,5 +13,80 @@ PGUSER = os.getenv("PGUSER", "neondb_owner")
 PGPASSWORD = os.getenv("PGPASSWORD", "npg_q2vBgXHbn1ix")
 PGPORT = int(os.getenv("PGPORT", 5432))
 
+# storage backend: "postgres" (the PG* server) or "duckdb" (embedded database file, for local runs)
+DB_BACKEND = os.getenv("DB_BACKEND", "postgres").lower()
+# database file of the duckdb backend (":memory:" keeps the database in memory for the process)
+DUCKDB_PATH = os.getenv("DUCKDB_PATH", "../../../data/financial_tracker.duckdb")
+
 EXCEL_FILE = os.getenv("EXCEL_FILE", "../../../data/financialTracker.xlsx")
+# multi-workbook batch: a directory or glob of workbooks loaded in one run instead of EXCEL_FILE
+EXCEL_SOURCES = os.getenv("EXCEL_SOURCES", "")
+# column tagging every row of a multi-workbook batch with the file it came from
+SOURCE_COLUMN = os.getenv("SOURCE_COLUMN", "source_workbook")
 LOG_FILE = os.getenv("LOG_FILE", "logs/financial_etl.log")
+# compiled DDL script (ddl_plan.py), written on every batch run ("off" to skip writing it)
+DDL_FILE = os.getenv("DDL_FILE", "../../../sql/ddl/financial_tracker_ddl.sql")
+
+# bulk load path used by db.bulk_insert: "insert" (execute_values), "copy" (COPY text) or "copy_binary"
+BULK_LOAD_METHOD = os.getenv("BULK_LOAD_METHOD", "insert").lower()
+# COPY buffers stay in memory up to this size, then spill to a temporary file
+COPY_SPOOL_MAX_BYTES = int(os.getenv("COPY_SPOOL_MAX_BYTES", 64 * 1024 * 1024))
+# rows converted, date-resolved and written at a time by a load: the memory ceiling of a table load
+LOAD_CHUNK_ROWS = int(os.getenv("LOAD_CHUNK_ROWS", 10000))
+# rows per INSERT page of the "insert" method: the page size adapts within these bounds to
+# the measured round-trip time and server cost per row (equal bounds fix it)
+BATCH_MIN_ROWS = int(os.getenv("BATCH_MIN_ROWS", 1000))
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", 20000))
+# share of a page's time the round trip may take: lower means bigger pages on slow links
+BATCH_RTT_SHARE = float(os.getenv("BATCH_RTT_SHARE", 0.1))
+
+# connection pool shared by every db helper during a run
+POOL_MIN_CONN = int(os.getenv("POOL_MIN_CONN", 1))
+POOL_MAX_CONN = int(os.getenv("POOL_MAX_CONN", 4))
+# one transaction for the whole run: DDL, calendar fills and loads commit or roll back together
+ETL_SINGLE_TRANSACTION = os.getenv("ETL_SINGLE_TRANSACTION", "false").lower() in ("1", "true", "yes")
+
+# bulk load: tables are created without foreign keys, which are added (with the date
+# indexes, always built after the load) once the data is in
+ETL_BULK_LOAD = os.getenv("ETL_BULK_LOAD", "false").lower() in ("1", "true", "yes")
+# missing foreign keys are added NOT VALID, then VALIDATEd (rows are checked without blocking writes)
+FK_NOT_VALID = os.getenv("FK_NOT_VALID", "true").lower() in ("1", "true", "yes")
+# sheets with at least this many rows are range-partitioned on their date column (0 disables it);
+# each partition holds PARTITION_MONTHS calendar months of date_ids (YYYYMMDD keys)
+PARTITION_MIN_ROWS = int(os.getenv("PARTITION_MIN_ROWS", 0))
+PARTITION_MONTHS = int(os.getenv("PARTITION_MONTHS", 12))
+
+# "full" replaces every row of the tables; "incremental" fingerprints sheets/rows and merges only changes
+LOAD_MODE = os.getenv("LOAD_MODE", "full").lower()
+# full loads go through the load journal: they skip the tables it marks done and continue
+# partial ones from their last committed chunk (same as --resume; pandas loads of EXCEL_FILE only)
+ETL_RESUME = os.getenv("ETL_RESUME", "false").lower() in ("1", "true", "yes")
+
+# "pandas" reads the whole workbook up front; "stream" reads sheet by sheet in row chunks;
+# "pipeline" streams too, with reading, conversion, dates and writes overlapping in threads
+EXTRACT_MODE = os.getenv("EXTRACT_MODE", "pandas").lower()
+EXTRACT_CHUNK_ROWS = int(os.getenv("EXTRACT_CHUNK_ROWS", 5000))
+# chunks each pipeline queue can hold before the stage feeding it blocks
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 2))
+
+# on-disk cache of parsed workbooks: "on", "off" or "refresh" (re-parse and overwrite)
+EXTRACT_CACHE = os.getenv("EXTRACT_CACHE", "on").lower()
+EXTRACT_CACHE_DIR = os.getenv("EXTRACT_CACHE_DIR", ".cache/extract")
+EXTRACT_CACHE_MAX_BYTES = int(os.getenv("EXTRACT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# per-table scheduling after the dates dimension: "sequential", "thread" or "process"
+ETL_PARALLEL = os.getenv("ETL_PARALLEL", "thread").lower()
+ETL_WORKERS = int(os.getenv("ETL_WORKERS", 4))
+
+# distinct date strings memoized by utils.parse_date_column
+DATE_PARSE_CACHE_SIZE = int(os.getenv("DATE_PARSE_CACHE_SIZE", 4096))
+
+# monetary columns: "decimal" (one Decimal per cell) or "fixed" (scaled int64 columns)
+MONEY_REPR = os.getenv("MONEY_REPR", "decimal").lower()
+MONEY_SCALE = int(os.getenv("MONEY_SCALE", 4))
+
+# JSON run report written at the end of main (default: run_report.json next to the log; "off" disables it)
+RUN_REPORT_FILE = os.getenv("RUN_REPORT_FILE", os.path.join(os.path.dirname(LOG_FILE), "run_report.json"))
+# profiler around the whole run: "off", "cprofile" or "sample"; the profile is dumped next to the log
+ETL_PROFILE = os.getenv("ETL_PROFILE", "off").lower()
+ETL_PROFILE_INTERVAL_MS = float(os.getenv("ETL_PROFILE_INTERVAL_MS", 5))
@@ -0,0 +1,168 @@
+"""
+COPY encoders: serialize row tuples into PostgreSQL COPY text or binary format.
+Used by db.bulk_insert when the COPY load path is selected.
+"""
+
+import struct
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+PGCOPY_TRAILER = struct.pack("!h", -1)
+
+_PG_EPOCH = date(2000, 1, 1).toordinal()
+
+_TEXT_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    "\t": "\\t",
+    "\n": "\\n",
+    "\r": "\\r",
+})
+
+
+def _text_value(val):
+    """
+    Render a single value for COPY text format (NULL as \\N).
+    """
+    if val is None:
+        return "\\N"
+    if isinstance(val, bool):
+        return "t" if val else "f"
+    if isinstance(val, (int, float, Decimal)):
+        return str(val)
+    if isinstance(val, (date, datetime)):
+        return val.isoformat()
+    return str(val).translate(_TEXT_ESCAPES)
+
+
+def encode_text_rows(rows):
+    """
+    Yield COPY text format lines (bytes) for an iterable of tuples.
+    """
+    for row in rows:
+        yield ("\t".join([_text_value(v) for v in row]) + "\n").encode("utf-8")
+
+
+def _encode_numeric(val):
+    """
+    Encode a value as PostgreSQL binary NUMERIC (length-prefixed, base 10000 digits).
+    Plain numeric text such as '-123.4500' (fixed-point money columns) is encoded
+    straight from its digits, without building a Decimal.
+    """
+    if isinstance(val, str) and val and val not in ("NaN", "nan"):
+        body = val[1:] if val[0] == "-" else val
+        int_part, _, frac_part = body.partition(".")
+        return _encode_scaled(int(int_part + frac_part or "0"), len(frac_part), val[0] == "-")
+    if not isinstance(val, Decimal):
+        val = Decimal(str(val))
+    if val.is_nan():
+        return _NUMERIC_NAN
+    if val.is_infinite():
+        raise ValueError("Infinite values are not supported in NUMERIC columns")
+
+    sign, digits, exp = val.as_tuple()
+    n = int("".join(map(str, digits)) or "0")
+    if exp > 0:
+        n *= 10 ** exp
+    return _encode_scaled(n, -exp if exp < 0 else 0, bool(sign))
+
+
+def _encode_scaled(n, dscale, negative):
+    """
+    Encode the non-negative integer n, read with dscale fractional digits, as NUMERIC.
+    """
+    # scale the value so the fractional part fills whole base-10000 digits
+    frac_groups = (dscale + 3) // 4
+    n *= 10 ** (frac_groups * 4 - dscale)
+
+    groups = []
+    while n:
+        n, g = divmod(n, 10000)
+        groups.append(g)
+    if not groups:
+        return _NUMERIC_HEADER.pack(8, 0, 0, 0, dscale)
+    weight = len(groups) - 1 - frac_groups
+    # strip trailing (least significant) zero groups
+    lead = 0
+    while groups[lead] == 0:
+        lead += 1
+    groups = groups[lead:]
+    groups.reverse()
+    nd = len(groups)
+    sign = 0x4000 if negative else 0
+    return _NUMERIC_HEADER.pack(8 + 2 * nd, nd, weight, sign, dscale) + struct.pack("!%dh" % nd, *groups)
+
+
+def _pg_int(val):
+    """
+    Coerce to int the way Postgres casts numeric to integer (round half away from zero).
+    """
+    if isinstance(val, int):
+        return val
+    return int(Decimal(str(val)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def _encode_date(val):
+    if isinstance(val, datetime):
+        val = val.date()
+    elif isinstance(val, str):
+        val = date.fromisoformat(val)
+    return _INT_FIELD.pack(4, val.toordinal() - _PG_EPOCH)
+
+
+def _encode_text(val):
+    data = str(val).encode("utf-8")
+    return _LENGTH.pack(len(data)) + data
+
+
+_LENGTH = struct.Struct("!i")
+_INT_FIELD = struct.Struct("!ii")
+_NUMERIC_HEADER = struct.Struct("!ihhHH")
+_NUMERIC_NAN = _NUMERIC_HEADER.pack(8, 0, 0, 0xC000, 0)
+_SMALLINT_FIELD = struct.Struct("!ih")
+_BIGINT_FIELD = struct.Struct("!iq")
+_DOUBLE_FIELD = struct.Struct("!id")
+_REAL_FIELD = struct.Struct("!if")
+_BOOL_FIELD = struct.Struct("!i?")
+
+# every encoder returns the complete field: int32 length followed by the data
+_BINARY_ENCODERS = {
+    "smallint": lambda v: _SMALLINT_FIELD.pack(2, _pg_int(v)),
+    "integer": lambda v: _INT_FIELD.pack(4, _pg_int(v)),
+    "bigint": lambda v: _BIGINT_FIELD.pack(8, _pg_int(v)),
+    "numeric": _encode_numeric,
+    "double precision": lambda v: _DOUBLE_FIELD.pack(8, float(v)),
+    "real": lambda v: _REAL_FIELD.pack(4, float(v)),
+    "boolean": lambda v: _BOOL_FIELD.pack(1, bool(v)),
+    "date": _encode_date,
+    "text": _encode_text,
+    "character varying": _encode_text,
+    "character": _encode_text,
+}
+
+
+def binary_encoders(pg_types):
+    """
+    Return one encoder per column given the Postgres type names
+    (as returned by `atttypid::regtype::text`).
+    """
+    encoders = []
+    for t in pg_types:
+        base = t.split("(")[0].strip()
+        if base not in _BINARY_ENCODERS:
+            raise ValueError("Binary COPY does not support column type %r" % t)
+        encoders.append(_BINARY_ENCODERS[base])
+    return encoders
+
+
+def encode_binary_rows(rows, encoders):
+    """
+    Yield COPY binary format chunks (bytes): header, one chunk per tuple, trailer.
+    """
+    n_fields = len(encoders)
+    field_count = struct.pack("!h", n_fields)
+    null_field = struct.pack("!i", -1)
+    yield PGCOPY_HEADER
+    for row in rows:
+        yield field_count + b"".join([null_field if val is None else enc(val) for enc, val in zip(encoders, row)])
+    yield PGCOPY_TRAILER
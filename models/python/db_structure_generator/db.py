@@ -1,89 +1,662 @@
 """
 Database utilities: connection and execution helpers.
+The storage backend is chosen by DB_BACKEND: Postgres (implemented here) or the
+embedded DuckDB database of embedded_db.py, behind the same helpers.
 """
 
 import psycopg2
+import psycopg2.extensions
 from psycopg2.extras import execute_values
 from psycopg2 import sql
+from psycopg2 import pool as pg_pool
+import atexit
+import itertools
 import logging
-from config import PGHOST, PGDATABASE, PGUSER, PGPASSWORD, PGPORT
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from config import (
+    PGHOST, PGDATABASE, PGUSER, PGPASSWORD, PGPORT, BULK_LOAD_METHOD, COPY_SPOOL_MAX_BYTES,
+    POOL_MIN_CONN, POOL_MAX_CONN, ETL_SINGLE_TRANSACTION, LOAD_CHUNK_ROWS, DB_BACKEND,
+    BATCH_MIN_ROWS, BATCH_MAX_ROWS, BATCH_RTT_SHARE
+)
+from ddl_plan import render_sql
+from ddl_builder import build_create_dates_table
+from copy_encoder import encode_text_rows, encode_binary_rows, binary_encoders
+import embedded_db
+import metrics
 
 logger = logging.getLogger(__name__)
 
+if DB_BACKEND not in ("postgres", "duckdb"):
+    raise ValueError("Unknown DB_BACKEND: %r" % DB_BACKEND)
+
+# what each backend implements beyond tables, loads and transactions
+_FEATURES = {
+    "postgres": {"foreign_keys", "partitioning", "processes"},
+    # no ALTER TABLE ... ADD FOREIGN KEY, no partitions, and the database file is
+    # locked by the process that opened it
+    "duckdb": set(),
+}
+
+def supports(feature):
+    """
+    True if the DB_BACKEND backend implements feature: "foreign_keys", "partitioning",
+    "incremental" (LOAD_MODE=incremental) or "processes" (loads from worker processes).
+    """
+    return feature in _FEATURES[DB_BACKEND]
+
+def embedded():
+    """
+    True when running on the embedded DuckDB backend.
+    """
+    return DB_BACKEND == "duckdb"
+
+class CountingCursor(psycopg2.extensions.cursor):
+    """
+    Cursor that reports every round trip and the bytes sent to metrics.add_io
+    (execute_values pages included: it calls execute once per page).
+    """
+    def execute(self, query, vars=None):
+        try:
+            return super().execute(query, vars)
+        finally:
+            metrics.add_io(1, len(self.query or b""))
+
+    def executemany(self, query, vars_list):
+        vars_list = list(vars_list)
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            metrics.add_io(len(vars_list), len(self.query or b"") * len(vars_list))
+
+    def copy_expert(self, sql, file, size=8192):
+        start = file.tell() if hasattr(file, "tell") else 0
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            sent = file.tell() - start if hasattr(file, "tell") else 0
+            metrics.add_io(1, len(sql) + sent)
+
 def get_connection():
     """
-    Return a new psycopg2 connection.
+    Return a new psycopg2 connection (an embedded_db connection with DB_BACKEND=duckdb).
     """
+    if embedded():
+        return embedded_db.get_connection()
     conn = psycopg2.connect(
         host=PGHOST,
         database=PGDATABASE,
         user=PGUSER,
         password=PGPASSWORD,
-        port=PGPORT
+        port=PGPORT,
+        cursor_factory=CountingCursor
     )
     conn.autocommit = True
     return conn
 
-def exec_statements(statements):
+# run-scoped connection pool (created lazily, bounded by POOL_MAX_CONN)
+_pool = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+# connection shared by every helper while a single-transaction run is active
+_run_conn = None
+# connection pinned to the current worker thread (see worker_connection)
+_local = threading.local()
+# pools inherited from a parent process, kept referenced so they are never finalized here
+_inherited = []
+
+def get_pool():
+    """
+    Return the process-wide connection pool, creating it on first use.
+    """
+    global _pool, _pool_slots
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            if embedded():
+                _pool = embedded_db.EmbeddedPool()
+                _pool_slots = threading.BoundedSemaphore(POOL_MAX_CONN)
+                return _pool
+            _pool = pg_pool.ThreadedConnectionPool(
+                POOL_MIN_CONN,
+                POOL_MAX_CONN,
+                host=PGHOST,
+                database=PGDATABASE,
+                user=PGUSER,
+                password=PGPASSWORD,
+                port=PGPORT,
+                cursor_factory=CountingCursor
+            )
+            # getconn() raises when the pool is exhausted: block on a semaphore instead
+            _pool_slots = threading.BoundedSemaphore(POOL_MAX_CONN)
+            logger.debug("Opened connection pool (min=%d, max=%d)", POOL_MIN_CONN, POOL_MAX_CONN)
+        return _pool
+
+def close_pool():
     """
-    Execute a list of SQL (psycopg2.sql.SQL or strings).
+    Close every pooled connection. The next borrow opens a new pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+            logger.debug("Closed connection pool")
+        _pool = None
+
+atexit.register(close_pool)
+
+def reset_pool_after_fork():
     """
-    conn = get_connection()
+    Forget the pool inherited from a parent process without closing its sockets
+    (they still belong to the parent). The worker opens its own pool on first use.
+    """
+    global _pool, _pool_slots, _run_conn
+    if _pool is not None:
+        _inherited.append(_pool)
+    _pool = None
+    _pool_slots = None
+    _run_conn = None
+    _local.conn = None
+
+@contextmanager
+def connection():
+    """
+    Borrow a connection for the duration of the block.
+    Inside a single-transaction run the run's connection is returned (commit/rollback
+    are handled by run_session); otherwise an autocommit connection is taken from the pool.
+    """
+    if _run_conn is not None:
+        yield _run_conn
+        return
+    pinned = getattr(_local, "conn", None)
+    if pinned is not None:
+        yield pinned
+        return
+
+    p = get_pool()
+    slots = _pool_slots
+    slots.acquire()
     try:
-        with conn.cursor() as cur:
-            for st in statements:
-                logger.debug("Executing SQL: %s", st.as_string(cur) if hasattr(st, 'as_string') else st)
-                if hasattr(st, 'as_string'):
-                    cur.execute(st)
-                else:
-                    cur.execute(st)
+        conn = p.getconn()
+        if conn.closed:
+            # dropped by the server/pooler while idle
+            p.putconn(conn, close=True)
+            conn = p.getconn()
+        try:
+            conn.autocommit = True
+            yield conn
+        finally:
+            p.putconn(conn, close=bool(conn.closed))
     finally:
-        conn.close()
+        slots.release()
 
-def upsert_dates(date_list):
+@contextmanager
+def worker_connection():
     """
-    Insert dates into dates.dates if they don't exist and return mapping {date_iso: date_id}.
-    date_list: iterable of datetime.date
+    Pin one pooled connection to the current thread for the duration of the block,
+    so every helper called by a worker reuses the same connection.
+    """
+    if _run_conn is not None or getattr(_local, "conn", None) is not None:
+        yield
+        return
+    with connection() as conn:
+        _local.conn = conn
+        try:
+            yield
+        finally:
+            _local.conn = None
+
+@contextmanager
+def run_session(single_transaction=None):
     """
-    conn = get_connection()
-    mapping = {}
+    Scope a whole ETL run: every helper borrows from the same pool, which is closed at the end.
+    With single_transaction (default config.ETL_SINGLE_TRANSACTION) DDL, calendar fills and
+    all table loads share one connection and commit together or roll back together.
+    The calendar years filled by earlier runs of the process are checked again.
+    """
+    global _run_conn
+    _calendar_years.clear()
+    if single_transaction is None:
+        single_transaction = ETL_SINGLE_TRANSACTION
+    if not single_transaction:
+        try:
+            yield
+        finally:
+            close_pool()
+        return
+
+    p = get_pool()
+    # the run's connection counts against POOL_MAX_CONN like any other borrow
+    slots = _pool_slots
+    slots.acquire()
     try:
-        with conn.cursor() as cur:
-            # ensure table exists
-            cur.execute("CREATE SCHEMA IF NOT EXISTS dates;")
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS dates.dates (
-                    date_id SERIAL PRIMARY KEY,
-                    date DATE UNIQUE
-                );
-            """)
-            # insert unique dates using ON CONFLICT DO NOTHING
-            rows = [(d.isoformat(),) for d in set(d for d in date_list if d is not None)]
-            if rows:
-                insert_sql = "INSERT INTO dates.dates (date) VALUES %s ON CONFLICT (date) DO NOTHING"
-                execute_values(cur, insert_sql, rows)
-            # fetch ids
-            cur.execute("SELECT date, date_id FROM dates.dates WHERE date IN %s;", (tuple(d.isoformat() for d in set(d for d in date_list if d is not None)),))
-            for r in cur.fetchall():
-                mapping[r[0]] = r[1]
+        conn = p.getconn()
+        conn.autocommit = False
+        _run_conn = conn
+        try:
+            yield
+            conn.commit()
+            logger.info("Run committed")
+        except BaseException:
+            conn.rollback()
+            logger.error("Run rolled back")
+            raise
+        finally:
+            _run_conn = None
+            p.putconn(conn, close=True)
     finally:
-        conn.close()
-    return mapping
+        slots.release()
+        close_pool()
+
+@contextmanager
+def advisory_lock(name):
+    """
+    Hold a Postgres advisory lock on name (e.g. "needs.rents") for the block, on the
+    connection pinned to this thread: concurrent runs locking the same name wait for
+    each other. Inside a single-transaction run the lock is released at commit.
+    The embedded backend needs none: its database file is locked by one process.
+    """
+    if embedded():
+        yield
+        return
+    key = "financial_etl:%s" % name
+    with worker_connection(), connection() as conn:
+        session = conn is not _run_conn
+        with conn.cursor() as cur:
+            if session:
+                cur.execute("SELECT pg_advisory_lock(hashtextextended(%s, 0))", (key,))
+            else:
+                cur.execute("SELECT pg_advisory_xact_lock(hashtextextended(%s, 0))", (key,))
+        logger.debug("Advisory lock %s taken", key)
+        try:
+            yield
+        finally:
+            if session and not conn.closed:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(hashtextextended(%s, 0))", (key,))
+
+@contextmanager
+def transaction():
+    """
+    Borrow a connection and run the block in a transaction (commit on success, rollback on error).
+    Inside a single-transaction run the run's connection is used and left to run_session.
+    """
+    with connection() as conn:
+        if conn is _run_conn:
+            yield conn
+            return
+        conn.autocommit = False
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.autocommit = True
 
-def bulk_insert(schema, table, columns, rows, page_size=1000):
+def exec_statements(statements, grouped=False):
+    """
+    Execute a list of SQL (psycopg2.sql.SQL or strings), one round trip each.
+    grouped: send them in one round trip instead, as a multi-statement query (on an
+    autocommit connection Postgres runs it as one implicit transaction: all or none).
+    """
+    with connection() as conn:
+        with conn.cursor() as cur:
+            if grouped and len(statements) > 1 and not embedded():
+                script = ";\n".join(render_sql(st).rstrip().rstrip(";") for st in statements)
+                logger.debug("Executing SQL group: %s", script)
+                cur.execute(script)
+                return
+            for st in statements:
+                # rendered client-side: as_string() needs a psycopg2 cursor
+                logger.debug("Executing SQL: %s", render_sql(st))
+                cur.execute(st)
+
+def in_run_transaction():
+    """
+    True while a single-transaction run (run_session) is active.
     """
-    Bulk insert rows (iterable of tuples) into schema.table using execute_values.
+    return _run_conn is not None
+
+def exec_script(script):
+    """
+    Send a multi-statement SQL script to the server in one round trip (simple query
+    protocol). A script wrapped in BEGIN ... COMMIT is atomic on its own; inside a
+    single-transaction run pass the bare statements, they join the run's transaction.
+    """
+    with connection() as conn:
+        with conn.cursor() as cur:
+            logger.debug("Executing script (%d bytes)", len(script))
+            cur.execute(script)
+
+# every day of [first, last] with its YYYYMMDD key and calendar attributes; days already
+# there (by key or by date) are skipped
+_CALENDAR_FILL = """
+INSERT INTO dates.dates (date_id, date, year, quarter, month, month_name)
+SELECT to_char(d, 'YYYYMMDD')::integer, d::date, extract(year FROM d)::smallint,
+       extract(quarter FROM d)::smallint, extract(month FROM d)::smallint, to_char(d, 'FMMonth')
+FROM generate_series(%s::date, %s::date, interval '1 day') AS d
+ON CONFLICT DO NOTHING
+"""
+
+# calendar years known to be in dates.dates, filled once per process (forked workers inherit them)
+_calendar_years = set()
+_calendar_lock = threading.Lock()
+
+def ensure_calendar(date_list):
+    """
+    Make sure dates.dates holds every day of the calendar years of date_list (iterable of
+    datetime.date): the missing years (and the gaps between them) are filled in one
+    round trip, together with the CREATE of the dimension. date_ids are YYYYMMDD keys the
+    loads compute themselves (etl.date_key), so nothing is ever read back.
+    Returns the number of years filled by this call (0: nothing sent).
+    """
+    years = {d.year for d in date_list if d is not None}
+    with _calendar_lock:
+        missing = sorted(years - _calendar_years)
+        if not missing:
+            return 0
+        first, last = date(missing[0], 1, 1), date(missing[-1], 12, 31)
+        with connection() as conn:
+            with conn.cursor() as cur:
+                if embedded():
+                    embedded_db.fill_calendar(cur, first, last)
+                else:
+                    cur.execute(render_sql(build_create_dates_table()) + _CALENDAR_FILL, (first, last))
+        filled = range(missing[0], missing[-1] + 1)
+        _calendar_years.update(filled)
+    logger.info("Calendar filled from %s to %s", first, last)
+    return len(filled)
+
+def get_column_types(cur, schema, table, columns):
+    """
+    Return the Postgres type names (regtype text) of the given columns of schema.table.
+    """
+    target = sql.SQL("{}.{}").format(sql.Identifier(schema), sql.Identifier(table)).as_string(cur)
+    cur.execute(
+        """
+        SELECT attname, atttypid::regtype::text
+        FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+        """,
+        (target,)
+    )
+    types = dict(cur.fetchall())
+    missing = [c for c in columns if c not in types]
+    if missing:
+        raise ValueError("Columns %s not found in %s.%s" % (missing, schema, table))
+    return [types[c] for c in columns]
+
+class CountedRows:
+    """
+    Iterate rows once, counting them (so any iterable can be loaded without len()).
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+def copy_rows(cur, schema, table, columns, rows, binary=False):
+    """
+    Load rows into schema.table with COPY ... FROM STDIN.
+    Rows are encoded into a spooled buffer (in memory up to COPY_SPOOL_MAX_BYTES,
+    then on a temporary file) and streamed to the server in one COPY.
+    Returns the number of rows copied.
+    """
+    cols_sql = sql.SQL(", ").join([sql.Identifier(c) for c in columns])
+    copy_sql = sql.SQL("COPY {}.{} ({}) FROM STDIN WITH (FORMAT {})").format(
+        sql.Identifier(schema), sql.Identifier(table), cols_sql,
+        sql.SQL("binary" if binary else "text")
+    )
+    rows = CountedRows(rows)
+    if binary:
+        chunks = encode_binary_rows(rows, binary_encoders(get_column_types(cur, schema, table, columns)))
+    else:
+        chunks = encode_text_rows(rows)
+
+    with tempfile.SpooledTemporaryFile(max_size=COPY_SPOOL_MAX_BYTES, mode="w+b") as buf:
+        for chunk in chunks:
+            buf.write(chunk)
+        size = buf.tell()
+        buf.seek(0)
+        cur.copy_expert(copy_sql.as_string(cur), buf)
+    logger.debug("COPY %s.%s: %d rows, %d bytes", schema, table, rows.count, size)
+    return rows.count
+
+class BatchSizer:
+    """
+    Page size of the "insert" loads, adapted to the database link: with the round-trip
+    time (a ping, then the fastest page seen) and each table's server cost per row
+    (moving average over its pages), the next page is sized so the round trip takes
+    BATCH_RTT_SHARE of the statement, within BATCH_MIN_ROWS..BATCH_MAX_ROWS and at most
+    4x bigger or smaller than the previous page of the table.
+    """
+    start_rows = 1000
+
+    def __init__(self, min_rows=BATCH_MIN_ROWS, max_rows=BATCH_MAX_ROWS, rtt_share=BATCH_RTT_SHARE):
+        self.min_rows = min_rows
+        self.max_rows = max(min_rows, max_rows)
+        self.rtt_share = rtt_share
+        self.rtt = None
+        self._lock = threading.Lock()
+        # { (schema, table): [seconds per row, last page rows, pages, rows] }
+        self._tables = {}
+
+    def ping(self, cur):
+        """
+        Measure the round trip once per process, before the first adaptive page.
+        """
+        if self.rtt is not None:
+            return
+        start = time.perf_counter()
+        cur.execute("SELECT 1")
+        cur.fetchall()
+        with self._lock:
+            self.rtt = time.perf_counter() - start
+        logger.info("Database round trip: %.1f ms", self.rtt * 1000)
+
+    def size(self, key):
+        with self._lock:
+            entry = self._tables.get(key)
+            if entry is None or self.rtt is None:
+                return min(max(self.start_rows, self.min_rows), self.max_rows)
+            cost, last = entry[0], entry[1]
+            # rtt / (rtt + rows * cost) == rtt_share
+            rows = self.rtt * (1 - self.rtt_share) / (self.rtt_share * max(cost, 1e-9))
+            rows = min(max(rows, last / 4), last * 4)
+            # the bounds win over the 4x step, e.g. after a short last page of a chunk
+            return int(min(max(rows, self.min_rows), self.max_rows))
+
+    def observe(self, key, rows, seconds):
+        with self._lock:
+            self.rtt = seconds if self.rtt is None else min(self.rtt, seconds)
+            cost = (seconds - self.rtt) / rows
+            entry = self._tables.get(key)
+            if entry is None:
+                self._tables[key] = [cost, rows, 1, rows]
+            else:
+                entry[0] = 0.7 * entry[0] + 0.3 * cost
+                entry[1] = rows
+                entry[2] += 1
+                entry[3] += rows
+
+    def stats(self):
+        """
+        Measured round trip and, per table, the pages sent and the last page size.
+        """
+        with self._lock:
+            return {
+                "rtt_ms": round(self.rtt * 1000, 3) if self.rtt is not None else None,
+                "tables": {
+                    metrics.table_name(*key): {"pages": pages, "rows": n, "rows_per_page": round(n / pages),
+                                               "last_page_rows": last}
+                    for key, (_, last, pages, n) in sorted(self._tables.items())
+                },
+            }
+
+# shared by the loads of the process: the link is the same for every table
+_sizer = BatchSizer()
+
+def batch_stats():
+    """
+    Link and page-size statistics of the adaptive "insert" loads (for the run report).
+    """
+    return _sizer.stats()
+
+def load_rows(cur, schema, table, columns, rows, page_size=None, method=None):
+    """
+    Load rows (any iterable, consumed once) into schema.table on an existing cursor
+    with the selected bulk method. Returns the number of rows sent.
+    page_size: rows per INSERT page of the "insert" method; None adapts it to the
+    link (BatchSizer).
+    The embedded backend ignores method: rows are ingested column-wise in one statement.
+    """
+    method = (method or BULK_LOAD_METHOD).lower()
+    if method not in ("insert", "copy", "copy_binary"):
+        raise ValueError("Unknown bulk load method: %r" % method)
+    if embedded():
+        return embedded_db.load_rows(cur, schema, table, columns, rows)
+    if method == "insert":
+        target = sql.Identifier(schema), sql.Identifier(table)
+        cols_sql = sql.SQL(", ").join([sql.Identifier(c) for c in columns])
+        insert_sql = sql.SQL("INSERT INTO {}.{} ({}) VALUES %s").format(target[0], target[1], cols_sql).as_string(cur)
+        key = (schema, table)
+        if page_size is None:
+            _sizer.ping(cur)
+        count = 0
+        it = iter(rows)
+        while True:
+            # one execute_values page per statement, each sized from the pages before it
+            page = list(itertools.islice(it, page_size or _sizer.size(key)))
+            if not page:
+                break
+            start = time.perf_counter()
+            execute_values(cur, insert_sql, page, page_size=len(page))
+            if page_size is None:
+                _sizer.observe(key, len(page), time.perf_counter() - start)
+            count += len(page)
+        return count
+    return copy_rows(cur, schema, table, columns, rows, binary=(method == "copy_binary"))
+
+def load_columns(cur, schema, table, columns, chunks, method=None):
+    """
+    Column-oriented load_rows: chunks is an iterable of column_values (one value list
+    per column, as etl.prepare_table_columns returns them). The embedded backend
+    ingests the columns of each chunk in one call; Postgres sends their rows through
+    load_rows. Returns the number of rows sent.
+    """
+    if embedded():
+        return sum(embedded_db.load_columns(cur, schema, table, columns, values) for values in chunks)
+    rows = (row for column_values in chunks for row in zip(*column_values))
+    return load_rows(cur, schema, table, columns, rows, method=method)
+
+def bulk_insert(schema, table, columns, rows, page_size=None, method=None, chunk_rows=None):
+    """
+    Bulk insert rows (iterable of tuples) into schema.table.
+    rows may be a generator: it is consumed lazily and never materialized whole.
     columns: list of column names
+    method: "insert" (execute_values), "copy" (COPY text) or "copy_binary";
+            defaults to config.BULK_LOAD_METHOD.
+    chunk_rows: COPY methods send one COPY per chunk_rows rows (default LOAD_CHUNK_ROWS),
+            so at most one chunk is buffered; "insert" sends page_size rows per statement
+            (default: adapted to the link, see BatchSizer).
+            The embedded backend ingests chunk_rows rows per statement.
+    Returns the number of rows loaded.
     """
-    conn = get_connection()
-    try:
+    method = (method or BULK_LOAD_METHOD).lower()
+    chunk_rows = chunk_rows or LOAD_CHUNK_ROWS
+    with metrics.stage("load", metrics.table_name(schema, table)) as rec, connection() as conn:
         with conn.cursor() as cur:
-            identifiers = [sql.Identifier(c) for c in columns]
-            target = sql.Identifier(schema), sql.Identifier(table)
-            cols_sql = sql.SQL(", ").join([sql.Identifier(c) for c in columns])
-            insert_prefix = sql.SQL("INSERT INTO {}.{} ({}) VALUES %s").format(target[0], target[1], cols_sql)
-            # chunked insert
-            execute_values(cur, insert_prefix.as_string(cur), rows, page_size=page_size)
-            logger.info("Inserted %d rows into %s.%s", len(rows), schema, table)
-    finally:
-        conn.close()
+            if method == "insert" and not embedded():
+                count = load_rows(cur, schema, table, columns, rows, page_size=page_size, method=method)
+            else:
+                count = 0
+                it = iter(rows)
+                while True:
+                    # the next chunk is pulled (and converted) between COPYs, never during one
+                    chunk = list(itertools.islice(it, chunk_rows))
+                    if not chunk:
+                        break
+                    count += load_rows(cur, schema, table, columns, chunk, method=method)
+            rec["rows"] = count
+            if embedded():
+                logger.info("Loaded %d rows into %s.%s (duckdb)", count, schema, table)
+            elif method == "insert":
+                logger.info("Inserted %d rows into %s.%s", count, schema, table)
+            else:
+                logger.info("Copied %d rows into %s.%s (%s)", count, schema, table, method)
+    return count
+
+def bulk_insert_columns(schema, table, columns, chunks):
+    """
+    bulk_insert for column-oriented chunks (see load_columns), e.g. the converted
+    chunks of a sheet: the embedded backend ingests each chunk's columns in one call,
+    Postgres streams their rows through bulk_insert. Returns the number of rows loaded.
+    """
+    if not embedded():
+        return bulk_insert(schema, table, columns, (row for values in chunks for row in zip(*values)))
+    with metrics.stage("load", metrics.table_name(schema, table)) as rec, connection() as conn:
+        with conn.cursor() as cur:
+            rec["rows"] = count = load_columns(cur, schema, table, columns, chunks)
+    logger.info("Loaded %d rows into %s.%s (duckdb)", count, schema, table)
+    return count
+
+def replace_rows(cur, schema, table, columns, key_columns, rows, delete_keys=(), method=None):
+    """
+    Staging-table merge: replace every row of schema.table whose key matches a staged row
+    (or one of delete_keys) with the staged rows. Must run inside a transaction
+    (see transaction()); the staging tables are dropped at commit.
+    Keys are matched with IS NOT DISTINCT FROM, so NULL keys and duplicate keys are handled.
+    Returns (rows_deleted, rows_inserted).
+    """
+    target = sql.SQL("{}.{}").format(sql.Identifier(schema), sql.Identifier(table))
+    cols_sql = sql.SQL(", ").join([sql.Identifier(c) for c in columns])
+    keys_sql = sql.SQL(", ").join([sql.Identifier(c) for c in key_columns])
+    stage, stage_keys = "_etl_stage", "_etl_stage_keys"
+    match = sql.SQL(" AND ").join([
+        sql.SQL("t.{0} IS NOT DISTINCT FROM k.{0}").format(sql.Identifier(c)) for c in key_columns
+    ])
+
+    if embedded():
+        # no staging tables: the keys are scanned from a DataFrame, the rows inserted directly
+        import pandas as pd
+        rows = list(rows)
+        idx = [columns.index(c) for c in key_columns]
+        keys = pd.DataFrame([tuple(r[i] for i in idx) for r in rows] + [tuple(k) for k in delete_keys],
+                            columns=list(key_columns), dtype=object)
+        deleted = 0
+        if len(keys):
+            cur.execute_frame(sql.SQL("DELETE FROM {} t USING {} k WHERE {}").format(
+                target, sql.Identifier(embedded_db.FRAME_NAME), match), keys.drop_duplicates())
+            deleted = cur.rowcount
+        inserted = load_rows(cur, schema, table, columns, rows) if rows else 0
+        logger.info("Merged %s.%s: %d rows deleted, %d rows inserted", schema, table, deleted, inserted)
+        return deleted, inserted
+
+    cur.execute(sql.SQL("DROP TABLE IF EXISTS pg_temp.{}, pg_temp.{}").format(
+        sql.Identifier(stage), sql.Identifier(stage_keys)))
+    cur.execute(sql.SQL("CREATE TEMP TABLE {} ON COMMIT DROP AS SELECT {} FROM {} WITH NO DATA").format(
+        sql.Identifier(stage), cols_sql, target))
+    load_rows(cur, "pg_temp", stage, columns, rows, method=method)
+
+    cur.execute(sql.SQL("CREATE TEMP TABLE {} ON COMMIT DROP AS SELECT DISTINCT {} FROM pg_temp.{}").format(
+        sql.Identifier(stage_keys), keys_sql, sql.Identifier(stage)))
+    if delete_keys:
+        execute_values(cur, sql.SQL("INSERT INTO pg_temp.{} ({}) VALUES %s").format(
+            sql.Identifier(stage_keys), keys_sql).as_string(cur), list(delete_keys))
+
+    cur.execute(sql.SQL("DELETE FROM {} t USING pg_temp.{} k WHERE {}").format(
+        target, sql.Identifier(stage_keys), match))
+    deleted = cur.rowcount
+    cur.execute(sql.SQL("INSERT INTO {} ({}) SELECT {} FROM pg_temp.{}").format(
+        target, cols_sql, cols_sql, sql.Identifier(stage)))
+    inserted = cur.rowcount
+    logger.info("Merged %s.%s: %d rows deleted, %d rows inserted", schema, table, deleted, inserted)
+    return deleted, inserted
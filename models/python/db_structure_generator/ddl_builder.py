@@ -1,12 +1,13 @@
 """
 DDL builder: produce SQL commands for creating schemas and tables.
 Handles special date formats like 'September-25' by mapping them to DATE
-(via the dates.dates table, which keeps normalized DATE values).
+(via the dates.dates calendar, which keeps normalized DATE values under YYYYMMDD keys).
 """
 
 from psycopg2 import sql
 import logging
-from utils import infer_column_type, sanitize_identifier
+from utils import sanitize_identifier
+from column_plan import plan_from_names
 
 logger = logging.getLogger(__name__)
 
@@ -16,74 +17,235 @@ def build_create_schema(schema_name: str):
     """
     return sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(schema_name))
 
+# attributes of every day of the calendar dimension, filled with it (db.ensure_calendar)
+CALENDAR_COLUMNS = [("year", "SMALLINT"), ("quarter", "SMALLINT"), ("month", "SMALLINT"), ("month_name", "TEXT")]
+
 def build_create_dates_table():
     """
     Return SQL to create dates.dates table.
-    Central dimension for date values.
+    Central calendar dimension: one row per day, keyed by its YYYYMMDD date_id.
     """
+    attributes = ",\n".join("        %s %s NOT NULL" % column for column in CALENDAR_COLUMNS)
     return sql.SQL("""
     CREATE SCHEMA IF NOT EXISTS dates;
     CREATE TABLE IF NOT EXISTS dates.dates (
-        date_id SERIAL PRIMARY KEY,
-        date DATE UNIQUE
+        date_id INTEGER PRIMARY KEY,
+        date DATE NOT NULL UNIQUE,
+%s
     );
-    """)
+    """ % attributes)
 
-def build_create_table(schema: str, table: str, df_columns):
+def build_create_dates_table_from_columns(schema, table, columns, pk_col=None, date_col=None):
     """
-    Build CREATE TABLE SQL for schema.table given df_columns (list of column names).
-    Column typing rules:
-     - INTEGER => INTEGER
-     - DATE => handled with FK to dates.dates
-     - STRING => VARCHAR(50) (default max length)
-     - else => DECIMAL(18,4)
+    Build CREATE TABLE statement for dates table using provided columns.
+
+    Args:
+        schema: Schema name
+        table: Table name  
+        columns: List of column names from the dataframe
+        pk_col: Primary key column name (if None, will use 'date_id')
+        date_col: Date column name (if None, will use 'date')
+
+    Returns:
+        List of SQL statements
     """
-    schema_s = sanitize_identifier(schema)
-    table_s = sanitize_identifier(table)
+    if pk_col is None:
+        pk_col = "date_id"
+    if date_col is None:
+        date_col = "date"
 
-    col_defs = []
-    fk_defs = []
+    # Start building the CREATE TABLE statement with IF NOT EXISTS
+    stmt_parts = [f"CREATE TABLE IF NOT EXISTS {schema}.{table} ("]
 
-    for col in df_columns:
-        col_safe = sanitize_identifier(col)
-        col_type = infer_column_type(col)
+    # YYYYMMDD key computed by the loads (etl.date_key), never generated by the database
+    column_defs = [f"    {pk_col} INTEGER PRIMARY KEY"]
 
-        if col_type == "INTEGER":
-            if col.lower() == "id":
-                col_defs.append(sql.SQL("{} INTEGER PRIMARY KEY").format(sql.Identifier(col_safe)))
-            else:
-                col_defs.append(sql.SQL("{} INTEGER").format(sql.Identifier(col_safe)))
+    # the calendar is filled by date (db.ensure_calendar), with its attributes
+    if date_col not in columns:
+        column_defs.append(f"    {date_col} DATE NOT NULL UNIQUE")
+    calendar = {name for name, _ in CALENDAR_COLUMNS}
 
-        elif col_type == "DATE":
-            if schema_s == "dates" and table_s == "dates":
-                # nella tabella centrale delle date manteniamo DATE
-                col_defs.append(sql.SQL("{} DATE").format(sql.Identifier(col_safe)))
+    # Add other columns
+    for col in columns:
+        if col != pk_col and col.lower() not in calendar:  # Skip pk column as it's already added
+            if col == date_col:
+                column_defs.append(f"    {col} DATE NOT NULL UNIQUE")
+            elif 'date' in col.lower():
+                column_defs.append(f"    {col} DATE")
             else:
-                # altrove usiamo FK alla tabella dates
-                col_defs.append(sql.SQL("{} INTEGER").format(sql.Identifier(col_safe)))
-                fk_name = f"{table_s}_{col_safe}_dates_fk"
-                fk_stmt = sql.SQL(
-                    "ALTER TABLE {}.{} ADD CONSTRAINT {} FOREIGN KEY ({}) REFERENCES dates.dates(date_id);"
-                ).format(
-                    sql.Identifier(schema_s),
-                    sql.Identifier(table_s),
-                    sql.Identifier(fk_name),
-                    sql.Identifier(col_safe)
-                )
-                fk_defs.append(fk_stmt)
-
-        elif col_type == "STRING":
-            # sempre VARCHAR(50) per default
-            col_defs.append(sql.SQL("{} VARCHAR(50)").format(sql.Identifier(col_safe)))
+                column_defs.append(f"    {col} TEXT")
+    column_defs.extend(f"    {name} {sql_type} NOT NULL" for name, sql_type in CALENDAR_COLUMNS)
+
+    stmt_parts.append(",\n".join(column_defs))
+    stmt_parts.append(");")
+
+    return ["\n".join(stmt_parts)]
+
+def detect_dates_columns(columns):
+    """
+    Return (pk_col, date_col) of a dates.dates sheet given its columns.
+    """
+    pk_col = None
+    date_col = None
+    # detect pk column (prefer any column whose name contains 'id' or endswith '_id')
+    for c in columns:
+        if c.lower() == "id" or c.lower().endswith("_id"):
+            pk_col = c
+            break
+    # detect the column that is date-like
+    for c in columns:
+        if "date" in c.lower():
+            date_col = c
+            break
+    # If no pk found, we will create one named date_id (but user prefers keeping names,
+    # so we only do this if absolutely necessary)
+    if pk_col is None:
+        pk_col = "date_id"
+        # ensure it's added to DDL as the YYYYMMDD key even if not present in df
+    return pk_col, date_col
+
+def build_foreign_keys(schema: str, table: str, df_columns, plan=None):
+    """
+    Return the foreign keys of schema.table as a list of
+    (fk_name, column, ref_schema, ref_table, ref_column), all sanitized.
+    Date columns reference dates.dates(date_id), except in dates.dates itself.
+    plan (column_plan.SheetPlan) decides which columns are dates; without it the headers do.
+    """
+    schema_s = sanitize_identifier(schema)
+    table_s = sanitize_identifier(table)
+    if schema_s == "dates" and table_s == "dates":
+        return []
+    plan = plan or plan_from_names(schema, table, df_columns)
+    fks = []
+    for col in plan.date_columns():
+        col_safe = sanitize_identifier(col)
+        fks.append((f"{table_s}_{col_safe}_dates_fk", col_safe, "dates", "dates", "date_id"))
+    return fks
 
+def table_dependencies(schema: str, table: str, df_columns, plan=None):
+    """
+    Return the set of (schema, table) referenced by the foreign keys of schema.table.
+    """
+    return {(ref_schema, ref_table) for _, _, ref_schema, ref_table, _ in build_foreign_keys(schema, table, df_columns, plan)}
+
+def build_table_definition(schema: str, table: str, df_columns, plan=None):
+    """
+    Build the CREATE TABLE statements of schema.table, without foreign keys.
+    Column types come from plan (column_plan.SheetPlan, profiled from the sheet values);
+    without a plan they are inferred from the headers (column_plan.plan_from_names):
+     - INTEGER => INTEGER (id => PRIMARY KEY)
+     - DATE => INTEGER with FK to dates.dates (DATE inside dates.dates)
+     - STRING => VARCHAR(50) (default max length)
+    A plan with a partition_column gives a table PARTITION BY RANGE on it, plus its
+    DEFAULT partition (rows without a date); range partitions are added at load time.
+    """
+    schema_s = sanitize_identifier(schema)
+    table_s = sanitize_identifier(table)
+    plan = plan or plan_from_names(schema, table, df_columns)
+
+    col_defs = []
+    for col in plan.columns:
+        col_safe = sanitize_identifier(col.name)
+        if col.primary_key:
+            col_defs.append(sql.SQL("{} {} PRIMARY KEY").format(sql.Identifier(col_safe), sql.SQL(col.sql_type)))
         else:
-            col_defs.append(sql.SQL("{} DECIMAL(18,4)").format(sql.Identifier(col_safe)))
+            col_defs.append(sql.SQL("{} {}").format(sql.Identifier(col_safe), sql.SQL(col.sql_type)))
 
-    create_tbl = sql.SQL("CREATE TABLE IF NOT EXISTS {}.{} ( {} );").format(
+    create_tbl = sql.SQL("CREATE TABLE IF NOT EXISTS {}.{} ( {} ){};").format(
         sql.Identifier(schema_s),
         sql.Identifier(table_s),
-        sql.SQL(", ").join(col_defs) if col_defs else sql.SQL("")
+        sql.SQL(", ").join(col_defs) if col_defs else sql.SQL(""),
+        sql.SQL(" PARTITION BY RANGE ({})").format(sql.Identifier(sanitize_identifier(plan.partition_column)))
+        if plan.partition_column else sql.SQL("")
     )
+    if not plan.partition_column:
+        return [create_tbl]
+    default = sql.SQL("CREATE TABLE IF NOT EXISTS {}.{} PARTITION OF {}.{} DEFAULT;").format(
+        sql.Identifier(schema_s), sql.Identifier("%s_default" % table_s),
+        sql.Identifier(schema_s), sql.Identifier(table_s)
+    )
+    return [create_tbl, default]
 
-    # prima CREATE TABLE, poi le ALTER TABLE con FK
-    return [create_tbl] + fk_defs
+def build_partition(schema: str, table: str, lo: int, hi: int):
+    """
+    Return SQL creating the range partition [lo, hi) of the partitioned schema.table.
+    """
+    schema_s = sanitize_identifier(schema)
+    table_s = sanitize_identifier(table)
+    return sql.SQL("CREATE TABLE IF NOT EXISTS {}.{} PARTITION OF {}.{} FOR VALUES FROM ({}) TO ({});").format(
+        sql.Identifier(schema_s), sql.Identifier("%s_p%d" % (table_s, lo)),
+        sql.Identifier(schema_s), sql.Identifier(table_s),
+        sql.Literal(lo), sql.Literal(hi)
+    )
+
+def build_foreign_key(schema: str, table: str, fk, guarded=True, not_valid=False):
+    """
+    Return the statements adding fk (a build_foreign_keys tuple) to schema.table.
+    guarded: wrapped in a DO block that skips an existing constraint, so the DDL can be re-run.
+    not_valid: ADD ... NOT VALID then VALIDATE CONSTRAINT, so existing rows are checked
+    without blocking writes (not supported by Postgres on partitioned tables).
+    """
+    fk_name, col_safe, ref_schema, ref_table, ref_col = fk
+    target = sql.SQL("{}.{}").format(sql.Identifier(sanitize_identifier(schema)), sql.Identifier(sanitize_identifier(table)))
+    add = sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} FOREIGN KEY ({}) REFERENCES {}.{}({}){};").format(
+        target,
+        sql.Identifier(fk_name),
+        sql.Identifier(col_safe),
+        sql.Identifier(ref_schema),
+        sql.Identifier(ref_table),
+        sql.Identifier(ref_col),
+        sql.SQL(" NOT VALID") if not_valid else sql.SQL("")
+    )
+    if guarded:
+        # solo se il vincolo non esiste già, così la DDL si può rieseguire
+        add = sql.SQL("""
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = {}::regclass AND conname = {}) THEN
+                {}
+            END IF;
+        END $$;
+        """).format(
+            sql.Literal('"%s"."%s"' % (sanitize_identifier(schema), sanitize_identifier(table))),
+            sql.Literal(fk_name),
+            add
+        )
+    if not not_valid:
+        return [add]
+    return [add, sql.SQL("ALTER TABLE {} VALIDATE CONSTRAINT {};").format(target, sql.Identifier(fk_name))]
+
+def build_date_indexes(schema: str, table: str, df_columns, plan=None):
+    """
+    Return the indexes of schema.table as (index_name, column): one per date (date_id)
+    column, the columns every monthly query filters on. dates.dates has its own.
+    """
+    table_s = sanitize_identifier(table)
+    if sanitize_identifier(schema) == "dates" and table_s == "dates":
+        return []
+    plan = plan or plan_from_names(schema, table, df_columns)
+    return [("%s_%s_idx" % (table_s, sanitize_identifier(c)), sanitize_identifier(c)) for c in plan.date_columns()]
+
+def build_create_index(schema: str, table: str, index_name: str, column: str):
+    """
+    Return SQL creating index_name on schema.table(column) if it doesn't exist
+    (on a partitioned table it cascades to every partition).
+    """
+    return sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {}.{} ({});").format(
+        sql.Identifier(index_name),
+        sql.Identifier(sanitize_identifier(schema)),
+        sql.Identifier(sanitize_identifier(table)),
+        sql.Identifier(column)
+    )
+
+def build_create_table(schema: str, table: str, df_columns, plan=None):
+    """
+    Build CREATE TABLE SQL for schema.table given df_columns (list of column names):
+    the build_table_definition statements, the guarded foreign keys, then the date indexes.
+    """
+    plan = plan or plan_from_names(schema, table, df_columns)
+    statements = build_table_definition(schema, table, df_columns, plan)
+    for fk in build_foreign_keys(schema, table, df_columns, plan):
+        statements.extend(build_foreign_key(schema, table, fk))
+    for index_name, column in build_date_indexes(schema, table, df_columns, plan):
+        statements.append(build_create_index(schema, table, index_name, column))
+    # prima CREATE TABLE, poi le ALTER TABLE con FK e gli indici
+    return statements
@@ -0,0 +1,174 @@
+"""
+DDL plan compiler: turns the extracted sheets and the ddl_builder statements into the
+complete, ordered DDL of the database (schemas, dates dimension, tables, foreign keys,
+then date indexes) without connecting. The plan is rendered as one BEGIN ... COMMIT script, written
+to sql/ddl/financial_tracker_ddl.sql and applied in a single round trip.
+"""
+
+import logging
+import os
+import textwrap
+from typing import Dict, List, NamedTuple, Tuple
+import psycopg2.extensions as ext
+from psycopg2 import sql
+from ddl_builder import (
+    build_create_schema, build_create_dates_table, build_table_definition, build_foreign_keys, build_foreign_key,
+    build_date_indexes, build_create_index, build_create_dates_table_from_columns, detect_dates_columns
+)
+from column_plan import build_sheet_plan, SheetPlan
+from utils import sanitize_identifier
+
+logger = logging.getLogger(__name__)
+
+class DDLPlan(NamedTuple):
+    """
+    Ordered DDL of a workbook. tables, foreign_keys and indexes hold ("schema.table", statement);
+    sheet_plans are the column plans the tables were compiled from, reused by the load.
+    """
+    schemas: List[str]
+    dates: List[str]
+    tables: List[Tuple[str, str]]
+    foreign_keys: List[Tuple[str, str]]
+    indexes: List[Tuple[str, str]]
+    sheet_plans: Dict[Tuple[str, str], SheetPlan]
+
+    def statements(self):
+        return (self.schemas + self.dates + [s for _, s in self.tables]
+                + [s for _, s in self.foreign_keys] + [s for _, s in self.indexes])
+
+def render_sql(statement) -> str:
+    """
+    Render a str or psycopg2.sql statement to SQL text without a connection
+    (identifiers are always double-quoted, literals quoted as UTF-8).
+    """
+    if isinstance(statement, str):
+        return statement
+    if isinstance(statement, sql.Composed):
+        return "".join(render_sql(s) for s in statement.seq)
+    if isinstance(statement, sql.SQL):
+        return statement.string
+    if isinstance(statement, sql.Identifier):
+        return ".".join('"%s"' % s.replace('"', '""') for s in statement.strings)
+    if isinstance(statement, sql.Literal):
+        adapted = ext.adapt(statement.wrapped)
+        if hasattr(adapted, "encoding"):
+            adapted.encoding = "utf-8"
+        quoted = adapted.getquoted()
+        return quoted.decode("utf-8") if isinstance(quoted, bytes) else quoted
+    raise TypeError("Cannot render %r" % (statement,))
+
+def _statement(statement) -> str:
+    text = textwrap.dedent(render_sql(statement)).strip()
+    return text if text.endswith(";") else text + ";"
+
+def partition_column(plan: SheetPlan, n_rows: int, min_rows: int):
+    """
+    Date column to range-partition the table of plan on: its first date column when the
+    sheet has at least min_rows rows (min_rows 0: never). Tables with a primary key are
+    not partitioned (their key would have to include the date).
+    """
+    dates = plan.date_columns()
+    if not min_rows or n_rows < min_rows or not dates or any(c.primary_key for c in plan.columns):
+        return None
+    return dates[0]
+
+def compile_ddl_plan(frames, dates_columns=None, partition_min_rows=0) -> DDLPlan:
+    """
+    Compile the DDL of { (schema, table): dataframe } (dates.dates excluded) without a
+    connection. dates_columns are the columns of the dates.dates sheet, if the workbook
+    has one (its key column is replaced by date_id); otherwise the default calendar is used.
+    Each sheet is profiled once (column_plan.build_sheet_plan); sheets of at least
+    partition_min_rows rows are range-partitioned on their date (partition_column).
+    """
+    schemas = sorted({s for s, _ in frames} | {"dates"})
+    plan_schemas = [_statement(build_create_schema(s)) for s in schemas]
+
+    if dates_columns is not None:
+        pk_col, date_col = detect_dates_columns(list(dates_columns))
+        columns = [c for c in dates_columns if c != pk_col]
+        plan_dates = [_statement(s) for s in build_create_dates_table_from_columns("dates", "dates", columns, date_col=date_col)]
+    else:
+        plan_dates = [_statement(build_create_dates_table())]
+
+    tables = []
+    foreign_keys = []
+    indexes = []
+    sheet_plans = {}
+    for (schema, table), df in frames.items():
+        plan = build_sheet_plan(schema, table, df)
+        plan = plan._replace(partition_column=partition_column(plan, len(df), partition_min_rows))
+        sheet_plans[(schema, table)] = plan
+        name = "%s.%s" % (sanitize_identifier(schema), sanitize_identifier(table))
+        columns = list(df.columns)
+        tables.append((name, "\n".join(_statement(s) for s in build_table_definition(schema, table, columns, plan=plan))))
+        for fk in build_foreign_keys(schema, table, columns, plan):
+            foreign_keys.extend((name, _statement(s)) for s in build_foreign_key(schema, table, fk))
+        for index_name, column in build_date_indexes(schema, table, columns, plan):
+            indexes.append((name, _statement(build_create_index(schema, table, index_name, column))))
+
+    logger.info(
+        "Compiled DDL plan: %d schemas, %d tables (%d partitioned), %d foreign keys, %d indexes",
+        len(plan_schemas), len(tables), sum(1 for p in sheet_plans.values() if p.partition_column),
+        len(foreign_keys), len(indexes)
+    )
+    return DDLPlan(plan_schemas, plan_dates, tables, foreign_keys, indexes, sheet_plans)
+
+def _section(title):
+    return "-- =====================================\n-- %s\n-- =====================================\n" % title
+
+def render_body(plan: DDLPlan) -> str:
+    """
+    The plan's statements in order, with section comments and without BEGIN/COMMIT.
+    """
+    parts = [_section("CREAZIONE SCHEMI"), "\n".join(plan.schemas), "",
+             _section("DIMENSIONE DATE"), "\n\n".join(plan.dates), "",
+             _section("CREAZIONE TABELLE")]
+    for name, statement in plan.tables:
+        parts += ["-- Tabella: %s" % name, statement, ""]
+    parts.append(_section("CHIAVI ESTERNE"))
+    for name, statement in plan.foreign_keys:
+        parts += ["-- Tabella: %s" % name, statement, ""]
+    parts.append(_section("INDICI"))
+    for name, statement in plan.indexes:
+        parts += ["-- Tabella: %s" % name, statement, ""]
+    return "\n".join(parts)
+
+def render_script(plan: DDLPlan, source: str = None) -> str:
+    """
+    The complete transactional script: header, BEGIN, the plan's statements, COMMIT.
+    The output only depends on the workbook, so regenerating it doesn't churn the file.
+    """
+    header = [
+        "-- =====================================",
+        "-- FINANCIAL TRACKER DATABASE DDL",
+        "-- =====================================",
+        "-- Generato automaticamente da main.py%s" % (" (%s)" % os.path.basename(source) if source else ""),
+        "--",
+        "-- Questo script crea la struttura completa del database",
+        "-- per il Financial Tracker. La transazione è atomica:",
+        "-- o vengono create tutte le strutture o nessuna.",
+        "-- =====================================",
+        "",
+    ]
+    return "\n".join(header) + "\nBEGIN;\n\n" + render_body(plan) + "\nCOMMIT;\n"
+
+def write_script(plan: DDLPlan, path: str, source: str = None):
+    """
+    Write the rendered script to path (creating its directory).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(render_script(plan, source))
+    logger.info("DDL script written to %s", path)
+
+def apply_ddl_plan(plan: DDLPlan):
+    """
+    Apply the plan in a single round trip: the whole BEGIN ... COMMIT script on an
+    autocommit connection, or the bare statements inside a single-transaction run.
+    """
+    from db import exec_script, in_run_transaction
+    if in_run_transaction():
+        exec_script(render_body(plan))
+    else:
+        exec_script(render_script(plan))
+    logger.info("Applied DDL plan (%d statements)", len(plan.statements()))
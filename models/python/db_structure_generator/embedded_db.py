@@ -0,0 +1,332 @@
+"""
+Embedded DuckDB backend (DB_BACKEND=duckdb): the model and the ETL run on a local
+database file, without a server or network round trips. Connections mimic the part of
+the psycopg2 API the db helpers use (cursor(), execute with %s parameters, autocommit,
+commit/rollback), statements are translated from the Postgres dialect of ddl_builder,
+and loads ingest whole DataFrame columns in one INSERT ... SELECT per chunk.
+duckdb is only imported when the backend is used.
+"""
+
+import atexit
+import logging
+import re
+import threading
+from config import DUCKDB_PATH, LOAD_CHUNK_ROWS, MONEY_SCALE
+from ddl_plan import render_sql
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# one database per process, shared by every connection (duckdb locks the file)
+_database = None
+_database_lock = threading.Lock()
+
+# name the chunk DataFrame is registered under for INSERT ... SELECT
+FRAME_NAME = "_etl_frame"
+
+_DO_BLOCK_RE = re.compile(r"\bDO\s+\$\$.*?\$\$\s*;?", re.S | re.I)
+_FOREIGN_KEY_RE = re.compile(
+    r"ALTER\s+TABLE\s[^;]*?\s(?:ADD\s+CONSTRAINT\s[^;]*?\sFOREIGN\s+KEY|VALIDATE\s+CONSTRAINT)\s[^;]*;?", re.S | re.I
+)
+_CREATE_TABLE_RE = re.compile(r'CREATE\s+TABLE\s+IF\s+NOT\s+EXISTS\s+"?(\w+)"?\."?(\w+)"?\s*\(([^;]*)', re.I)
+_SERIAL_RE = re.compile(r'"?(\w+)"?\s+SERIAL\b', re.I)
+_BARE_NUMERIC_RE = re.compile(r"\bNUMERIC\b(?!\s*\()", re.I)
+_PARAM_RE = re.compile(r"%%|%s")
+_DML = ("INSERT", "UPDATE", "DELETE")
+
+def database():
+    """
+    Return the process-wide DuckDB database at DUCKDB_PATH, opening it on first use.
+    """
+    global _database
+    with _database_lock:
+        if _database is None:
+            try:
+                import duckdb
+            except ImportError:
+                raise RuntimeError("DB_BACKEND=duckdb needs the duckdb package (pip install -r requirements-duckdb.txt)")
+            _database = duckdb.connect(DUCKDB_PATH)
+            # type the object columns of a chunk from all its values, not from a sample
+            _database.execute("SET GLOBAL pandas_analyze_sample = %d" % max(LOAD_CHUNK_ROWS, 1000))
+            logger.debug("Opened DuckDB database %s", DUCKDB_PATH)
+        return _database
+
+def close_database():
+    """
+    Close the database (checkpointing its file). The next use opens it again.
+    """
+    global _database
+    with _database_lock:
+        if _database is not None:
+            _database.close()
+            logger.debug("Closed DuckDB database %s", DUCKDB_PATH)
+        _database = None
+
+atexit.register(close_database)
+
+def _serial_columns(match):
+    schema, table, body = match.groups()
+    columns = _SERIAL_RE.findall(body)
+    if not columns:
+        return match.group(0)
+    sequences = ["CREATE SEQUENCE IF NOT EXISTS %s.%s_%s_seq;\n" % (schema, table, c) for c in columns]
+    body = _SERIAL_RE.sub(
+        lambda m: "%s INTEGER DEFAULT nextval('%s.%s_%s_seq')" % (m.group(1), schema, table, m.group(1)), body)
+    return "".join(sequences) + 'CREATE TABLE IF NOT EXISTS "%s"."%s" (%s' % (schema, table, body)
+
+def translate(statement) -> str:
+    """
+    Postgres statement (str or psycopg2.sql) to DuckDB SQL:
+     - SERIAL columns become INTEGER defaulting to a sequence created with the table
+     - bare NUMERIC becomes DECIMAL(38,MONEY_SCALE), the widest DuckDB decimal
+     - foreign keys are dropped (DuckDB can't add them to an existing table), guarded
+       DO blocks included
+    """
+    text = render_sql(statement)
+    text = _DO_BLOCK_RE.sub("", text)
+    text = _FOREIGN_KEY_RE.sub("", text)
+    text = _CREATE_TABLE_RE.sub(_serial_columns, text)
+    return _BARE_NUMERIC_RE.sub("DECIMAL(38,%d)" % MONEY_SCALE, text)
+
+class EmbeddedCursor:
+    """
+    psycopg2-style cursor over a DuckDB connection. Statements and bytes are counted
+    with metrics.add_io; results are fetched when the statement runs (rowcount is the
+    row count of SELECTs and the affected rows of INSERT/UPDATE/DELETE).
+    """
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = -1
+        self.query = None
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def execute(self, query, vars=None):
+        text = translate(query)
+        if vars is not None:
+            text = _PARAM_RE.sub(lambda m: "%" if m.group(0) == "%%" else "?", text)
+        self.query = text.encode("utf-8")
+        self.rowcount = -1
+        self._result = []
+        if not text.strip(" \n;"):
+            # only foreign keys: nothing left to run
+            return
+        db = self.connection._db
+        self.connection._begin()
+        try:
+            db.execute(text, list(vars) if vars is not None else None)
+            result = db.fetchall() if db.description else []
+        finally:
+            metrics.add_io(1, len(self.query))
+        if text.lstrip().split(None, 1)[0].upper() in _DML:
+            self.rowcount = result[0][0] if result else 0
+        else:
+            self._result = result
+            self.rowcount = len(result)
+
+    def execute_frame(self, query, frame):
+        """
+        Run query with frame (a pandas DataFrame) registered as FRAME_NAME.
+        """
+        db = self.connection._db
+        db.register(FRAME_NAME, frame)
+        try:
+            self.execute(query)
+        finally:
+            db.unregister(FRAME_NAME)
+
+    def fetchone(self):
+        return self._result.pop(0) if self._result else None
+
+    def fetchall(self):
+        rows, self._result = self._result, []
+        return rows
+
+class EmbeddedConnection:
+    """
+    psycopg2-style connection over one DuckDB connection: autocommit by default;
+    with autocommit off a transaction is opened by the first statement, like psycopg2.
+    """
+    def __init__(self, db):
+        self._db = db
+        self._in_transaction = False
+        self.autocommit = True
+        self.closed = 0
+
+    def cursor(self):
+        return EmbeddedCursor(self)
+
+    def _begin(self):
+        if not self.autocommit and not self._in_transaction:
+            self._db.execute("BEGIN TRANSACTION")
+            self._in_transaction = True
+
+    def commit(self):
+        if self._in_transaction:
+            self._in_transaction = False
+            self._db.execute("COMMIT")
+
+    def rollback(self):
+        if self._in_transaction:
+            self._in_transaction = False
+            self._db.execute("ROLLBACK")
+
+    def close(self):
+        if not self.closed:
+            self._db.close()
+            self.closed = 1
+
+def get_connection():
+    """
+    Return a new connection to the process database.
+    """
+    return EmbeddedConnection(database().cursor())
+
+class EmbeddedPool:
+    """
+    Stand-in for psycopg2's ThreadedConnectionPool: connections to the process database,
+    reused across borrows. closeall() closes the connections, not the database, so an
+    in-memory database outlives the run.
+    """
+    def __init__(self):
+        self.closed = False
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def getconn(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return get_connection()
+
+    def putconn(self, conn, close=False):
+        conn.rollback()
+        if close or self.closed:
+            conn.close()
+            return
+        with self._lock:
+            self._idle.append(conn)
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self.closed = True
+        for conn in idle:
+            conn.close()
+
+def fill_calendar(cur, first, last):
+    """
+    Create dates.dates if needed and insert every day of [first, last] with its YYYYMMDD
+    key and calendar attributes (days already there are skipped). db.ensure_calendar
+    runs the fills of the process one at a time: DuckDB transactions are optimistic and
+    concurrent inserts of one day would fail at commit.
+    """
+    from ddl_builder import build_create_dates_table
+    cur.execute(build_create_dates_table())
+    cur.execute(
+        """
+        INSERT INTO dates.dates (date_id, date, year, quarter, month, month_name)
+        SELECT CAST(strftime(d, '%%Y%%m%%d') AS INTEGER), CAST(d AS DATE), year(d), quarter(d), month(d), monthname(d)
+        FROM generate_series(CAST(%s AS DATE), CAST(%s AS DATE), INTERVAL 1 DAY) AS t(d)
+        ON CONFLICT DO NOTHING
+        """,
+        (first, last)
+    )
+
+def _frame_column(values):
+    """
+    One column of the chunk DataFrame, typed from its first value so DuckDB doesn't
+    have to inspect every Python object: integers become a nullable Int64 array,
+    Decimals their text (cast back by the INSERT, Decimal("NaN") as NULL: DuckDB
+    decimals have no NaN), anything else stays an object column.
+    """
+    import pandas as pd
+    from decimal import Decimal
+    first = next((v for v in values if v is not None), None)
+    if isinstance(first, int) and not isinstance(first, bool):
+        try:
+            return pd.array(values, dtype="Int64")
+        except (TypeError, OverflowError):
+            # beyond int64 (NUMERIC(p,0) columns)
+            pass
+    elif isinstance(first, Decimal):
+        values = [None if v is None or v != v else str(v) for v in values]
+    return pd.Series(values, dtype=object)
+
+def load_columns(cur, schema, table, columns, column_values):
+    """
+    Insert one chunk given as one value list per column (etl.prepare_table_columns)
+    into schema.table: the lists become the object columns of one DataFrame, ingested
+    and cast to the table's types by a single INSERT ... SELECT. Returns the row count.
+    """
+    import pandas as pd
+    from psycopg2 import sql
+    frame = pd.DataFrame({"c%d" % i: _frame_column(values) for i, values in enumerate(column_values)})
+    if not len(frame):
+        return 0
+    cur.execute_frame(sql.SQL("INSERT INTO {}.{} ({}) SELECT {} FROM {}").format(
+        sql.Identifier(schema), sql.Identifier(table),
+        sql.SQL(", ").join([sql.Identifier(c) for c in columns]),
+        sql.SQL(", ").join([sql.Identifier(c) for c in frame.columns]),
+        sql.Identifier(FRAME_NAME)
+    ), frame)
+    return len(frame)
+
+def load_rows(cur, schema, table, columns, rows):
+    """
+    Insert rows (tuples) into schema.table as one column-wise chunk (see load_columns).
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    return load_columns(cur, schema, table, columns, [list(values) for values in zip(*rows)])
+
+def _catalog_type(duckdb_type):
+    """
+    Spell a DuckDB column type the way Postgres' format_type() does, so the migrator
+    compares it with the plan (VARCHAR(n) is stored as plain VARCHAR: "text").
+    """
+    m = re.match(r"^DECIMAL\((\d+),(\d+)\)$", duckdb_type)
+    if m:
+        return "numeric" if m.group(1) == "38" else "numeric(%s,%s)" % m.groups()
+    return {"VARCHAR": "text"}.get(duckdb_type, duckdb_type.lower())
+
+def read_catalog(cur, schemas):
+    """
+    (schemas, tables, constraints, indexes, partitioned) of the given schemas, as
+    migrator.CatalogSnapshot holds them, from information_schema and the duckdb_*
+    functions. DuckDB tables are never partitioned.
+    """
+    cur.execute(
+        "SELECT schema_name FROM information_schema.schemata "
+        "WHERE catalog_name = current_database() AND schema_name = ANY(%s)", (schemas,))
+    existing = {r[0] for r in cur.fetchall()}
+    cur.execute(
+        """
+        SELECT table_schema, table_name, column_name, data_type
+        FROM information_schema.columns
+        WHERE table_catalog = current_database() AND table_schema = ANY(%s)
+        ORDER BY table_schema, table_name, ordinal_position
+        """,
+        (schemas,)
+    )
+    tables = {}
+    for schema, table, column, type_ in cur.fetchall():
+        tables.setdefault((schema, table), {})[column] = _catalog_type(type_)
+    cur.execute(
+        "SELECT schema_name, table_name, constraint_name FROM duckdb_constraints() "
+        "WHERE database_name = current_database() AND schema_name = ANY(%s)", (schemas,))
+    constraints = {tuple(r) for r in cur.fetchall()}
+    cur.execute(
+        "SELECT schema_name, index_name FROM duckdb_indexes() "
+        "WHERE database_name = current_database() AND schema_name = ANY(%s)", (schemas,))
+    indexes = {tuple(r) for r in cur.fetchall()}
+    return existing, tables, constraints, indexes, {}
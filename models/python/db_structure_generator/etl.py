@@ -1,93 +1,502 @@
 """
-ETL module: minimal transformations and load into Postgres.
+ETL module: minimal transformations and load into the database (see db.py).
 """
 
 import logging
-from typing import Dict, Tuple, List
-from utils import infer_column_type, parse_date_mm_yyyy, normalize_decimal
-from db import upsert_dates, bulk_insert
+import threading
+from datetime import date
+from config import LOAD_MODE, MONEY_REPR, LOAD_CHUNK_ROWS, PARTITION_MONTHS, ETL_RESUME
+from utils import parse_date_column, normalize_decimal, parse_money_column, format_fixed
+from column_plan import build_sheet_plan, sheet_columns
+from ddl_builder import build_partition
+from db import (
+    ensure_calendar, bulk_insert_columns, load_columns, connection, transaction, exec_statements, replace_rows,
+    worker_connection
+)
+from state import (
+    build_create_state_tables, fingerprint_rows, parse_row_key, get_sheet_state, get_row_hashes, save_state,
+    frame_fingerprint, get_journal, journal_start, journal_progress, journal_finish, journal_clear
+)
 from psycopg2 import sql
+import metrics
 
 logger = logging.getLogger(__name__)
 
-def prepare_table_rows(df):
+def _to_int(val):
+    """
+    Convert a single cell to int (None if empty or not parseable).
+    """
+    try:
+        if val is None or (isinstance(val, float) and val != val):
+            return None
+        return int(val)
+    except Exception:
+        return None
+
+
+def _map_column(series, func):
+    """
+    Apply func to every cell of a column, converting each distinct value only once.
+    Typed columns (int/float/datetime) are factorized by pandas in one vectorized pass;
+    object columns use a memo keyed on (type, value) so that e.g. True and 1 stay distinct.
+    Returns a list of converted values.
+    """
+    if series.dtype != object:
+        import pandas as pd
+        codes, uniques = pd.factorize(series, use_na_sentinel=False)
+        converted = [func(u) for u in uniques.tolist()]
+        return [converted[c] for c in codes.tolist()]
+
+    memo = {}
+    out = []
+    for val in series.tolist():
+        try:
+            key = (val.__class__, val)
+            res = memo[key] if key in memo else memo.setdefault(key, func(val))
+        except TypeError:
+            # unhashable cell
+            res = func(val)
+        out.append(res)
+    return out
+
+def _parse_date_series(series, col):
+    """
+    Parse a date column with the per-column format detection of utils.parse_date_column.
+    Datetime columns are converted in one vectorized step; other columns are factorized
+    so each distinct value is parsed once. Cells that needed fuzzy parsing are logged.
+    """
+    import pandas as pd
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return [None if d != d else d for d in series.dt.date.tolist()]
+    codes, uniques = pd.factorize(series.astype(object), use_na_sentinel=False)
+    dates, fallback = parse_date_column(uniques.tolist())
+    codes = codes.tolist()
+    n_fallback = sum(1 for c in codes if fallback[c])
+    if n_fallback:
+        logger.info("Column %s: %d date cells needed fuzzy parsing", col, n_fallback)
+    return [dates[c] for c in codes]
+
+def _to_bool(val):
+    """
+    Convert a single cell to bool (None if empty).
+    """
+    if val is None or (isinstance(val, float) and val != val):
+        return None
+    return bool(val)
+
+def _to_text(val):
+    """
+    Convert a single cell to str (None if empty).
+    """
+    if val is None or (isinstance(val, float) and val != val):
+        return None
+    return str(val)
+
+def _convert_integer(series, column):
+    import pandas as pd
+    if pd.api.types.is_integer_dtype(series):
+        return series.tolist()
+    # int() of each distinct cell, as the row-by-row loader did: text like "2,50" is None
+    return _map_column(series, _to_int)
+
+def _convert_decimal(series, column):
+    if MONEY_REPR == "fixed" and column.sql_type != "NUMERIC":
+        # scaled int64 arrays, rendered once as numeric text ('-123.45')
+        return format_fixed(*parse_money_column(series, column.scale), column.scale)
+    return _map_column(series, normalize_decimal)
+
+def _convert_date(series, column):
+    # store temporary iso string; will be converted to its date_id key later
+    parsed = _parse_date_series(series, column.name)
+    iso = {d: d.isoformat() for d in set(parsed) if d is not None}
+    return [iso[d] if d is not None else None for d in parsed]
+
+# one converter per plan kind, chosen once per column
+CONVERTERS = {
+    "INTEGER": _convert_integer,
+    "DECIMAL": _convert_decimal,
+    "DATE": _convert_date,
+    "BOOLEAN": lambda series, column: _map_column(series, _to_bool),
+    "STRING": lambda series, column: _map_column(series, _to_text),
+}
+
+def prepare_table_columns(df, plan=None):
+    """
+    Column-at-a-time version of prepare_table_rows.
+    plan (column_plan.SheetPlan) gives the converter of each column; it is profiled
+    from df when not given.
+    Returns (columns_list, column_values, date_values) where column_values holds one
+    list per column (date columns as ISO strings) and date_values the distinct parsed dates.
+    """
+    if plan is None:
+        plan = build_sheet_plan("", "", df)
+    column_values = []
+    date_values = set()
+    with metrics.stage("transform", metrics.table_name(plan.schema, plan.table), len(df)):
+        for column, (_, series) in zip(plan.columns, sheet_columns(df)):
+            values = CONVERTERS[column.kind](series, column)
+            if column.kind == "DATE":
+                date_values.update(date.fromisoformat(v) for v in set(values) if v is not None)
+            column_values.append(values)
+    return plan.names, column_values, list(date_values)
+
+def prepare_table_rows(df, plan=None):
     """
     Given a pandas DataFrame, infer columns, and return:
       (columns_list, rows_list, date_values)
     - columns_list: list of column names (sanitized)
     - rows_list: list of tuples ready to insert (with date columns replaced by their ISO date strings for now)
-    - date_values: list of parsed dates to be upserted into dates.dates
+    - date_values: list of parsed dates, whose calendar years dates.dates must hold
     """
-    # avoid importing pandas at module scope to keep this file testable
-    import pandas as pd
-    cols = [str(c).strip() for c in df.columns]
-    parsed_rows = []
-    date_values = []
-    for idx, r in df.iterrows():
-        out = []
-        for col in cols:
-            val = r.get(col)
-            ctype = infer_column_type(col)
-            if ctype == "DATE":
-                parsed = parse_date_mm_yyyy(val)
-                if parsed is None:
-                    out.append(None)
-                else:
-                    # store temporary iso string; will be converted to date_id later
-                    out.append(parsed.isoformat())
-                    date_values.append(parsed)
-            elif ctype == "INTEGER":
-                try:
-                    if val is None or (isinstance(val, float) and pd.isna(val)):
-                        out.append(None)
-                    else:
-                        out.append(int(val))
-                except Exception:
-                    # if not parseable, append None
-                    out.append(None)
-            else:
-                dec = normalize_decimal(val)
-                out.append(dec)
-        parsed_rows.append(tuple(out))
-    return cols, parsed_rows, date_values
+    cols, column_values, date_values = prepare_table_columns(df, plan)
+    rows = list(zip(*column_values)) if cols else [()] * len(df)
+    return cols, rows, date_values
 
-def load_dataframe_to_table(schema: str, table: str, df, db_upsert_dates=True):
+def date_key(value):
     """
-    Load a single dataframe into the target table.
-    Steps:
-     - prepare rows and collect date values
-     - upsert dates into dates.dates (if any) and get mapping date.iso -> date_id
-     - replace date iso strings in rows with date_id
-     - insert rows via bulk_insert
-    """
-    cols, rows, date_values = prepare_table_rows(df)
-    # if no rows -> nothing to do
-    if not rows:
-        logger.info("No rows to load for %s.%s", schema, table)
+    date_id of a date (datetime.date or ISO string): the YYYYMMDD integer, e.g. 20250901.
+    """
+    if isinstance(value, str):
+        return int(value[:4]) * 10000 + int(value[5:7]) * 100 + int(value[8:10])
+    return value.year * 10000 + value.month * 100 + value.day
+
+def _ensure_dates(date_values, fill_calendar=True, table=None):
+    """
+    Make sure dates.dates holds the calendar years of date_values (a round trip only
+    for years the process hasn't filled yet).
+    """
+    if not date_values or not fill_calendar:
+        return
+    with metrics.stage("dates", table, len(date_values)):
+        ensure_calendar(date_values)
+
+# range partitions known to exist: { (schema, table): {lower bound, in months} }
+_partitions = {}
+_partitions_lock = threading.Lock()
+
+def _months(key):
+    """
+    Month number (year * 12 + month - 1) of a date_id.
+    """
+    return key // 10000 * 12 + key // 100 % 100 - 1
+
+def _month_key(months):
+    """
+    date_id of the first day of a month number.
+    """
+    return months // 12 * 10000 + (months % 12 + 1) * 100 + 1
+
+def ensure_partitions(plan, date_ids):
+    """
+    Create the missing range partitions (PARTITION_MONTHS calendar months of date_ids
+    each, counted from January of year 0: aligned on January when PARTITION_MONTHS
+    divides 12, otherwise some straddle a year) of a table partitioned on a date column, for the given
+    date_ids, before rows holding them are written; rows without a date go to the
+    DEFAULT partition.
+    """
+    if not plan.partition_column:
         return
+    bounds = {_months(i) // PARTITION_MONTHS * PARTITION_MONTHS for i in date_ids if i is not None}
+    key = (plan.schema, plan.table)
+    with _partitions_lock:
+        missing = sorted(bounds - _partitions.get(key, set()))
+        if not missing:
+            return
+        exec_statements([build_partition(plan.schema, plan.table, _month_key(lo), _month_key(lo + PARTITION_MONTHS))
+                         for lo in missing], grouped=True)
+        _partitions.setdefault(key, set()).update(missing)
+    logger.info("Created %d partitions of %s.%s", len(missing), plan.schema, plan.table)
 
-    # upsert dates and get mapping
-    date_map = {}
-    if date_values and db_upsert_dates:
-        mapping = upsert_dates(date_values)  # returns { 'YYYY-MM-DD': id }
-        date_map = mapping
-
-    # build final rows replacing date iso strings with date_id
-    final_rows = []
-    from utils import infer_column_type
-    for row in rows:
-        new_row = []
-        for col_name, value in zip(cols, row):
-            if infer_column_type(col_name) == "DATE":
-                if value is None:
-                    new_row.append(None)
-                else:
-                    # value is iso date string
-                    new_row.append(date_map.get(value))
+def prefill_calendar(df):
+    """
+    Fill dates.dates with the calendar years of the dates of df, the dates.dates sheet
+    (the workbook's date range), before any table is loaded: one round trip, after which
+    the loads only send a fill for dates outside it. Forked workers inherit the filled years.
+    """
+    plan = build_sheet_plan("dates", "dates", df)
+    _, _, date_values = prepare_table_columns(df, plan)
+    _ensure_dates(date_values, table=metrics.table_name("dates", "dates"))
+
+def resolve_date_columns(plan, column_values, date_values, fill_calendar=True):
+    """
+    Make sure dates.dates holds date_values and replace the ISO strings of the plan's
+    date columns with their date_id, in place (creating the partitions the ids fall in).
+    Returns column_values.
+    """
+    _ensure_dates(date_values, fill_calendar, metrics.table_name(plan.schema, plan.table))
+    return map_date_columns(plan, column_values)
+
+def map_date_columns(plan, column_values):
+    """
+    Replace the ISO strings of the plan's date columns with their date_id (date_key,
+    computed once per distinct date: no dimension lookup), in place, creating the
+    partitions the ids fall in. Returns column_values.
+    """
+    for i, column in enumerate(plan.columns):
+        if column.kind == "DATE":
+            keys = {v: date_key(v) for v in set(column_values[i]) if v is not None}
+            column_values[i] = [None if v is None else keys[v] for v in column_values[i]]
+            if column.name == plan.partition_column:
+                ensure_partitions(plan, set(keys.values()))
+    return column_values
+
+def iter_table_columns(frames, plan, fill_calendar=True, chunk_rows=None):
+    """
+    Lazily turn frames (an iterable of DataFrames of one sheet, e.g. streamed chunks)
+    into converted chunks of chunk_rows rows (default LOAD_CHUNK_ROWS): each chunk is
+    converted, its dates replaced by their date_id (calendar years filled if new), then yielded as its
+    column_values, so only one chunk of converted values is alive at any time.
+    """
+    chunk_rows = chunk_rows or LOAD_CHUNK_ROWS
+    for df in frames:
+        for start in range(0, len(df), chunk_rows):
+            part = df.iloc[start:start + chunk_rows]
+            cols, column_values, date_values = prepare_table_columns(part, plan)
+            if cols:
+                resolve_date_columns(plan, column_values, date_values, fill_calendar)
+                yield column_values
+
+def _delete_earlier_rows(cur, schema, table):
+    cur.execute(sql.SQL("DELETE FROM {}.{}").format(sql.Identifier(schema), sql.Identifier(table)))
+    if cur.rowcount > 0:
+        logger.info("Deleted %d rows of an earlier load of %s.%s", cur.rowcount, schema, table)
+
+def clear_table(schema: str, table: str):
+    """
+    Delete the rows of an earlier load of schema.table, for loads that write their chunks
+    in separate transactions (EXTRACT_MODE=pipeline) and so can't replace them atomically.
+    """
+    with connection() as conn:
+        with conn.cursor() as cur:
+            _delete_earlier_rows(cur, schema, table)
+
+def load_frames_to_table(schema: str, table: str, frames, plan, fill_calendar=True):
+    """
+    Constant-memory full load of a sheet given as an iterable of DataFrames: chunks are
+    produced by iter_table_columns and written by bulk_insert_columns as they come, on
+    one pinned connection (calendar fills run between the insert pages/COPYs).
+    The rows already in the table are deleted in the same transaction, so a rerun
+    replaces them instead of loading the sheet twice.
+    Returns the number of rows loaded.
+    """
+    key = (plan.schema, plan.table)
+    try:
+        with worker_connection(), transaction() as conn:
+            with conn.cursor() as cur:
+                _delete_earlier_rows(cur, schema, table)
+            return bulk_insert_columns(schema, table, plan.names, iter_table_columns(frames, plan, fill_calendar))
+    except BaseException:
+        # partitions created inside the rolled back transaction are gone
+        with _partitions_lock:
+            _partitions.pop(key, None)
+        raise
+
+def prepare_dates(df, plan, fill_calendar=True):
+    """
+    Fill the calendar years, and create the partitions, of the dates of df up front
+    (date columns only), so the load transaction that follows sends no DDL of its own.
+    """
+    for column, (_, series) in zip(plan.columns, sheet_columns(df)):
+        if column.kind == "DATE":
+            values = {v for v in CONVERTERS["DATE"](series, column) if v is not None}
+            _ensure_dates({date.fromisoformat(v) for v in values}, fill_calendar,
+                          metrics.table_name(plan.schema, plan.table))
+            if column.name == plan.partition_column:
+                ensure_partitions(plan, {date_key(v) for v in values})
+
+def key_columns(plan):
+    """
+    Columns identifying a row in incremental mode: the id column if any,
+    otherwise the date columns, otherwise the whole row.
+    """
+    ids = [c for c in plan.names if c.lower() == "id"]
+    if ids:
+        return ids
+    return plan.date_columns() or plan.names
+
+_state_ready = False
+_state_lock = threading.Lock()
+
+def ensure_state_tables():
+    """
+    Create the etl_state tables once per process (serialized: concurrent
+    CREATE TABLE IF NOT EXISTS can collide in Postgres).
+    """
+    global _state_ready
+    with _state_lock:
+        if not _state_ready:
+            exec_statements(build_create_state_tables(), grouped=True)
+            _state_ready = True
+
+def reset_journal(tables):
+    """
+    Forget the journal entries of tables ((schema, table) pairs) before a run without
+    resume loads them again: the next resumed load of each starts over from row 0.
+    The entries of tables this run doesn't load are kept.
+    """
+    ensure_state_tables()
+    with connection() as conn:
+        with conn.cursor() as cur:
+            journal_clear(cur, tables)
+
+def load_dataframe_incremental(schema: str, table: str, df, fill_calendar=True, plan=None):
+    """
+    Incremental load of a single dataframe.
+    Steps:
+     - fingerprint the sheet and each row group (rows sharing the same key)
+     - skip the table entirely if the sheet fingerprint is unchanged and the table
+       still holds the rows it covers (otherwise reload the whole table)
+     - otherwise merge only new/changed row groups (and delete removed ones)
+       through a staging table, and store the new fingerprints in the same transaction
+    """
+    plan = plan or build_sheet_plan(schema, table, df)
+    cols, column_values, _ = prepare_table_columns(df, plan)
+    rows = list(zip(*column_values)) if cols else []
+    keys = key_columns(plan)
+    key_idx = [cols.index(c) for c in keys]
+    name = metrics.table_name(schema, table)
+    with metrics.stage("fingerprint", name, len(rows)):
+        sheet_hash, row_hashes, groups = fingerprint_rows(cols, rows, key_idx)
+
+    ensure_state_tables()
+    with connection() as conn:
+        with conn.cursor() as cur:
+            state = get_sheet_state(cur, schema, table)
+            # rows loaded, deleted or edited outside this mode: the fingerprints no longer
+            # describe the table, so it is reloaded whole
+            reload = state.table_rows != state.row_count
+            if reload:
+                logger.warning("%s.%s holds %d rows but its fingerprints cover %d: reloading the table",
+                               schema, table, state.table_rows, state.row_count)
+            elif state.sheet_hash == sheet_hash:
+                logger.info("Unchanged sheet, skipping %s.%s", schema, table)
+                return
+            stored = get_row_hashes(cur, schema, table)
+
+    changed = row_hashes if reload else {k: h for k, h in row_hashes.items() if stored.get(k) != h}
+    removed = [k for k in stored if k not in row_hashes]
+    changed_rows = [rows[i] for k in changed for i in groups[k]]
+    removed_keys = [parse_row_key(k) for k in removed]
+
+    # date ids only for the rows being sent (removed keys need no calendar day)
+    date_idx = {i for i, c in enumerate(plan.columns) if c.kind == "DATE"}
+    key_date_pos = [j for j, i in enumerate(key_idx) if i in date_idx]
+    _ensure_dates({date.fromisoformat(r[i]) for r in changed_rows for i in date_idx if r[i] is not None},
+                  fill_calendar, name)
+    if date_idx:
+        changed_rows = [
+            tuple(date_key(v) if i in date_idx and v is not None else v for i, v in enumerate(r)) for r in changed_rows
+        ]
+        removed_keys = [
+            tuple(date_key(v) if j in key_date_pos and v is not None else v for j, v in enumerate(k))
+            for k in removed_keys
+        ]
+    if plan.partition_column:
+        ensure_partitions(plan, {r[cols.index(plan.partition_column)] for r in changed_rows})
+
+    with metrics.stage("load", name, len(changed_rows)), transaction() as conn:
+        with conn.cursor() as cur:
+            if reload:
+                cur.execute(sql.SQL("DELETE FROM {}.{}").format(sql.Identifier(schema), sql.Identifier(table)))
+            replace_rows(cur, schema, table, cols, keys, changed_rows, [tuple(k) for k in removed_keys])
+            save_state(cur, schema, table, sheet_hash, len(rows), changed, removed)
+    logger.info(
+        "Incremental load %s.%s: %d changed keys, %d removed keys (%d rows sent of %d)",
+        schema, table, len(changed), len(removed), len(changed_rows), len(rows)
+    )
+
+def load_dataframe_journaled(schema: str, table: str, df, plan, fill_calendar=True):
+    """
+    Resumable full load of a sheet (ETL_RESUME), recorded in the load journal
+    (etl_state.load_journal): each LOAD_CHUNK_ROWS chunk is written and its offset
+    committed in one transaction, so a failed load leaves exactly the committed chunks
+    behind and the journal says how many.
+    Skips the table if the journal marks it done, or continues from the committed
+    offset, as long as the sheet fingerprint is the same. A load starting from row 0
+    (no entry, or the sheet changed) first deletes the rows already in the table, in
+    the transaction that opens the journal entry, so they are replaced, not duplicated.
+    Returns the number of rows loaded by this call.
+    """
+    name = metrics.table_name(schema, table)
+    with metrics.stage("fingerprint", name, len(df)):
+        sheet_hash = frame_fingerprint(plan.names, df)
+    ensure_state_tables()
+    offset = chunks = 0
+    with transaction() as conn:
+        with conn.cursor() as cur:
+            entry = get_journal(cur, schema, table)
+            if entry is not None and entry.sheet_hash != sheet_hash:
+                logger.warning("Sheet %s.%s changed since its journaled load (%s, %d of %d rows): loading it again",
+                               schema, table, entry.status, entry.rows_loaded, entry.row_count)
+            elif entry is not None and entry.status == "done":
+                logger.info("Already loaded, skipping %s.%s (%d rows)", schema, table, entry.rows_loaded)
+                return 0
+            elif entry is not None:
+                offset, chunks = entry.rows_loaded, entry.chunks_loaded
+            if offset:
+                logger.info("Resuming %s.%s at row %d of %d (%d chunks committed)",
+                            schema, table, offset, len(df), chunks)
             else:
-                new_row.append(value)
-        final_rows.append(tuple(new_row))
+                _delete_earlier_rows(cur, schema, table)
+            journal_start(cur, schema, table, sheet_hash, len(df), offset, chunks)
+
+    try:
+        with metrics.stage("load", name) as rec, worker_connection():
+            count = 0
+            # the chunk is converted (and its calendar years filled) before the transaction opens
+            for column_values in iter_table_columns([df.iloc[offset:]], plan, fill_calendar):
+                with transaction() as conn:
+                    with conn.cursor() as cur:
+                        n = load_columns(cur, schema, table, plan.names, [column_values])
+                        count += n
+                        chunks += 1
+                        journal_progress(cur, schema, table, offset + count, chunks)
+            rec["rows"] = count
+    except Exception as e:
+        try:
+            with connection() as conn:
+                with conn.cursor() as cur:
+                    journal_finish(cur, schema, table, "failed", "%s: %s" % (type(e).__name__, e))
+        except Exception:
+            # e.g. the connection itself was lost: the committed offset is already journaled
+            logger.warning("Could not mark the load of %s.%s as failed in the journal", schema, table)
+        raise
+    with connection() as conn:
+        with conn.cursor() as cur:
+            journal_finish(cur, schema, table, "done")
+    logger.info("Loaded %d rows into %s.%s (%d chunks%s)", count, schema, table, chunks,
+                ", resumed at row %d" % offset if offset else "")
+    return count
+
+def load_dataframe_to_table(schema: str, table: str, df, fill_calendar=True, mode=None, plan=None, resume=None):
+    """
+    Load a single dataframe into the target table.
+    mode: "full" (plain INSERT of every row) or "incremental"; defaults to config.LOAD_MODE.
+    plan: the column_plan.SheetPlan the table was created from (profiled from df if None).
+    resume (default ETL_RESUME): full mode only, load through the journal so an
+    interrupted load can be continued (see load_dataframe_journaled).
+    Steps, one LOAD_CHUNK_ROWS chunk at a time:
+     - prepare columns and collect date values
+     - fill the calendar years of its dates into dates.dates, if the process hasn't yet
+     - replace date iso strings with their YYYYMMDD date_id (computed, no lookup)
+     - write the chunk (with resume, together with its journal offset in one transaction;
+       without, every chunk in the transaction that deletes the table's earlier rows)
+    """
+    if (mode or LOAD_MODE) == "incremental":
+        return load_dataframe_incremental(schema, table, df, fill_calendar=fill_calendar, plan=plan)
+
+    plan = plan or build_sheet_plan(schema, table, df)
+    resume = ETL_RESUME if resume is None else resume
+    if len(df) == 0:
+        logger.info("No rows to load for %s.%s", schema, table)
+        if resume:
+            return
 
-    # perform bulk insert
-    # convert Decimal(None) -> None is OK; psycopg2 handles Decimal
-    bulk_insert(schema, table, cols, final_rows)
+    if resume:
+        load_dataframe_journaled(schema, table, df, plan, fill_calendar)
+    else:
+        # one pinned connection and one transaction (rows replaced, no per-chunk commits or
+        # journal round trips): the calendar and partitions first, outside it
+        with worker_connection():
+            prepare_dates(df, plan, fill_calendar)
+            load_frames_to_table(schema, table, [df], plan, fill_calendar)
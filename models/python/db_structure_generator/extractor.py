@@ -1,39 +1,218 @@
 """
 Excel extractor: reads all sheets, filters by schema.table naming,
 returns a mapping of { schema: { table: dataframe } }.
+A streaming variant (iter_sheet_chunks) yields each sheet as lazy row chunks.
 """
 
 import pandas as pd
+import numpy as np
 import logging
+import os
 import re
-from typing import Dict
+import time
+from config import EXTRACT_CHUNK_ROWS, EXTRACT_CACHE
 from utils import sanitize_identifier
+import metrics
 
 logger = logging.getLogger(__name__)
 
+# bump whenever the extraction output changes, to invalidate cached workbooks
+EXTRACTOR_VERSION = "1"
+
 SHEET_PATTERN = re.compile(r'^([A-Za-z0-9_]+)\.([A-Za-z0-9_]+)$')
 
-def extract_sheets(excel_path: str):
+# error values as returned by openpyxl with values_only (pandas reads them as NaN)
+EXCEL_ERRORS = {"#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A"}
+
+def match_sheet(sheet_name: str, log_level: int = logging.INFO):
+    """
+    Return (schema, table) for a schema.table sheet name, or None if the sheet must be skipped.
+    Skipped sheets are logged at log_level (a caller matching names again later passes DEBUG).
+    """
+    if sheet_name.lower() == "public.overview":
+        logger.debug("Skipping public.overview sheet: %s", sheet_name)
+        return None
+    m = SHEET_PATTERN.match(sheet_name.strip())
+    if not m:
+        logger.log(log_level, "Skipping sheet (not schema.table): %s", sheet_name)
+        return None
+    return sanitize_identifier(m.group(1)), sanitize_identifier(m.group(2))
+
+def extract_sheets(excel_path: str, cache_mode: str = None):
     """
     Read all sheets from excel_path and return a dict:
     { (schema, table): dataframe }
     Ignores sheets named public.overview or sheets not matching pattern.
+    cache_mode (default config.EXTRACT_CACHE): "on" reuses the on-disk cache keyed by the
+    workbook content hash, "refresh" re-parses and overwrites the entry, "off" bypasses it.
+    """
+    cache_mode = (cache_mode or EXTRACT_CACHE).lower()
+    with metrics.stage("extract") as rec:
+        rec["cache"] = cache_mode
+        out = _extract(excel_path, cache_mode, rec)
+        rec["rows"] = sum(len(df) for df in out.values())
+    return out
+
+def _extract(excel_path: str, cache_mode: str, rec):
+    """
+    Body of extract_sheets; rec["cache"] ends up "hit", "miss", "refresh" or "off".
+    """
+    if cache_mode in ("on", "refresh"):
+        import cache
+        key = cache.cache_key(excel_path, EXTRACTOR_VERSION)
+        if cache_mode == "on":
+            out = cache.load(key)
+            if out is not None:
+                logger.info("Extraction cache hit for %s (%d sheets)", excel_path, len(out))
+                rec["cache"] = "hit"
+                return out
+            rec["cache"] = "miss"
+        out = _read_sheets(excel_path)
+        cache.store(key, out, source=os.path.abspath(excel_path))
+        return out
+    return _read_sheets(excel_path)
+
+def _read_sheets(excel_path: str):
+    """
+    Parse the workbook with pandas (uncached extract_sheets).
     """
     logger.info("Reading Excel file: %s", excel_path)
     all_sheets = pd.read_excel(excel_path, sheet_name=None, engine='openpyxl')
     out = {}
     for sheet_name, df in all_sheets.items():
-        if sheet_name.lower() == "public.overview":
-            logger.debug("Skipping public.overview sheet: %s", sheet_name)
-            continue
-        m = SHEET_PATTERN.match(sheet_name.strip())
-        if not m:
-            logger.info("Skipping sheet (not schema.table): %s", sheet_name)
+        match = match_sheet(sheet_name)
+        if match is None:
             continue
-        schema = sanitize_identifier(m.group(1))
-        table = sanitize_identifier(m.group(2))
+        schema, table = match
         # Ensure headers are strings and strip whitespace
         df.columns = [str(c).strip() for c in df.columns]
         out[(schema, table)] = df
         logger.info("Extracted sheet -> schema=%s table=%s rows=%d", schema, table, len(df))
     return out
+
+def _convert_value(val):
+    """
+    Convert a values_only cell the way pandas' openpyxl reader does.
+    """
+    if val is None:
+        return None
+    if isinstance(val, float):
+        return int(val) if val.is_integer() else val
+    if isinstance(val, str) and val in EXCEL_ERRORS:
+        return np.nan
+    return val
+
+def _header_columns(header):
+    """
+    Column names from the header row: stripped strings, "Unnamed: N" for empty cells,
+    duplicates suffixed ".1", ".2", ... like pandas.
+    """
+    header = list(header)
+    while header and header[-1] is None:
+        header.pop()
+    columns = []
+    seen = {}
+    for i, c in enumerate(header):
+        name = "Unnamed: %d" % i if c is None else str(c).strip()
+        if name in seen:
+            seen[name] += 1
+            name = "%s.%d" % (name, seen[name])
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+def _frame(rows, columns):
+    """
+    Build a chunk DataFrame; missing cells become NaN as with pd.read_excel.
+    """
+    df = pd.DataFrame(rows, columns=columns)
+    for i in range(len(columns)):
+        col = df.iloc[:, i]
+        if col.dtype == object:
+            if col.isna().all():
+                df.isetitem(i, col.astype(float))
+            elif any(v is None for v in col):
+                df.isetitem(i, col.where(col.notna(), np.nan))
+    return df
+
+def _row_chunks(rows, width, columns, chunk_size, table=None):
+    """
+    Lazily turn worksheet rows into DataFrames of at most chunk_size rows
+    (blank rows are kept unless they are trailing, like pd.read_excel).
+    The time spent reading and building chunks (not the consumer's) is recorded
+    as the "extract" stage of table.
+    """
+    elapsed = 0.0
+    n_rows = 0
+    try:
+        start = time.perf_counter()
+        for df in _build_chunks(rows, width, columns, chunk_size):
+            elapsed += time.perf_counter() - start
+            n_rows += len(df)
+            yield df
+            start = time.perf_counter()
+        elapsed += time.perf_counter() - start
+    finally:
+        metrics.record("extract", table, elapsed, n_rows)
+
+def _build_chunks(rows, width, columns, chunk_size):
+    buf = []
+    blanks = []
+    for row in rows:
+        vals = [_convert_value(v) for v in row[:width]]
+        if len(vals) < width:
+            vals.extend([None] * (width - len(vals)))
+        if all(v is None for v in vals):
+            blanks.append(vals)
+            continue
+        if blanks:
+            buf.extend(blanks)
+            blanks = []
+        buf.append(vals)
+        if len(buf) >= chunk_size:
+            yield _frame(buf, columns)
+            buf = []
+    if buf:
+        yield _frame(buf, columns)
+
+def sheet_names(excel_path: str):
+    """
+    Return the (schema, table) of every matching sheet, without reading any cell.
+    Skipped sheets are logged at DEBUG: iter_sheet_chunks reports them when it streams.
+    """
+    from openpyxl import load_workbook
+    wb = load_workbook(excel_path, read_only=True)
+    try:
+        return [m for m in (match_sheet(name, logging.DEBUG) for name in wb.sheetnames) if m is not None]
+    finally:
+        wb.close()
+
+def iter_sheet_chunks(excel_path: str, chunk_size: int = None):
+    """
+    Stream the workbook with openpyxl in read-only/values_only mode.
+    Sheet names are matched first, so skipped sheets are never parsed.
+    Yields (schema, table, columns, chunks) for each matching sheet, where chunks is
+    a lazy iterator of DataFrames of at most chunk_size rows (default EXTRACT_CHUNK_ROWS).
+    The chunks of a sheet must be consumed before advancing to the next sheet;
+    the workbook is closed when the generator is exhausted or closed.
+    """
+    from openpyxl import load_workbook
+    chunk_size = chunk_size or EXTRACT_CHUNK_ROWS
+    logger.info("Streaming Excel file: %s (chunk_size=%d)", excel_path, chunk_size)
+    wb = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        for sheet_name in wb.sheetnames:
+            match = match_sheet(sheet_name)
+            if match is None:
+                continue
+            schema, table = match
+            ws = wb[sheet_name]
+            ws.reset_dimensions()
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, None)
+            columns = _header_columns(header) if header is not None else []
+            logger.info("Streaming sheet -> schema=%s table=%s columns=%d", schema, table, len(columns))
+            yield schema, table, columns, _row_chunks(rows, len(columns), columns, chunk_size, "%s.%s" % (schema, table))
+    finally:
+        wb.close()
@@ -2,154 +2,372 @@
 Main orchestrator script.
 
 Usage:
-    python main.py
+    python main.py [--plan] [--resume] [--workbooks DIR_OR_GLOB] [--profile off|cprofile|sample] [--report PATH]
+    (or python cli.py model|provision|etl|all, which imports only what each stage needs)
 
 It will:
  - read excel file
- - build schemas and create tables
+ - compile the DDL plan and write it to DDL_FILE (--plan stops here, without connecting)
+ - build schemas and create tables (the whole plan in one round trip)
  - run ETL to insert rows
+ - build the date indexes (and, with ETL_BULK_LOAD, the foreign keys) on the loaded tables
+ - write the JSON run report (RUN_REPORT_FILE)
 """
 
+import argparse
+import functools
+import itertools
 import logging
 import os
-from config import EXCEL_FILE, LOG_FILE
-from extractor import extract_sheets
-from ddl_builder import build_create_schema, build_create_dates_table, build_create_table
-from db import exec_statements
-import psycopg2
-from etl import load_dataframe_to_table
-from psycopg2 import sql
-
-# logging setup
-os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s [%(name)s] %(message)s'
+from datetime import datetime
+from config import (
+    EXCEL_FILE, EXCEL_SOURCES, LOG_FILE, DDL_FILE, EXTRACT_MODE, PIPELINE_QUEUE_SIZE, LOAD_MODE, ETL_PARALLEL, ETL_SINGLE_TRANSACTION, ETL_WORKERS,
+    BULK_LOAD_METHOD, MONEY_REPR, RUN_REPORT_FILE, ETL_PROFILE, ETL_PROFILE_INTERVAL_MS,
+    ETL_BULK_LOAD, FK_NOT_VALID, PARTITION_MIN_ROWS, DB_BACKEND, ETL_RESUME, BATCH_MIN_ROWS, BATCH_MAX_ROWS
 )
+import metrics
+from extractor import extract_sheets, iter_sheet_chunks, sheet_names
+from ddl_builder import (
+    build_create_schema, build_create_dates_table,
+    build_create_dates_table_from_columns, detect_dates_columns
+)
+from column_plan import build_sheet_plan
+from db import exec_statements, run_session, worker_connection, bulk_insert_columns, supports, batch_stats
+from etl import (
+    load_dataframe_to_table, load_frames_to_table, prepare_table_columns, resolve_date_columns, ensure_state_tables,
+    prefill_calendar, reset_journal, clear_table
+)
+from pipeline import run_pipeline
+from scheduler import run_tables, load_table
+from ddl_plan import compile_ddl_plan, write_script
+from migrator import (
+    read_catalog, align_partitioning, diff_table, apply_statements, apply_post_load, migrate, legacy_dates
+)
+
 logger = logging.getLogger("financial_etl")
 
 def safe_exec_statements(statements):
-    def build_create_dates_table_from_columns(schema, table, columns, pk_col=None, date_col=None):
+    """
+    Execute statements on a pooled connection, logging the statement that fails.
+    """
+    try:
+        exec_statements(statements)
+    except Exception:
+        logger.error("Failed executing: %s", statements)
+        raise
+
+class StreamingDDL:
+    """
+    Per-sheet DDL of the streaming modes, diffed against one catalog snapshot read at
+    the start of the run: only what is missing is sent (see migrator.py). Date indexes
+    (and foreign keys, with ETL_BULK_LOAD) are collected and applied by finish().
+    """
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.schemas = set(snapshot.schemas)
+        self.dates_ready = ("dates", "dates") in snapshot.tables
+        self.post_load = []
+
+    def ensure_schema(self, schema):
+        if schema not in self.schemas:
+            safe_exec_statements([build_create_schema(schema)])
+            self.schemas.add(schema)
+
+    def dates_sheet(self, columns):
         """
-        Build CREATE TABLE statement for dates table using provided columns.
-        
-        Args:
-            schema: Schema name
-            table: Table name  
-            columns: List of column names from the dataframe
-            pk_col: Primary key column name (if None, will use 'date_id')
-            date_col: Date column name (if None, will use 'date')
-        
-        Returns:
-            List of SQL statements
+        dates.dates is managed specially: only its DDL comes from the sheet.
         """
-        if pk_col is None:
-            pk_col = "date_id"
-        if date_col is None:
-            date_col = "date"
-        
-        # Start building the CREATE TABLE statement with IF NOT EXISTS
-        stmt_parts = [f"CREATE TABLE IF NOT EXISTS {schema}.{table} ("]
-        
-        column_defs = []
-        
-        # Add primary key column
-        if pk_col in columns:
-            column_defs.append(f"    {pk_col} SERIAL PRIMARY KEY")
-        else:
-            # If pk_col not in original columns, add it as SERIAL
-            column_defs.append(f"    {pk_col} SERIAL PRIMARY KEY")
-        
-        # Add other columns
-        for col in columns:
-            if col != pk_col:  # Skip pk column as it's already added
-                if col == date_col or 'date' in col.lower():
-                    column_defs.append(f"    {col} DATE")
-                else:
-                    column_defs.append(f"    {col} TEXT")
-        
-        stmt_parts.append(",\n".join(column_defs))
-        stmt_parts.append(");")
-        
-        return ["\n".join(stmt_parts)]
-
-    def main():
-        logger.info("Starting financial ETL")
-        # main.py — snippet (replace the part after mapping = extract_sheets(...))
-
-        mapping = extract_sheets(EXCEL_FILE)  # {(schema,table): df}
-
-        # Handle special case: if Excel contains dates.dates sheet, use its columns/names
-        dates_df = None
-        dates_schema = "dates"
-        dates_table = "dates"
-        dates_pk_col = None        # name of pk column in dates table (e.g., 'id' or 'date_id')
-        dates_date_col = None      # name of the column that stores the date value (e.g., 'date')
-
-        if (dates_schema, dates_table) in mapping:
-            dates_df = mapping.pop((dates_schema, dates_table))
-            # detect pk column (prefer any column whose name contains 'id' or endswith '_id')
-            cols_lower = [c.lower() for c in dates_df.columns]
-            for c in dates_df.columns:
-                if c.lower() == "id" or c.lower().endswith("_id"):
-                    dates_pk_col = c
-                    break
-            # detect the column that is date-like
-            for c in dates_df.columns:
-                if "date" in c.lower():
-                    dates_date_col = c
-                    break
-            # If no pk found, we will create one named date_id (but user prefers keeping names,
-            # so we only do this if absolutely necessary)
-            if dates_pk_col is None:
-                dates_pk_col = "date_id"
-                # ensure it's added to DDL as SERIAL even if not present in df
-
-        # create schemas
-        schemas = set([s for s, t in mapping.keys()])
-        statements = []
-        for s in schemas:
-            statements.append(build_create_schema(s))
-        # ensure dates schema exists
-        statements.append(build_create_schema(dates_schema))
+        pk_col, date_col = detect_dates_columns(columns)
+        # the sheet key is replaced by date_id, the YYYYMMDD key of the date FKs
+        columns = [c for c in columns if c != pk_col]
+        if not self.dates_ready:
+            safe_exec_statements(build_create_dates_table_from_columns("dates", "dates", columns, date_col=date_col))
+        self.dates_ready = True
 
-        try:
-            safe_exec_statements(statements)
-        except Exception as e:
-            logger.exception("Error creating schemas: %s", e)
-            raise
-
-        # create dates.dates table (respecting Excel column names if provided)
-        try:
-            if dates_df is not None:
-                stmts = build_create_dates_table_from_columns(dates_schema, dates_table, list(dates_df.columns), pk_col=dates_pk_col, date_col=dates_date_col)
-                safe_exec_statements(stmts)
+    def table(self, schema, table, columns, sample):
+        """
+        Profile the column plan on sample (the first chunk: sample=True picks types wide
+        enough for the rest of the sheet), bring the table to it and return the plan.
+        """
+        import pandas as pd
+        if not self.dates_ready:
+            safe_exec_statements([build_create_dates_table()])  # no dates sheet: the default calendar
+            self.dates_ready = True
+        if sample is None:
+            sample = pd.DataFrame(columns=columns)
+        # the row count is unknown here: only tables already partitioned are (by a batch run)
+        plan = align_partitioning(self.snapshot, build_sheet_plan(schema, table, sample, sample=True))
+        with metrics.stage("ddl", metrics.table_name(schema, table)):
+            table_statements, fk_statements, index_statements = diff_table(self.snapshot, plan, not_valid=FK_NOT_VALID)
+            if ETL_BULK_LOAD:
+                apply_statements(table_statements)
+                self.post_load.extend(fk_statements)
             else:
-                safe_exec_statements([build_create_dates_table()])  # fallback legacy
-        except Exception as e:
-            logger.exception("Error creating dates table: %s", e)
-            raise
+                apply_statements(table_statements + fk_statements)
+            self.post_load.extend(index_statements)
+        logger.info("Created/ensured table %s.%s", schema, table)
+        return plan
 
-        # create each table DDL using the actual pk name of dates table for FK references
-        for (schema, table), df in mapping.items():
-            try:
-                stmts = build_create_table(schema, table, list(df.columns))
-                safe_exec_statements(stmts)
-                logger.info("Created/ensured table %s.%s", schema, table)
-            except Exception as e:
-                logger.exception("Error creating table %s.%s: %s", schema, table, e)
-                raise
+    def finish(self):
+        """
+        Apply the deferred statements once every sheet is loaded.
+        """
+        apply_post_load(self.post_load)
+        self.post_load = []
+
+def _streaming_ddl():
+    # one catalog snapshot for the run: DDL is only sent for what is missing
+    ddl = StreamingDDL(read_catalog(match[0] for match in sheet_names(EXCEL_FILE)))
+    if legacy_dates(ddl.snapshot):
+        # the re-key needs every table's plan up front
+        raise ValueError("dates.dates has SERIAL date_ids: run once with EXTRACT_MODE=pandas to re-key it")
+    ddl.ensure_schema("dates")
+    return ddl
 
-        # run ETL for each table (skip dates.dates, which is managed specially)
-        for (schema, table), df in mapping.items():
+def main_streaming():
+    """
+    Streaming variant of main(): each sheet is read in row chunks (EXTRACT_MODE=stream)
+    and loaded as soon as its table exists, so loading starts before the whole
+    workbook has been read and only one chunk is held in memory at a time.
+    """
+    logger.info("Starting financial ETL (streaming extraction)")
+    import pandas as pd
+    with run_session():
+        ddl = _streaming_ddl()
+        for schema, table, columns, chunks in iter_sheet_chunks(EXCEL_FILE):
             try:
-                logger.info("Loading data for %s.%s (%d rows)", schema, table, len(df))
-                load_dataframe_to_table(schema, table, df, dates_pk_col=dates_pk_col, dates_date_col=dates_date_col)
-                logger.info("Loaded data for %s.%s", schema, table)
+                ddl.ensure_schema(schema)
+                if (schema, table) == ("dates", "dates"):
+                    ddl.dates_sheet(columns)
+                    for chunk in chunks:
+                        prefill_calendar(chunk)
+                    continue
+
+                # the column plan is profiled on the first chunk only and reused for every chunk
+                first = next(chunks, None)
+                plan = ddl.table(schema, table, columns, first)
+                if first is None:
+                    if LOAD_MODE != "incremental":
+                        # a sheet left empty replaces the rows of the earlier load too
+                        clear_table(schema, table)
+                    continue
+                chunks = itertools.chain([first], chunks)
+
+                if LOAD_MODE == "incremental":
+                    # fingerprints are computed on the whole sheet
+                    load_dataframe_to_table(schema, table, pd.concat(list(chunks), ignore_index=True), plan=plan)
+                    continue
+                # one bulk load per sheet, fed lazily from the streamed chunks
+                n_rows = load_frames_to_table(schema, table, chunks, plan)
+                logger.info("Loaded data for %s.%s (%d rows)", schema, table, n_rows)
             except Exception as e:
                 logger.exception("ETL error for %s.%s: %s", schema, table, e)
                 raise
+        ddl.finish()
+
+def _sheet_items():
+    """
+    Pipeline source: (schema, table, columns, chunk) for every chunk of every sheet;
+    chunk is None for sheets without rows.
+    """
+    for schema, table, columns, chunks in iter_sheet_chunks(EXCEL_FILE):
+        empty = True
+        for chunk in chunks:
+            empty = False
+            yield schema, table, columns, chunk
+        if empty:
+            yield schema, table, columns, None
+
+def main_pipelined():
+    """
+    Pipelined variant of main_streaming (EXTRACT_MODE=pipeline): reading the sheets,
+    converting chunks (DDL included), resolving dates and writing batches run in their
+    own threads connected by bounded queues of PIPELINE_QUEUE_SIZE chunks, so parsing
+    chunk N+1 overlaps the load of chunk N and memory stays flat.
+    """
+    if LOAD_MODE == "incremental":
+        # fingerprints need whole sheets: nothing to overlap
+        logger.info("LOAD_MODE=incremental: using the streaming path instead of the pipeline")
+        return main_streaming()
+    logger.info("Starting financial ETL (pipelined, queue size %d)", PIPELINE_QUEUE_SIZE)
+    with run_session():
+        ddl = _streaming_ddl()
+        plans = {}
+        loaded = {}
+
+        def transform(item):
+            schema, table, columns, chunk = item
+            if (schema, table) not in plans:
+                ddl.ensure_schema(schema)
+                if (schema, table) == ("dates", "dates"):
+                    ddl.dates_sheet(columns)
+                    plans[(schema, table)] = None
+                else:
+                    plans[(schema, table)] = ddl.table(schema, table, columns, chunk)
+                    # the chunks are written in separate transactions: the earlier rows go first
+                    clear_table(schema, table)
+            if chunk is None:
+                return None
+            if (schema, table) == ("dates", "dates"):
+                # the workbook's date range, filled before the chunks of the other sheets
+                prefill_calendar(chunk)
+                return None
+            plan = plans[(schema, table)]
+            cols, column_values, date_values = prepare_table_columns(chunk, plan)
+            return plan, cols, column_values, date_values, len(chunk)
+
+        def dates(item):
+            plan, cols, column_values, date_values, n = item
+            return plan, cols, resolve_date_columns(plan, column_values, date_values), n
+
+        def write(item):
+            plan, cols, column_values, n = item
+            bulk_insert_columns(plan.schema, plan.table, cols, [column_values])
+            loaded[(plan.schema, plan.table)] = loaded.get((plan.schema, plan.table), 0) + n
+
+        run_pipeline(
+            _sheet_items(),
+            [("transform", transform), ("dates", dates), ("load", write)],
+            maxsize=PIPELINE_QUEUE_SIZE,
+            thread_context=worker_connection,
+        )
+        for (schema, table), n_rows in loaded.items():
+            logger.info("Loaded data for %s.%s (%d rows)", schema, table, n_rows)
+        ddl.finish()
+
+def main_batch(plan_only=False, resume=None):
+    """
+    Read the whole workbook, compile the DDL plan offline and write it to DDL_FILE,
+    apply it in one round trip, load the tables (EXTRACT_MODE=pandas), then build the
+    date indexes (and the foreign keys, with ETL_BULK_LOAD) on the loaded tables.
+    plan_only: stop after writing the script, without connecting to the database.
+    resume (default ETL_RESUME): skip the tables the load journal marks done and
+    continue the partial ones from their last committed chunk.
+    """
+    logger.info("Starting financial ETL%s", " (DDL plan only)" if plan_only else "")
+
+    mapping = extract_sheets(EXCEL_FILE)  # {(schema,table): df}
+
+    # dates.dates is managed specially: only its DDL comes from the sheet
+    dates_df = mapping.pop(("dates", "dates"), None)
+    # the script is written for Postgres; backends without partitions never get them
+    partition_min_rows = PARTITION_MIN_ROWS if plan_only or supports("partitioning") else 0
+    ddl = compile_ddl_plan(mapping, list(dates_df.columns) if dates_df is not None else None, partition_min_rows)
+    if DDL_FILE and DDL_FILE.lower() != "off":
+        write_script(ddl, DDL_FILE, source=EXCEL_FILE)
+    if plan_only:
+        return
+
+    # one pooled connection set for the whole run (optionally a single transaction)
+    with run_session():
+        # only the DDL the catalog is missing, in a single transactional script
+        try:
+            with metrics.stage("ddl"):
+                post_load = migrate(ddl, defer_foreign_keys=ETL_BULK_LOAD, not_valid=FK_NOT_VALID)
+        except Exception as e:
+            logger.exception("Error migrating the schema: %s", e)
+            raise
+        # the load journal (and fingerprint) tables, before worker processes race to create them
+        ensure_state_tables()
+        if not resume:
+            reset_journal(mapping)
+        # the calendar of the workbook's date range, once: the loads compute their date_ids
+        if dates_df is not None:
+            prefill_calendar(dates_df)
+
+        # load every table with the column plan its DDL was compiled from
+        mode = ETL_PARALLEL
+        if ETL_SINGLE_TRANSACTION and mode != "sequential":
+            logger.warning("ETL_SINGLE_TRANSACTION shares one connection: running tables sequentially")
+            mode = "sequential"
+        run_tables(mapping, task=functools.partial(load_table, plans=ddl.sheet_plans, resume=resume), mode=mode)
+        apply_post_load(post_load)
+
+def main(profile=None, report_file=None, plan_only=False, workbooks=None, startup=None, resume=None):
+    """
+    Run the ETL (batch, streaming or pipelined, per EXTRACT_MODE) and write the JSON run report,
+    also when the run fails. profile (default ETL_PROFILE) wraps the run in cProfile or
+    the sampling profiler; the profile is dumped next to the log.
+    plan_only only compiles and writes the DDL script (always from the batch extraction).
+    workbooks (default EXCEL_SOURCES): directory or glob of workbooks loaded together
+    instead of EXCEL_FILE (batch.main_workbooks).
+    startup: seconds the entry point took to get here, stored in the report.
+    resume (default ETL_RESUME): continue an interrupted batch load from the load journal.
+    """
+    workbooks = workbooks or EXCEL_SOURCES
+    resume = ETL_RESUME if resume is None else resume
+    metrics.reset()
+    started = datetime.now()
+    status, error, profile_path = "ok", None, None
+    try:
+        with metrics.profiled(profile or ETL_PROFILE, os.path.dirname(LOG_FILE), ETL_PROFILE_INTERVAL_MS) as profile_path:
+            with metrics.stage("run") as run:
+                try:
+                    if resume and not plan_only and (workbooks or EXTRACT_MODE != "pandas" or LOAD_MODE != "full"):
+                        # batch reloads are idempotent per source, incremental loads have their fingerprints,
+                        # streamed sheets have no fingerprint up front: refuse rather than reload everything
+                        raise ValueError(
+                            "--resume (ETL_RESUME) only applies to LOAD_MODE=full, EXTRACT_MODE=pandas loads of "
+                            "EXCEL_FILE: run without it"
+                        )
+                    if workbooks and not plan_only:
+                        from batch import main_workbooks
+                        main_workbooks(workbooks)
+                    elif EXTRACT_MODE == "stream" and not plan_only:
+                        main_streaming()
+                    elif EXTRACT_MODE == "pipeline" and not plan_only:
+                        main_pipelined()
+                    else:
+                        main_batch(plan_only=plan_only, resume=resume)
+                finally:
+                    run["rows"] = sum(r["rows"] or 0 for r in metrics.records() if r["stage"] == "load")
+    except BaseException as e:
+        status, error = "failed", "%s: %s" % (type(e).__name__, e)
+        raise
+    finally:
+        write_run_report(report_file or RUN_REPORT_FILE, started, status, error, profile_path,
+                         workbook=workbooks if workbooks and not plan_only else EXCEL_FILE, startup=startup)
+
+def write_run_report(path, started, status, error=None, profile_path=None, workbook=None, startup=None):
+    """
+    Write the metrics of the run to path as JSON ("off" skips it). A failure to write
+    the report is logged, never raised over the run's own outcome.
+    """
+    if not path or path.lower() == "off":
+        return
+    try:
+        report = metrics.build_report(
+            started_at=started.isoformat(timespec="seconds"),
+            finished_at=datetime.now().isoformat(timespec="seconds"),
+            status=status,
+            error=error,
+            workbook=workbook or EXCEL_FILE,
+            startup_seconds=round(startup, 4) if startup is not None else None,
+            config={
+                "EXTRACT_MODE": EXTRACT_MODE, "LOAD_MODE": LOAD_MODE, "ETL_PARALLEL": ETL_PARALLEL,
+                "ETL_WORKERS": ETL_WORKERS, "ETL_SINGLE_TRANSACTION": ETL_SINGLE_TRANSACTION,
+                "BULK_LOAD_METHOD": BULK_LOAD_METHOD, "MONEY_REPR": MONEY_REPR,
+                "ETL_BULK_LOAD": ETL_BULK_LOAD, "PARTITION_MIN_ROWS": PARTITION_MIN_ROWS, "DB_BACKEND": DB_BACKEND,
+                "ETL_RESUME": ETL_RESUME, "BATCH_MIN_ROWS": BATCH_MIN_ROWS, "BATCH_MAX_ROWS": BATCH_MAX_ROWS,
+            },
+            # page sizes of this process's "insert" loads (worker processes keep their own)
+            batching=batch_stats(),
+            profile=profile_path,
+        )
+        metrics.write_report(path, report)
+    except Exception:
+        logger.exception("Could not write the run report to %s", path)
 
-    if __name__ == "__main__":
-        main()
+if __name__ == "__main__":
+    from cli import setup_logging, startup_seconds
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Load the financial tracker workbook into Postgres.")
+    parser.add_argument("--plan", action="store_true", help="only write the DDL script to DDL_FILE, without connecting")
+    parser.add_argument("--profile", choices=["off", "cprofile", "sample"], help="profile the run (default ETL_PROFILE)")
+    parser.add_argument("--report", help="run report path, or off (default RUN_REPORT_FILE)")
+    parser.add_argument("--workbooks", help="directory or glob of workbooks to load in one batch (default EXCEL_SOURCES)")
+    parser.add_argument("--resume", action="store_true", default=None,
+                        help="skip tables already loaded and continue partial ones (default ETL_RESUME)")
+    args = parser.parse_args()
+    main(profile=args.profile, report_file=args.report, plan_only=args.plan, workbooks=args.workbooks,
+         startup=startup_seconds(), resume=args.resume)
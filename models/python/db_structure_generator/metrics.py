@@ -0,0 +1,242 @@
+"""
+Run metrics: wall time, rows, DB round trips, bytes sent and peak memory per
+stage and table, collected during a run and written as a JSON run report.
+Also the opt-in profilers (cProfile or a built-in sampling profiler) wrapped
+around a run.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_local = threading.local()
+# finished stage records of the current run
+_records = []
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+def table_name(schema, table):
+    """
+    Report key of schema.table (None for the anonymous plans of prepare_table_rows).
+    """
+    return "%s.%s" % (schema, table) if schema or table else None
+
+def peak_rss_kb():
+    """
+    Peak resident memory of this process so far, in KB (None where unsupported).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def reset():
+    """
+    Forget the records of a previous run, and the stages this thread inherited
+    open from a parent process (forked workers).
+    """
+    del _stack()[:]
+    with _lock:
+        del _records[:]
+
+def records():
+    """
+    Return a copy of the finished stage records.
+    """
+    with _lock:
+        return list(_records)
+
+def merge(more):
+    """
+    Add records collected elsewhere (e.g. returned by a worker process).
+    """
+    with _lock:
+        _records.extend(more)
+
+def record(name, table=None, seconds=0.0, rows=None, **extra):
+    """
+    Store a stage record measured by the caller (for work that can't be wrapped in stage()).
+    """
+    rec = {"stage": name, "table": table, "seconds": seconds, "rows": rows,
+           "round_trips": 0, "bytes_sent": 0, "nested": True, "peak_rss_kb": peak_rss_kb()}
+    rec.update(extra)
+    with _lock:
+        _records.append(rec)
+
+@contextmanager
+def stage(name, table=None, rows=None):
+    """
+    Time the block as one record of stage name (table: "schema.table" or None).
+    Yields the record dict: set rec["rows"] (or other keys) inside the block.
+    DB round trips and bytes sent by this thread are added to every open stage.
+    """
+    stack = _stack()
+    rec = {"stage": name, "table": table, "rows": rows, "round_trips": 0, "bytes_sent": 0, "nested": bool(stack)}
+    stack.append(rec)
+    start = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        rec["seconds"] = time.perf_counter() - start
+        stack.pop()
+        rec["peak_rss_kb"] = peak_rss_kb()
+        with _lock:
+            _records.append(rec)
+
+def add_io(round_trips=1, n_bytes=0):
+    """
+    Count DB round trips and bytes sent against the open stages of this thread.
+    """
+    for rec in _stack():
+        rec["round_trips"] += round_trips
+        rec["bytes_sent"] += n_bytes
+
+def _summary(recs):
+    seconds = sum(r["seconds"] for r in recs)
+    rows = sum(r["rows"] or 0 for r in recs)
+    round_trips = sum(r["round_trips"] for r in recs)
+    peaks = [r["peak_rss_kb"] for r in recs if r.get("peak_rss_kb") is not None]
+    return {
+        "calls": len(recs),
+        "seconds": round(seconds, 4),
+        "rows": rows,
+        "rows_per_sec": round(rows / seconds) if rows and seconds else None,
+        "round_trips": round_trips,
+        "rows_per_round_trip": round(rows / round_trips, 1) if rows and round_trips else None,
+        "bytes_sent": sum(r["bytes_sent"] for r in recs),
+        "peak_rss_kb": max(peaks) if peaks else None,
+    }
+
+def build_report(**extra):
+    """
+    Aggregate the records into the run report: totals of the "run" stage, one summary
+    per stage (seconds summed over tables, so parallel tables overlap) and per table.
+    Round trips and bytes of the totals add up the outermost stages of every thread and
+    worker process, so nothing is counted twice.
+    """
+    recs = records()
+    by_stage = {}
+    by_table = {}
+    for r in recs:
+        by_stage.setdefault(r["stage"], []).append(r)
+        if r["table"]:
+            by_table.setdefault(r["table"], {}).setdefault(r["stage"], []).append(r)
+    report = dict(extra)
+    run = by_stage.get("run")
+    totals = None
+    if run:
+        totals = _summary(run)
+        outer = [r for r in recs if not r.get("nested")]
+        totals["round_trips"] = sum(r["round_trips"] for r in outer)
+        totals["rows_per_round_trip"] = (
+            round(totals["rows"] / totals["round_trips"], 1) if totals["rows"] and totals["round_trips"] else None)
+        totals["bytes_sent"] = sum(r["bytes_sent"] for r in outer)
+        peaks = [r["peak_rss_kb"] for r in recs if r.get("peak_rss_kb") is not None]
+        totals["peak_rss_kb"] = max(peaks) if peaks else None
+    report["totals"] = totals
+    report["stages"] = {s: _summary(rs) for s, rs in by_stage.items() if s != "run"}
+    report["tables"] = {t: {s: _summary(rs) for s, rs in stages.items()} for t, stages in sorted(by_table.items())}
+    return report
+
+def write_report(path, report):
+    """
+    Write the report as JSON (atomically, so readers never see half a file).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    os.replace(tmp, path)
+    logger.info("Run report written to %s", path)
+
+class SamplingProfiler:
+    """
+    Minimal in-process sampling profiler: a daemon thread snapshots the stacks of every
+    other thread each interval and counts them as folded stacks
+    ("module:function;module:function N"), the input format of flamegraph.pl/speedscope.
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="etl-sampler", daemon=True)
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append("%s:%s" % (os.path.basename(code.co_filename), code.co_name))
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in self.samples.most_common():
+                f.write("%s %d\n" % (stack, n))
+
+@contextmanager
+def profiled(mode, out_dir, interval_ms=5):
+    """
+    Run the block under a profiler and dump the profile in out_dir.
+    mode: "off", "cprofile" (etl_<time>.prof plus a cumulative-time .txt summary)
+    or "sample" (etl_<time>.folded stacks). Yields the profile path (None when off).
+    Only this process is profiled: worker processes (ETL_PARALLEL=process) are not.
+    """
+    mode = (mode or "off").lower()
+    if mode in ("off", "", "0", "false", "no"):
+        yield None
+        return
+    if mode not in ("cprofile", "sample"):
+        raise ValueError("Unknown ETL_PROFILE mode: %r" % mode)
+    os.makedirs(out_dir or ".", exist_ok=True)
+    base = os.path.join(out_dir or ".", "etl_%s" % time.strftime("%Y%m%d-%H%M%S"))
+    if mode == "cprofile":
+        import cProfile
+        import pstats
+        path = base + ".prof"
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield path
+        finally:
+            prof.disable()
+            prof.dump_stats(path)
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                pstats.Stats(prof, stream=f).sort_stats("cumulative").print_stats(50)
+            logger.info("cProfile written to %s", path)
+    else:
+        path = base + ".folded"
+        sampler = SamplingProfiler(interval_ms / 1000.0)
+        sampler.start()
+        try:
+            yield path
+        finally:
+            sampler.stop()
+            sampler.dump(path)
+            logger.info("Sampling profile (%d samples) written to %s", sum(sampler.samples.values()), path)
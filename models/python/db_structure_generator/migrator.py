@@ -0,0 +1,401 @@
+"""
+Catalog-diff schema migrator.
+The catalog is read once per run into a CatalogSnapshot and diffed against the desired
+tables (column_plan.SheetPlan): only the missing CREATE SCHEMA/CREATE TABLE, ADD COLUMN,
+widening ALTER COLUMN ... TYPE, ADD CONSTRAINT and CREATE INDEX statements are emitted, so a
+run on an up-to-date database executes no DDL and takes no schema locks.
+Foreign keys can be deferred after the load (bulk load) and date indexes always are.
+"""
+
+import logging
+import re
+from typing import Dict, List, NamedTuple, Set, Tuple
+from psycopg2 import sql
+from ddl_builder import (
+    build_table_definition, build_foreign_keys, build_foreign_key, build_date_indexes, build_create_index,
+    CALENDAR_COLUMNS
+)
+from ddl_plan import render_sql
+from utils import sanitize_identifier
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class CatalogSnapshot(NamedTuple):
+    """
+    schemas: existing schema names
+    tables: { (schema, table): { column: type } } with types as format_type() prints them
+    constraints: { (schema, table, constraint_name) }
+    indexes: { (schema, index_name) }
+    partitioned: { (schema, table): partition key column } of the range-partitioned tables
+    date_references: [ (schema, table, constraint_name, column, partitioned) ] foreign keys
+        referencing dates.dates from any schema, workbook or not
+    """
+    schemas: Set[str]
+    tables: Dict[Tuple[str, str], Dict[str, str]]
+    constraints: Set[Tuple[str, str, str]]
+    indexes: Set[Tuple[str, str]]
+    partitioned: Dict[Tuple[str, str], str]
+    date_references: List[Tuple[str, str, str, str, bool]]
+
+def read_catalog(schemas) -> CatalogSnapshot:
+    """
+    Read schemas, columns, constraints, indexes and partition keys of the given schemas
+    from pg_catalog, plus the foreign keys referencing dates.dates from any schema (six
+    queries on one connection, no locks on the tables themselves).
+    Partitions are left out: they are managed through their parent.
+    On the embedded backend the same snapshot comes from embedded_db.read_catalog.
+    """
+    from db import connection, embedded
+    schemas = sorted(set(schemas))
+    with connection() as conn:
+        with conn.cursor() as cur:
+            if embedded():
+                from embedded_db import read_catalog as read_embedded_catalog
+                existing, tables, constraints, indexes, partitioned = read_embedded_catalog(cur, schemas)
+                date_references = []
+            else:
+                cur.execute("SELECT nspname FROM pg_namespace WHERE nspname = ANY(%s)", (schemas,))
+                existing = {r[0] for r in cur.fetchall()}
+                cur.execute(
+                    """
+                    SELECT n.nspname, c.relname, a.attname, format_type(a.atttypid, a.atttypmod)
+                    FROM pg_class c
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+                    WHERE n.nspname = ANY(%s) AND c.relkind IN ('r', 'p') AND NOT c.relispartition
+                    """,
+                    (schemas,)
+                )
+                tables = {}
+                for schema, table, column, type_ in cur.fetchall():
+                    tables.setdefault((schema, table), {})[column] = type_
+                cur.execute(
+                    """
+                    SELECT n.nspname, c.relname, k.conname
+                    FROM pg_constraint k
+                    JOIN pg_class c ON c.oid = k.conrelid
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE n.nspname = ANY(%s)
+                    """,
+                    (schemas,)
+                )
+                constraints = {tuple(r) for r in cur.fetchall()}
+                cur.execute(
+                    """
+                    SELECT n.nspname, c.relname
+                    FROM pg_class c
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE n.nspname = ANY(%s) AND c.relkind IN ('i', 'I') AND NOT c.relispartition
+                    """,
+                    (schemas,)
+                )
+                indexes = {tuple(r) for r in cur.fetchall()}
+                cur.execute(
+                    """
+                    SELECT n.nspname, c.relname, a.attname
+                    FROM pg_partitioned_table p
+                    JOIN pg_class c ON c.oid = p.partrelid
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = p.partattrs[0]
+                    WHERE n.nspname = ANY(%s)
+                    """,
+                    (schemas,)
+                )
+                partitioned = {(schema, table): column for schema, table, column in cur.fetchall()}
+                cur.execute(
+                    """
+                    SELECT n.nspname, c.relname, k.conname, a.attname, c.relkind = 'p'
+                    FROM pg_constraint k
+                    JOIN pg_class c ON c.oid = k.conrelid
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    JOIN pg_attribute a ON a.attrelid = k.conrelid AND a.attnum = k.conkey[1]
+                    WHERE k.contype = 'f' AND k.confrelid = to_regclass('dates.dates')
+                      AND k.conparentid = 0 AND NOT c.relispartition
+                    ORDER BY 1, 2, 3
+                    """
+                )
+                date_references = [tuple(r) for r in cur.fetchall()]
+    logger.info(
+        "Catalog snapshot: %d schemas, %d tables (%d partitioned), %d constraints, %d indexes",
+        len(existing), len(tables), len(partitioned), len(constraints), len(indexes)
+    )
+    return CatalogSnapshot(existing, tables, constraints, indexes, partitioned, date_references)
+
+_TYPE_NAMES = {
+    "SMALLINT": "smallint", "INTEGER": "integer", "BIGINT": "bigint", "SERIAL": "integer",
+    "TEXT": "text", "DATE": "date", "BOOLEAN": "boolean", "NUMERIC": "numeric",
+}
+_PARAM_TYPE_RE = re.compile(r"^(DECIMAL|NUMERIC|VARCHAR)\((\d+)(?:,(\d+))?\)$", re.I)
+
+def catalog_type(sql_type: str) -> str:
+    """
+    Spell a column_plan sql_type the way format_type() prints it ("DECIMAL(18,2)" -> "numeric(18,2)").
+    """
+    m = _PARAM_TYPE_RE.match(sql_type.replace(" ", ""))
+    if m:
+        name, p, s = m.groups()
+        if name.upper() == "VARCHAR":
+            return "character varying(%s)" % p
+        return "numeric(%s,%s)" % (p, s or 0)
+    return _TYPE_NAMES.get(sql_type.upper(), sql_type.lower())
+
+# integer digits held by each integer type, to merge them with numeric(p,s)
+_INT_DIGITS = {"smallint": 5, "integer": 10, "bigint": 19}
+_NUMERIC_RE = re.compile(r"^numeric\((\d+),(\d+)\)$")
+_VARCHAR_RE = re.compile(r"^character varying\((\d+)\)$")
+
+def _numeric_shape(type_):
+    """
+    (integer digits, scale) of an integer or numeric(p,s) type; None otherwise.
+    """
+    if type_ in _INT_DIGITS:
+        return _INT_DIGITS[type_], 0
+    m = _NUMERIC_RE.match(type_)
+    if m:
+        p, s = int(m.group(1)), int(m.group(2))
+        return p - s, s
+    return None
+
+def widened_type(current: str, desired: str):
+    """
+    Narrowest type holding every value of both current and desired (spelled as
+    format_type() does), or None when current already does or the two don't mix
+    (e.g. dates and numbers): the column is then kept as it is.
+    """
+    if current == desired or current == "text":
+        return None
+    merged = None
+    if desired == "text" or (desired.startswith("character varying") and _numeric_shape(current)):
+        merged = "text" if current in _INT_DIGITS or current.startswith(("numeric", "character varying")) else None
+    elif _VARCHAR_RE.match(desired) and _VARCHAR_RE.match(current):
+        n = max(int(_VARCHAR_RE.match(desired).group(1)), int(_VARCHAR_RE.match(current).group(1)))
+        merged = "character varying(%d)" % n
+    elif desired == "numeric" and (current == "numeric" or _numeric_shape(current)):
+        merged = "numeric"
+    elif current == "numeric" and _numeric_shape(desired):
+        merged = None
+    elif desired in _INT_DIGITS and current in _INT_DIGITS:
+        merged = max(current, desired, key=_INT_DIGITS.get)
+    elif _numeric_shape(current) and _numeric_shape(desired):
+        (ci, cs), (di, ds) = _numeric_shape(current), _numeric_shape(desired)
+        digits, scale = max(ci, di), max(cs, ds)
+        merged = "numeric(%d,%d)" % (digits + scale, scale)
+    return merged if merged != current else None
+
+def align_partitioning(snapshot: CatalogSnapshot, plan):
+    """
+    Return plan with the partition_column of the existing table (a table is never
+    re-partitioned, so the load must create the partitions it already has); plans of
+    missing tables are returned as they are.
+    """
+    key = (sanitize_identifier(plan.schema), sanitize_identifier(plan.table))
+    if key not in snapshot.tables:
+        return plan
+    column = snapshot.partitioned.get(key)
+    partition_column = next((c for c in plan.names if sanitize_identifier(c) == column), None)
+    return plan if plan.partition_column == partition_column else plan._replace(partition_column=partition_column)
+
+def diff_table(snapshot: CatalogSnapshot, plan, create_statement=None, not_valid=False):
+    """
+    Statements bringing schema.table to plan: (table_statements, fk_statements, index_statements).
+    A missing table gets create_statement (default ddl_builder.build_table_definition).
+    An existing one gets ADD COLUMN for new columns and ALTER COLUMN ... TYPE to the
+    widened type (widened_type) when the plan's type doesn't fit the current column;
+    narrower plan types keep the wider column.
+    not_valid: missing foreign keys are added NOT VALID, then validated (plain ADD
+    CONSTRAINT on partitioned tables, where Postgres doesn't support NOT VALID).
+    Backends without foreign keys (db.supports) get no fk_statements.
+    """
+    from db import supports
+    schema_s = sanitize_identifier(plan.schema)
+    table_s = sanitize_identifier(plan.table)
+    target = sql.SQL("{}.{}").format(sql.Identifier(schema_s), sql.Identifier(table_s))
+    current = snapshot.tables.get((schema_s, table_s))
+
+    if current is None:
+        if create_statement is None:
+            create_statement = "\n".join(
+                render_sql(s) for s in build_table_definition(plan.schema, plan.table, plan.names, plan=plan))
+        table_statements = [create_statement]
+    else:
+        table_statements = []
+        for column in plan.columns:
+            col_safe = sanitize_identifier(column.name)
+            desired = catalog_type(column.sql_type)
+            have = current.get(col_safe)
+            if have is None:
+                table_statements.append(render_sql(sql.SQL("ALTER TABLE {} ADD COLUMN {} {};").format(
+                    target, sql.Identifier(col_safe), sql.SQL(column.sql_type))))
+            elif have != desired:
+                merged = widened_type(have, desired)
+                if merged is not None:
+                    table_statements.append(render_sql(sql.SQL("ALTER TABLE {} ALTER COLUMN {} TYPE {};").format(
+                        target, sql.Identifier(col_safe), sql.SQL(merged))))
+                else:
+                    logger.debug("Keeping %s.%s.%s as %s (plan: %s)", schema_s, table_s, col_safe, have, desired)
+
+    fk_statements = []
+    for fk in build_foreign_keys(plan.schema, plan.table, plan.names, plan) if supports("foreign_keys") else []:
+        if (schema_s, table_s, fk[0]) in snapshot.constraints:
+            continue
+        fk_statements.extend(render_sql(s) for s in build_foreign_key(
+            plan.schema, plan.table, fk, guarded=False, not_valid=not_valid and not plan.partition_column))
+
+    index_statements = [
+        render_sql(build_create_index(plan.schema, plan.table, index_name, column))
+        for index_name, column in build_date_indexes(plan.schema, plan.table, plan.names, plan)
+        if (schema_s, index_name) not in snapshot.indexes
+    ]
+    return table_statements, fk_statements, index_statements
+
+def legacy_dates(snapshot: CatalogSnapshot) -> bool:
+    """
+    True if the existing dates.dates predates the calendar dimension (SERIAL date_ids,
+    no calendar attributes).
+    """
+    current = snapshot.tables.get(("dates", "dates"))
+    return current is not None and any(name not in current for name, _ in CALENDAR_COLUMNS)
+
+def rekey_dates(snapshot: CatalogSnapshot, sheet_plans):
+    """
+    Statements turning a legacy dates.dates (legacy_dates) into the calendar dimension,
+    inside the migration script: every foreign key referencing it (snapshot.date_references,
+    in any schema) is dropped, the referencing columns and the date columns of the workbook's
+    existing tables are re-keyed from the SERIAL ids to YYYYMMDD, then the dimension is
+    re-keyed and its calendar attributes added and filled. The workbook's keys are taken out
+    of snapshot.constraints, so the diff adds them back; the others are added back here.
+    Rows pointing at a date_id without a date end up NULL.
+    Partitioned tables (ranges of SERIAL ids) and the embedded backend can't be re-keyed
+    in place: ValueError.
+    """
+    from db import embedded
+    if embedded():
+        raise ValueError("dates.dates has SERIAL date_ids: delete the DuckDB file (DUCKDB_PATH) and reload")
+    # { (schema, table): { column: constraint_name or None } }
+    columns = {}
+    partitioned = set(snapshot.partitioned)
+    for schema, table, fk_name, column, is_partitioned in snapshot.date_references:
+        columns.setdefault((schema, table), {})[column] = fk_name
+        if is_partitioned:
+            partitioned.add((schema, table))
+    planned = set()
+    for (schema, table), plan in sheet_plans.items():
+        schema_s, table_s = sanitize_identifier(schema), sanitize_identifier(table)
+        current = snapshot.tables.get((schema_s, table_s)) or {}
+        for fk_name, column, _, _, _ in build_foreign_keys(schema, table, plan.names, plan):
+            planned.add((schema_s, table_s, fk_name))
+            if column in current:
+                columns.setdefault((schema_s, table_s), {}).setdefault(column, None)
+    statements = []
+    restore = []
+    for (schema_s, table_s), fks in sorted(columns.items()):
+        if (schema_s, table_s) in partitioned:
+            raise ValueError("%s.%s is partitioned on SERIAL date_ids: drop it and reload it" % (schema_s, table_s))
+        target = sql.SQL("{}.{}").format(sql.Identifier(schema_s), sql.Identifier(table_s))
+        for column, fk_name in sorted(fks.items()):
+            if fk_name is not None:
+                statements.append(render_sql(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {};").format(
+                    target, sql.Identifier(fk_name))))
+                if (schema_s, table_s, fk_name) in planned:
+                    snapshot.constraints.discard((schema_s, table_s, fk_name))
+                else:
+                    restore.extend(render_sql(s) for s in build_foreign_key(
+                        schema_s, table_s, (fk_name, column, "dates", "dates", "date_id"), guarded=False))
+            statements.append(render_sql(sql.SQL(
+                "UPDATE {} AS t SET {} = to_char(d.date, 'YYYYMMDD')::integer FROM dates.dates AS d WHERE t.{} = d.date_id;"
+            ).format(target, sql.Identifier(column), sql.Identifier(column))))
+    attributes = ", ".join("ADD COLUMN IF NOT EXISTS %s %s" % column for column in CALENDAR_COLUMNS)
+    not_null = ", ".join("ALTER COLUMN %s SET NOT NULL" % name for name in ["date"] + [n for n, _ in CALENDAR_COLUMNS])
+    statements.extend([
+        "ALTER TABLE dates.dates ALTER COLUMN date_id DROP DEFAULT;",
+        "DROP SEQUENCE IF EXISTS dates.dates_date_id_seq;",
+        "DELETE FROM dates.dates WHERE date IS NULL;",
+        "UPDATE dates.dates SET date_id = to_char(date, 'YYYYMMDD')::integer;",
+        "ALTER TABLE dates.dates %s;" % attributes,
+        "UPDATE dates.dates SET year = extract(year FROM date), quarter = extract(quarter FROM date), "
+        "month = extract(month FROM date), month_name = to_char(date, 'FMMonth');",
+        "ALTER TABLE dates.dates %s;" % not_null,
+    ])
+    statements.extend(restore)
+    logger.warning("dates.dates has SERIAL date_ids: re-keying it and the date columns of %d tables to YYYYMMDD",
+                   len(columns))
+    return statements
+
+def diff_ddl_plan(snapshot: CatalogSnapshot, ddl, defer_foreign_keys=False, not_valid=False):
+    """
+    Statements bringing the database to ddl (ddl_plan.DDLPlan), as (statements, post_load):
+    missing schemas, the dates dimension if missing (re-keyed if legacy_dates), table changes, then missing foreign
+    keys; post_load holds the missing date indexes, plus the foreign keys when
+    defer_foreign_keys (bulk load: no FK checks while rows are written).
+    """
+    statements = []
+    for schema in sorted({s for s, _ in ddl.sheet_plans} | {"dates"}):
+        if sanitize_identifier(schema) not in snapshot.schemas:
+            statements.append(render_sql(sql.SQL("CREATE SCHEMA IF NOT EXISTS {};").format(sql.Identifier(schema))))
+    if ("dates", "dates") not in snapshot.tables:
+        statements.extend(ddl.dates)
+    elif legacy_dates(snapshot):
+        statements.extend(rekey_dates(snapshot, ddl.sheet_plans))
+    creates = dict(ddl.tables)
+    fks = []
+    indexes = []
+    for (schema, table), plan in ddl.sheet_plans.items():
+        name = "%s.%s" % (sanitize_identifier(schema), sanitize_identifier(table))
+        table_statements, fk_statements, index_statements = diff_table(snapshot, plan, creates.get(name), not_valid)
+        statements.extend(table_statements)
+        fks.extend(fk_statements)
+        indexes.extend(index_statements)
+    if defer_foreign_keys:
+        return statements, fks + indexes
+    return statements + fks, indexes
+
+def apply_statements(statements, separately=False):
+    """
+    Send the statements in one round trip: as a BEGIN ... COMMIT script, or bare inside
+    a single-transaction run. Nothing is sent when there is nothing to do.
+    separately: one round trip (and transaction) per statement instead, so a VALIDATE
+    CONSTRAINT doesn't run under the stronger lock of the ADD CONSTRAINT before it.
+    """
+    from db import exec_script, exec_statements, in_run_transaction
+    if not statements:
+        return
+    if separately:
+        exec_statements(statements)
+    else:
+        body = "\n".join(statements)
+        exec_script(body if in_run_transaction() else "BEGIN;\n%s\nCOMMIT;" % body)
+    for statement in statements:
+        logger.info("Applied: %s", statement.splitlines()[0])
+
+def apply_post_load(statements):
+    """
+    Build the deferred foreign keys and date indexes (migrate's post-load statements)
+    on the loaded tables, one statement at a time.
+    """
+    if not statements:
+        return
+    with metrics.stage("post_load"):
+        apply_statements(statements, separately=True)
+    logger.info("Applied %d post-load DDL statements", len(statements))
+
+def migrate(ddl, defer_foreign_keys=False, not_valid=False):
+    """
+    Diff ddl (ddl_plan.DDLPlan) against one catalog snapshot and apply only the changes
+    the load needs. ddl.sheet_plans are aligned in place with the partitioning of the
+    existing tables (align_partitioning).
+    Returns the post-load statements (date indexes, and the foreign keys when
+    defer_foreign_keys) for apply_statements once the tables are loaded.
+    """
+    snapshot = read_catalog({sanitize_identifier(s) for s, _ in ddl.sheet_plans} | {"dates"})
+    for key, plan in ddl.sheet_plans.items():
+        ddl.sheet_plans[key] = align_partitioning(snapshot, plan)
+    statements, post_load = diff_ddl_plan(snapshot, ddl, defer_foreign_keys, not_valid)
+    if statements:
+        apply_statements(statements)
+        logger.info("Schema migrated: %d DDL statements", len(statements))
+    else:
+        logger.info("Schema up to date, no DDL")
+    if post_load:
+        logger.info("%d DDL statements deferred after the load", len(post_load))
+    return post_load
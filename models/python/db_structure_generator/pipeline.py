@@ -0,0 +1,92 @@
+"""
+Pipelined execution: stages running in their own threads, connected by bounded queues.
+While one stage waits on the network the others keep parsing and converting, and a full
+queue blocks the stage feeding it (backpressure), so at most a few items are in flight.
+"""
+
+import logging
+import queue
+import threading
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+# end-of-stream marker passed down the queues
+_END = object()
+# how often blocked stages check whether another stage failed (seconds)
+_POLL = 0.1
+
+def run_pipeline(source, stages, maxsize=2, thread_context=None):
+    """
+    Feed the items of source (read in the calling thread) through stages, a list of
+    (name, func): func(item) runs in the stage's thread and returns the item for the next
+    stage, or None to drop it (the last stage's results are discarded).
+    Queues hold at most maxsize items. thread_context (e.g. db.worker_connection) is
+    entered by every stage thread for its whole life.
+    The first exception of any stage (or of source) stops the pipeline and is re-raised.
+    """
+    stop = threading.Event()
+    errors = []
+    queues = [queue.Queue(maxsize) for _ in stages]
+
+    def fail(e):
+        if not errors:
+            errors.append(e)
+        stop.set()
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=_POLL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(q):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=_POLL)
+            except queue.Empty:
+                pass
+        return _END
+
+    def work(i, name, func):
+        out = queues[i + 1] if i + 1 < len(stages) else None
+        try:
+            with (thread_context or nullcontext)():
+                while True:
+                    item = get(queues[i])
+                    if item is _END:
+                        break
+                    result = func(item)
+                    if result is not None and out is not None and not put(out, result):
+                        return
+            if out is not None:
+                put(out, _END)
+        except BaseException as e:
+            logger.exception("Pipeline stage %s failed: %s", name, e)
+            fail(e)
+
+    threads = [
+        threading.Thread(target=work, args=(i, name, func), name="etl-%s" % name, daemon=True)
+        for i, (name, func) in enumerate(stages)
+    ]
+    for t in threads:
+        t.start()
+    try:
+        for item in source:
+            if not put(queues[0], item):
+                break
+        else:
+            put(queues[0], _END)
+    except BaseException as e:
+        fail(e)
+    finally:
+        close = getattr(source, "close", None)
+        if close is not None and stop.is_set():
+            close()
+        for t in threads:
+            t.join()
+    if errors:
+        raise errors[0]
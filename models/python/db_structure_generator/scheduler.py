@@ -0,0 +1,157 @@
+"""
+Table scheduler: create and load tables concurrently, respecting the
+foreign-key dependencies emitted by ddl_builder.build_create_table.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from config import ETL_PARALLEL, ETL_WORKERS
+from ddl_builder import build_create_table, table_dependencies
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class TableLoadError(Exception):
+    """
+    Raised at the end of a scheduled run when one or more tables failed.
+    failures: { (schema, table): exception }
+    """
+    def __init__(self, failures):
+        self.failures = failures
+        names = ", ".join("%s.%s" % k for k in sorted(failures))
+        super().__init__("%d table(s) failed: %s" % (len(failures), names))
+
+def build_dependency_graph(frames):
+    """
+    Return { (schema, table): set of (schema, table) it depends on } for the given
+    { (schema, table): dataframe }. Only dependencies between scheduled tables are kept:
+    the dates dimension is created before the scheduler runs.
+    """
+    graph = {}
+    for (schema, table), df in frames.items():
+        deps = table_dependencies(schema, table, list(df.columns))
+        graph[(schema, table)] = {d for d in deps if d in frames and d != (schema, table)}
+    return graph
+
+def create_and_load_table(schema, table, df):
+    """
+    Worker task: profile the sheet once, ensure the table exists and load its rows
+    with the same column plan, on one pinned connection.
+    """
+    from column_plan import build_sheet_plan
+    from db import exec_statements, worker_connection
+    from etl import load_dataframe_to_table
+    plan = build_sheet_plan(schema, table, df)
+    with worker_connection():
+        with metrics.stage("ddl", metrics.table_name(schema, table)):
+            exec_statements(build_create_table(schema, table, list(df.columns), plan=plan), grouped=True)
+        logger.info("Created/ensured table %s.%s", schema, table)
+        load_dataframe_to_table(schema, table, df, plan=plan)
+        logger.info("Loaded data for %s.%s (%d rows)", schema, table, len(df))
+
+def load_table(schema, table, df, plans, resume=None):
+    """
+    Worker task when the DDL was applied up front (ddl_plan.apply_ddl_plan): load the
+    rows with the column plan the table was compiled from, on one pinned connection.
+    plans: { (schema, table): column_plan.SheetPlan }
+    resume: continue from the load journal (see etl.load_dataframe_journaled).
+    """
+    from db import worker_connection
+    from etl import load_dataframe_to_table
+    with worker_connection():
+        load_dataframe_to_table(schema, table, df, plan=plans[(schema, table)], resume=resume)
+        logger.info("Loaded data for %s.%s (%d rows)", schema, table, len(df))
+
+def _init_process_worker():
+    import db
+    db.reset_pool_after_fork()
+
+def _run_in_process(task, schema, table, df):
+    """
+    Process-mode wrapper: run the task and hand its stage records back to the parent.
+    """
+    metrics.reset()
+    task(schema, table, df)
+    return metrics.records()
+
+def run_tables(frames, task=create_and_load_table, mode=None, workers=None):
+    """
+    Run task(schema, table, df) for every table, dependencies first.
+    mode: "sequential" (deterministic, in sheet order), "thread" or "process";
+          defaults to config.ETL_PARALLEL. workers defaults to config.ETL_WORKERS.
+    Failures don't stop independent tables; tables depending on a failed one are skipped.
+    All failures are reported together by raising TableLoadError at the end.
+    """
+    mode = (mode or ETL_PARALLEL).lower()
+    workers = workers or ETL_WORKERS
+    if mode == "process":
+        from db import supports
+        if not supports("processes"):
+            logger.warning("ETL_PARALLEL=process: the database can't be shared between processes, using threads")
+            mode = "thread"
+    graph = build_dependency_graph(frames)
+    failures = {}
+
+    if mode == "sequential" or workers <= 1:
+        done = set()
+        pending = list(frames)
+        while pending:
+            ready = [n for n in pending if graph[n] <= done | set(failures)]
+            if not ready:
+                raise ValueError("Dependency cycle between tables: %s" % pending)
+            for node in ready:
+                pending.remove(node)
+                blocked = graph[node] & set(failures)
+                if blocked:
+                    failures[node] = RuntimeError("skipped, depends on failed %s" % sorted(blocked))
+                    continue
+                try:
+                    task(node[0], node[1], frames[node])
+                    done.add(node)
+                except Exception as e:
+                    logger.exception("ETL error for %s.%s: %s", node[0], node[1], e)
+                    failures[node] = e
+    elif mode in ("thread", "process"):
+        if mode == "thread":
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="etl")
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_process_worker)
+        with executor:
+            done = set()
+            pending = set(frames)
+            running = {}
+            while pending or running:
+                for node in sorted(pending):
+                    blocked = graph[node] & set(failures)
+                    if blocked:
+                        pending.discard(node)
+                        failures[node] = RuntimeError("skipped, depends on failed %s" % sorted(blocked))
+                    elif graph[node] <= done:
+                        pending.discard(node)
+                        if mode == "process":
+                            fut = executor.submit(_run_in_process, task, node[0], node[1], frames[node])
+                        else:
+                            fut = executor.submit(task, node[0], node[1], frames[node])
+                        running[fut] = node
+                if not running:
+                    if pending:
+                        raise ValueError("Dependency cycle between tables: %s" % sorted(pending))
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    node = running.pop(fut)
+                    try:
+                        result = fut.result()
+                        if mode == "process":
+                            metrics.merge(result)
+                        done.add(node)
+                    except Exception as e:
+                        logger.exception("ETL error for %s.%s: %s", node[0], node[1], e)
+                        failures[node] = e
+    else:
+        raise ValueError("Unknown ETL_PARALLEL mode: %r" % mode)
+
+    if failures:
+        for (schema, table), e in sorted(failures.items()):
+            logger.error("Table %s.%s failed: %s", schema, table, e)
+        raise TableLoadError(failures)
@@ -0,0 +1,251 @@
+"""
+Load state: sheet/row fingerprints used by the incremental load mode, and the load
+journal recording how far each full table load got (resumed with --resume).
+Both are stored in the etl_state schema, next to the loaded data.
+"""
+
+import hashlib
+import json
+import logging
+from decimal import Decimal
+from typing import NamedTuple
+from psycopg2 import sql
+
+logger = logging.getLogger(__name__)
+
+STATE_SCHEMA = "etl_state"
+
+def build_create_state_tables():
+    """
+    Return SQL to create the load-state tables.
+    """
+    return [
+        sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(STATE_SCHEMA)),
+        sql.SQL("""
+        CREATE TABLE IF NOT EXISTS {}.sheet_state (
+            schema_name VARCHAR(63) NOT NULL,
+            table_name VARCHAR(63) NOT NULL,
+            sheet_hash CHAR(40) NOT NULL,
+            row_count INTEGER NOT NULL,
+            loaded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (schema_name, table_name)
+        )
+        """).format(sql.Identifier(STATE_SCHEMA)),
+        sql.SQL("""
+        CREATE TABLE IF NOT EXISTS {}.row_state (
+            schema_name VARCHAR(63) NOT NULL,
+            table_name VARCHAR(63) NOT NULL,
+            row_key TEXT NOT NULL,
+            row_hash CHAR(40) NOT NULL,
+            PRIMARY KEY (schema_name, table_name, row_key)
+        )
+        """).format(sql.Identifier(STATE_SCHEMA)),
+        sql.SQL("""
+        CREATE TABLE IF NOT EXISTS {}.load_journal (
+            schema_name VARCHAR(63) NOT NULL,
+            table_name VARCHAR(63) NOT NULL,
+            sheet_hash CHAR(40) NOT NULL,
+            row_count INTEGER NOT NULL,
+            rows_loaded INTEGER NOT NULL,
+            chunks_loaded INTEGER NOT NULL,
+            status VARCHAR(16) NOT NULL,
+            error TEXT,
+            started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (schema_name, table_name)
+        )
+        """).format(sql.Identifier(STATE_SCHEMA)),
+    ]
+
+def canonical_value(val):
+    """
+    Stable text form of a prepared cell: equal DB values give equal text
+    (e.g. Decimal('82.0') and Decimal('82')).
+    """
+    if val is None:
+        return None
+    if isinstance(val, Decimal):
+        return "NaN" if val.is_nan() else str(val.normalize())
+    return str(val)
+
+def row_key(values):
+    """
+    Return the text key stored in row_state for the given key values.
+    """
+    return json.dumps([canonical_value(v) for v in values])
+
+def parse_row_key(key):
+    """
+    Inverse of row_key: return the list of canonical key values.
+    """
+    return json.loads(key)
+
+def fingerprint_rows(columns, rows, key_idx):
+    """
+    Group rows by key and fingerprint each group.
+    Returns (sheet_hash, {row_key: row_hash}, {row_key: [row indexes]}).
+    Rows sharing a key are hashed together, so a key is "changed" when any of its rows is.
+    """
+    groups = {}
+    for i, row in enumerate(rows):
+        groups.setdefault(row_key([row[k] for k in key_idx]), []).append(i)
+
+    hashes = {}
+    for key, idxs in groups.items():
+        h = hashlib.sha1()
+        for i in idxs:
+            h.update(json.dumps([canonical_value(v) for v in rows[i]]).encode("utf-8"))
+            h.update(b"\n")
+        hashes[key] = h.hexdigest()
+
+    sheet = hashlib.sha1(json.dumps(columns).encode("utf-8"))
+    for key in sorted(hashes):
+        sheet.update(key.encode("utf-8"))
+        sheet.update(hashes[key].encode("ascii"))
+    return sheet.hexdigest(), hashes, groups
+
+class SheetState(NamedTuple):
+    """
+    sheet_state row of a table (sheet_hash None if never loaded incrementally) and the
+    rows the target table actually holds.
+    """
+    sheet_hash: str
+    row_count: int
+    table_rows: int
+
+def get_sheet_state(cur, schema, table):
+    """
+    Return the SheetState of schema.table, counting the target rows in the same query:
+    rows added or removed outside the incremental load make table_rows differ from
+    row_count.
+    """
+    cur.execute(
+        sql.SQL("""
+        SELECT s.sheet_hash, coalesce(s.row_count, 0), (SELECT count(*) FROM {}.{})
+        FROM (SELECT 1) one
+        LEFT JOIN {}.sheet_state s ON s.schema_name = %s AND s.table_name = %s
+        """).format(sql.Identifier(schema), sql.Identifier(table), sql.Identifier(STATE_SCHEMA)),
+        (schema, table)
+    )
+    return SheetState(*cur.fetchone())
+
+def get_row_hashes(cur, schema, table):
+    """
+    Return the stored {row_key: row_hash} of schema.table.
+    """
+    cur.execute(
+        sql.SQL("SELECT row_key, row_hash FROM {}.row_state WHERE schema_name = %s AND table_name = %s").format(
+            sql.Identifier(STATE_SCHEMA)),
+        (schema, table)
+    )
+    return dict(cur.fetchall())
+
+def save_state(cur, schema, table, sheet_hash, row_count, changed, removed):
+    """
+    Persist the new fingerprints: replace changed {row_key: row_hash}, delete removed keys
+    and record the sheet fingerprint.
+    """
+    from db import load_rows
+    if removed or changed:
+        cur.execute(
+            sql.SQL("DELETE FROM {}.row_state WHERE schema_name = %s AND table_name = %s AND row_key = ANY(%s)").format(
+                sql.Identifier(STATE_SCHEMA)),
+            (schema, table, list(removed) + list(changed))
+        )
+    if changed:
+        load_rows(cur, STATE_SCHEMA, "row_state", ["schema_name", "table_name", "row_key", "row_hash"],
+                  [(schema, table, k, h) for k, h in changed.items()])
+    cur.execute(
+        sql.SQL("""
+        INSERT INTO {}.sheet_state (schema_name, table_name, sheet_hash, row_count, loaded_at)
+        VALUES (%s, %s, %s, %s, now())
+        ON CONFLICT (schema_name, table_name)
+        DO UPDATE SET sheet_hash = EXCLUDED.sheet_hash, row_count = EXCLUDED.row_count, loaded_at = now()
+        """).format(sql.Identifier(STATE_SCHEMA)),
+        (schema, table, sheet_hash, row_count)
+    )
+
+class JournalEntry(NamedTuple):
+    """
+    load_journal row of a table: rows_loaded is the offset of the first row not yet
+    committed (chunks_loaded chunks were committed before it).
+    """
+    sheet_hash: str
+    row_count: int
+    rows_loaded: int
+    chunks_loaded: int
+    status: str
+
+def frame_fingerprint(columns, df):
+    """
+    Fingerprint of a whole sheet as extracted (column names and cell values, in row
+    order): a resumed load only continues from its offset if the sheet is unchanged.
+    """
+    import pandas as pd
+    h = hashlib.sha1(json.dumps(list(columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+def get_journal(cur, schema, table):
+    """
+    Return the JournalEntry of schema.table, or None if it never had a journaled load.
+    """
+    cur.execute(
+        sql.SQL("""
+        SELECT sheet_hash, row_count, rows_loaded, chunks_loaded, status
+        FROM {}.load_journal WHERE schema_name = %s AND table_name = %s
+        """).format(sql.Identifier(STATE_SCHEMA)),
+        (schema, table)
+    )
+    r = cur.fetchone()
+    return JournalEntry(*r) if r else None
+
+def journal_start(cur, schema, table, sheet_hash, row_count, rows_loaded=0, chunks_loaded=0):
+    """
+    Open the journal entry of a load starting (or resuming) at row rows_loaded.
+    """
+    cur.execute(
+        sql.SQL("""
+        INSERT INTO {}.load_journal
+            (schema_name, table_name, sheet_hash, row_count, rows_loaded, chunks_loaded, status, error, started_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, 'loading', NULL, now(), now())
+        ON CONFLICT (schema_name, table_name) DO UPDATE SET
+            sheet_hash = EXCLUDED.sheet_hash, row_count = EXCLUDED.row_count, rows_loaded = EXCLUDED.rows_loaded,
+            chunks_loaded = EXCLUDED.chunks_loaded, status = 'loading', error = NULL,
+            started_at = now(), updated_at = now()
+        """).format(sql.Identifier(STATE_SCHEMA)),
+        (schema, table, sheet_hash, row_count, rows_loaded, chunks_loaded)
+    )
+
+def journal_progress(cur, schema, table, rows_loaded, chunks_loaded):
+    """
+    Move the committed offset forward: run in the transaction of the chunk it covers.
+    """
+    cur.execute(
+        sql.SQL("""
+        UPDATE {}.load_journal SET rows_loaded = %s, chunks_loaded = %s, updated_at = now()
+        WHERE schema_name = %s AND table_name = %s
+        """).format(sql.Identifier(STATE_SCHEMA)),
+        (rows_loaded, chunks_loaded, schema, table)
+    )
+
+def journal_finish(cur, schema, table, status, error=None):
+    """
+    Close the journal entry: status "done", or "failed" with the error.
+    The committed offset is kept, so a failed load can be resumed.
+    """
+    cur.execute(
+        sql.SQL("""
+        UPDATE {}.load_journal SET status = %s, error = %s, updated_at = now()
+        WHERE schema_name = %s AND table_name = %s
+        """).format(sql.Identifier(STATE_SCHEMA)),
+        (status, error, schema, table)
+    )
+
+def journal_clear(cur, tables):
+    """
+    Drop the journal entries of tables ((schema, table) pairs): the rows of a load
+    without resume are not journaled.
+    """
+    cur.execute(sql.SQL("DELETE FROM {}.load_journal WHERE schema_name || '.' || table_name = ANY(%s)").format(
+        sql.Identifier(STATE_SCHEMA)), (["%s.%s" % t for t in tables],))
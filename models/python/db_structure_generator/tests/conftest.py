@@ -0,0 +1,12 @@
+"""
+pytest setup: the ETL modules import each other as top-level modules, and the
+database tests run on an in-memory DuckDB (DB_BACKEND=duckdb) instead of PostgreSQL.
+"""
+
+import os
+import sys
+
+os.environ.setdefault("DB_BACKEND", "duckdb")
+os.environ.setdefault("DUCKDB_PATH", ":memory:")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
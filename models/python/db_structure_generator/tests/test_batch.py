@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+import batch
+import extractor
+from db import connection, exec_statements
+
+
+def _workbook(path, rents, extra=None):
+    """
+    Save a tracker with a needs.rents sheet of (date, rent_value) rows (and extra sheets).
+    """
+    wb = Workbook()
+    wb.active.title = "public.overview"
+    sheets = {"needs.rents": [("date", "rent_value")] + rents}
+    sheets.update(extra or {})
+    for name, rows in sheets.items():
+        ws = wb.create_sheet(name)
+        for row in rows:
+            ws.append(row)
+    wb.save(str(path))
+
+
+def _rents():
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT source_workbook, date, rent_value FROM needs.rents ORDER BY 1, 2")
+            return [(s, d, float(v)) for s, d, v in cur.fetchall()]
+
+
+@pytest.fixture
+def trackers(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "ETL_PARALLEL", "sequential")
+    monkeypatch.setattr(extractor, "EXTRACT_CACHE", "off")
+    exec_statements(["DROP SCHEMA IF EXISTS needs CASCADE", "DROP SCHEMA IF EXISTS wishes CASCADE"])
+    _workbook(tmp_path / "anna.xlsx", [("09/2025", 500.0), ("10/2025", 510.0)])
+    _workbook(tmp_path / "bruno.xlsx", [("09/2025", 700.0)],
+              {"wishes.trips": [("date", "trip_value", "notes"), ("12/2025", 90.0, "mare")]})
+    (tmp_path / "~$anna.xlsx").write_bytes(b"lock")
+    (tmp_path / "notes.txt").write_text("not a workbook")
+    return tmp_path
+
+
+def test_resolve_workbooks(trackers):
+    names = ["anna.xlsx", "bruno.xlsx"]
+    assert batch.resolve_workbooks(str(trackers)) == [str(trackers / n) for n in names]
+    assert batch.resolve_workbooks(str(trackers / "b*.xlsx")) == [str(trackers / "bruno.xlsx")]
+    with pytest.raises(FileNotFoundError):
+        batch.resolve_workbooks(str(trackers / "*.xlsm"))
+
+
+def test_merge_frames_unions_sheets_and_columns():
+    a = {("dates", "dates"): pd.DataFrame(columns=["id", "date"]),
+         ("needs", "rents"): pd.DataFrame({"date": ["09/2025"], "rent_value": [1.0]})}
+    b = {("needs", "rents"): pd.DataFrame({"date": ["10/2025"], "notes": ["x"]}),
+         ("wishes", "trips"): pd.DataFrame({"date": ["12/2025"]})}
+    merged, dates_columns = batch.merge_frames([a, b])
+    assert sorted(merged) == [("needs", "rents"), ("wishes", "trips")]
+    assert list(merged[("needs", "rents")].columns) == ["date", "rent_value", "notes"]
+    assert len(merged[("needs", "rents")]) == 2
+    assert dates_columns == ["id", "date"]
+
+
+def test_batch_rerun_replaces_the_rows_of_its_workbooks(trackers):
+    expected = [("anna.xlsx", 20250901, 500.0), ("anna.xlsx", 20251001, 510.0), ("bruno.xlsx", 20250901, 700.0)]
+    batch.main_workbooks(str(trackers))
+    assert _rents() == expected
+
+    # a single-workbook run leaves rows without a source: the batch replaces them too
+    exec_statements(["INSERT INTO needs.rents (date, rent_value) VALUES (20250901, 500.0)"])
+    batch.main_workbooks(str(trackers))
+    assert _rents() == expected
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT source_workbook, trip_value FROM wishes.trips")
+            assert [(s, float(v)) for s, v in cur.fetchall()] == [("bruno.xlsx", 90.0)]
+
+
+def test_batch_reload_keeps_the_other_workbooks(trackers):
+    batch.main_workbooks(str(trackers))
+    _workbook(trackers / "anna.xlsx", [("09/2025", 505.0)])
+    batch.main_workbooks(str(trackers / "anna.xlsx"))
+    assert _rents() == [("anna.xlsx", 20250901, 505.0), ("bruno.xlsx", 20250901, 700.0)]
@@ -0,0 +1,59 @@
+import pytest
+
+from db import BatchSizer
+
+KEY = ("needs", "rents")
+
+
+def _sizer(rtt, min_rows=100, max_rows=100000, rtt_share=0.1):
+    sizer = BatchSizer(min_rows=min_rows, max_rows=max_rows, rtt_share=rtt_share)
+    sizer.rtt = rtt
+    return sizer
+
+
+def test_first_page_uses_the_start_size_within_bounds():
+    assert _sizer(None).size(KEY) == BatchSizer.start_rows
+    assert _sizer(0.01).size(KEY) == BatchSizer.start_rows
+    assert _sizer(0.01, min_rows=5000).size(KEY) == 5000
+    assert _sizer(0.01, min_rows=10, max_rows=200).size(KEY) == 200
+
+
+def test_page_is_sized_from_round_trip_and_row_cost():
+    # 10 ms round trip, 10 us per row: rtt is 10% of the statement at 9000 rows
+    sizer = _sizer(0.010)
+    sizer.observe(KEY, 3000, 0.010 + 3000 * 0.00001)
+    assert sizer.size(KEY) == pytest.approx(9000, abs=1)
+
+
+@pytest.mark.parametrize("cost, expected", [
+    (1e-3, 250),    # slow rows: at most 4x smaller than the last page
+    (1e-9, 4000),   # free rows: at most 4x bigger
+])
+def test_page_changes_at_most_4x(cost, expected):
+    sizer = _sizer(0.010, min_rows=10)
+    sizer.observe(KEY, 1000, 0.010 + 1000 * cost)
+    assert sizer.size(KEY) == expected
+
+
+def test_bounds_win_over_the_4x_step():
+    sizer = _sizer(0.010, min_rows=1000, max_rows=5000)
+    sizer.observe(KEY, 20, 0.010 + 20 * 1e-9)   # short tail page of a chunk
+    assert sizer.size(KEY) == 1000
+    sizer.observe(KEY, 5000, 0.010 + 5000 * 1e-9)
+    assert sizer.size(KEY) == 5000
+
+
+def test_round_trip_is_the_fastest_page():
+    sizer = BatchSizer()
+    sizer.observe(KEY, 100, 0.050)
+    sizer.observe(KEY, 100, 0.020)
+    sizer.observe(("needs", "loans"), 100, 0.030)
+    assert sizer.rtt == 0.020
+    stats = sizer.stats()
+    assert stats["rtt_ms"] == 20.0
+    assert stats["tables"]["needs.rents"] == {"pages": 2, "rows": 200, "rows_per_page": 100, "last_page_rows": 100}
+
+
+def test_max_rows_is_never_below_min_rows():
+    sizer = BatchSizer(min_rows=500, max_rows=100)
+    assert sizer.max_rows == 500
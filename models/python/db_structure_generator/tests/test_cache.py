@@ -0,0 +1,57 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cache
+
+
+def test_store_and_load(tmp_path):
+    cache.store("k1", {"a": [1, 2]}, source="book.xlsx", cache_dir=str(tmp_path), max_bytes=10 ** 6)
+    assert cache.load("k1", cache_dir=str(tmp_path)) == {"a": [1, 2]}
+    assert cache.load("missing", cache_dir=str(tmp_path)) is None
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    d = str(tmp_path)
+    cache.store("old", "x" * 1000, cache_dir=d, max_bytes=10 ** 6)
+    cache.store("new", "y" * 1000, cache_dir=d, max_bytes=10 ** 6)
+    cache.store("last", "z" * 1000, cache_dir=d, max_bytes=2500)
+    assert cache.load("old", cache_dir=d) is None
+    assert cache.load("new", cache_dir=d) == "y" * 1000
+    assert not os.path.exists(os.path.join(d, "old.pkl"))
+
+
+def test_hit_touches_the_entry_without_rewriting_the_manifest(tmp_path):
+    d = str(tmp_path)
+    cache.store("old", "x" * 1000, cache_dir=d, max_bytes=10 ** 6)
+    cache.store("new", "y" * 1000, cache_dir=d, max_bytes=10 ** 6)
+    os.utime(os.path.join(d, "old.pkl"), (1000, 1000))
+    os.utime(os.path.join(d, "new.pkl"), (2000, 2000))
+    manifest = (tmp_path / cache.MANIFEST).read_bytes()
+    assert cache.load("old", cache_dir=d) == "x" * 1000
+    assert (tmp_path / cache.MANIFEST).read_bytes() == manifest
+    cache.store("last", "z" * 1000, cache_dir=d, max_bytes=2500)
+    assert cache.load("new", cache_dir=d) is None
+    assert cache.load("old", cache_dir=d) == "x" * 1000
+
+
+def test_orphan_files_are_removed(tmp_path):
+    d = str(tmp_path)
+    (tmp_path / "orphan.pkl").write_bytes(b"x" * 100)
+    cache.store("k1", 1, cache_dir=d, max_bytes=10 ** 6)
+    assert sorted(p.name for p in tmp_path.glob("*.pkl")) == ["k1.pkl"]
+
+
+def _store(args):
+    key, d = args
+    cache.store(key, key * 100, cache_dir=d, max_bytes=10 ** 9)
+
+
+def test_concurrent_writers_keep_every_entry(tmp_path):
+    d = str(tmp_path)
+    keys = ["k%d" % i for i in range(24)]
+    with ProcessPoolExecutor(4) as pool:
+        list(pool.map(_store, [(k, d) for k in keys]))
+    assert sorted(cache._read_manifest(d)) == sorted(keys)
+    assert all(cache.load(k, cache_dir=d) == k * 100 for k in keys)
+    assert cache.clear(d) == len(keys)
+    assert list(tmp_path.glob("*.pkl")) == []
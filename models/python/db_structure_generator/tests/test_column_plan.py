@@ -0,0 +1,65 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from column_plan import build_sheet_plan, profile_column
+from config import MONEY_SCALE
+
+MONEY = "DECIMAL(18,%d)" % MONEY_SCALE
+
+
+def _types(df, sample=False):
+    return {c.name: c.sql_type for c in build_sheet_plan("needs", "rents", df, sample=sample).columns}
+
+
+def _sheet():
+    return pd.DataFrame({
+        "id": [1, 2, 3],
+        "date": [datetime(2025, 9, 1), datetime(2025, 10, 1), datetime(2025, 11, 1)],
+        "rent": [500, 500, 520],
+        "condo": [10.5, 12.25, None],
+        "rent_value": ["510,50", "512,25", "520"],
+        "paid": [True, False, True],
+        "note": ["a", "bb", None],
+        "empty": [None, None, None],
+    })
+
+
+def test_amounts_have_a_fixed_scale():
+    types = _types(_sheet())
+    assert types["rent"] == MONEY
+    assert types["condo"] == MONEY
+    assert types["rent_value"] == MONEY
+    assert types["empty"] == MONEY
+
+
+def test_sampled_and_full_profiles_agree_on_amounts():
+    full, sampled = _types(_sheet()), _types(_sheet(), sample=True)
+    for name in ("id", "date", "rent", "condo", "rent_value", "paid", "empty"):
+        assert full[name] == sampled[name], name
+    assert (full["note"], sampled["note"]) == ("VARCHAR(50)", "TEXT")
+
+
+def test_other_kinds():
+    types = _types(_sheet())
+    assert types["id"] == "INTEGER"
+    assert types["date"] == "INTEGER"
+    assert types["paid"] == "BOOLEAN"
+
+
+@pytest.mark.parametrize("values, sql_type", [
+    ([1, 2], "INTEGER"),
+    ([1, 2 ** 40], "BIGINT"),
+])
+def test_id_columns_stay_integer(values, sql_type):
+    assert profile_column("account_id", pd.Series(values)).sql_type == sql_type
+
+
+def test_values_beyond_decimal_18_become_numeric():
+    assert profile_column("total", pd.Series([10.0 ** 15])).sql_type == "NUMERIC"
+
+
+@pytest.mark.parametrize("length, sql_type", [(50, "VARCHAR(50)"), (51, "VARCHAR(255)"), (256, "TEXT")])
+def test_text_widths(length, sql_type):
+    assert profile_column("note", pd.Series(["x" * length, "y"])).sql_type == sql_type
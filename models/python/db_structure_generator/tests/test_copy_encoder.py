@@ -0,0 +1,65 @@
+import struct
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from copy_encoder import (
+    PGCOPY_HEADER, PGCOPY_TRAILER, binary_encoders, encode_binary_rows, encode_text_rows, _encode_numeric
+)
+
+
+def _decode_numeric(field):
+    """
+    Read back a binary NUMERIC field (int32 length, ndigits, weight, sign, dscale, digits).
+    """
+    length, ndigits, weight, sign, dscale = struct.unpack("!ihhHH", field[:12])
+    assert length == len(field) - 4
+    if sign == 0xC000:
+        return Decimal("NaN")
+    digits = struct.unpack("!%dh" % ndigits, field[12:])
+    value = sum((Decimal(d) * Decimal(10000) ** (weight - i) for i, d in enumerate(digits)), Decimal(0))
+    value = value.quantize(Decimal(1).scaleb(-dscale))
+    return -value if sign == 0x4000 else value
+
+
+@pytest.mark.parametrize("value", [
+    "0.00", "-0.01", "12.50", "-123.45", "1234.56", "10000.00", "-9999999999999999.99", "9999999999999999.99",
+])
+def test_numeric_18_2_round_trip(value):
+    assert _decode_numeric(_encode_numeric(Decimal(value))) == Decimal(value)
+    # fixed-point money columns pass the numeric text itself
+    assert _encode_numeric(value) == _encode_numeric(Decimal(value))
+
+
+def test_numeric_keeps_scale():
+    field = _encode_numeric(Decimal("0.00"))
+    assert field == struct.pack("!ihhHH", 8, 0, 0, 0, 2)
+    assert str(_decode_numeric(_encode_numeric(Decimal("-5.10")))) == "-5.10"
+    assert _decode_numeric(_encode_numeric(Decimal("1E+3"))) == Decimal(1000)
+
+
+def test_numeric_nan_and_infinity():
+    assert _decode_numeric(_encode_numeric(Decimal("NaN"))).is_nan()
+    with pytest.raises(ValueError):
+        _encode_numeric(Decimal("Infinity"))
+
+
+def test_text_rows_escape_and_null():
+    rows = [(1, Decimal("2.50"), True, date(2024, 1, 1), "a\tb\\c\n", None)]
+    assert list(encode_text_rows(rows)) == [b"1\t2.50\tt\t2024-01-01\ta\\tb\\\\c\\n\t\\N\n"]
+
+
+def test_binary_rows():
+    encoders = binary_encoders(["integer", "numeric(18,2)", "date", "character varying(50)", "boolean"])
+    chunks = list(encode_binary_rows([(7, Decimal("1.5"), "2000-01-02", "è", None)], encoders))
+    assert chunks[0] == PGCOPY_HEADER and chunks[-1] == PGCOPY_TRAILER
+    assert chunks[1] == (
+        struct.pack("!h", 5) + struct.pack("!ii", 4, 7) + _encode_numeric(Decimal("1.5"))
+        + struct.pack("!ii", 4, 1) + struct.pack("!i", 2) + "è".encode("utf-8") + struct.pack("!i", -1)
+    )
+
+
+def test_binary_encoders_reject_unknown_types():
+    with pytest.raises(ValueError):
+        binary_encoders(["jsonb"])
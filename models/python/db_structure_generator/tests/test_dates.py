@@ -0,0 +1,68 @@
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+import db
+from etl import date_key
+from utils import detect_date_format, parse_date_column
+
+
+@pytest.mark.parametrize("values, fmt", [
+    (["09/2025", "10/2025", "1/2026"], "MM/YYYY"),
+    (["2025-09", "2025/10", "2026-01-15"], "YYYY-MM"),
+    (["September-25", "Oct 2025", "gennaio-26"], "MONTH-YY"),
+    ([datetime(2025, 9, 1), date(2025, 10, 1)], "EXCEL"),
+    ([None, float("nan"), "09/2025", "text", "10/2025"], "MM/YYYY"),
+    (["text", None], None),
+    ([], None),
+])
+def test_detect_date_format(values, fmt):
+    assert detect_date_format(values) == fmt
+
+
+def test_detect_date_format_uses_the_majority_of_the_sample():
+    assert detect_date_format(["2025-09", "09/2025", "10/2025"]) == "MM/YYYY"
+    assert detect_date_format(["2025-09"] * 3 + ["09/2025"] * 5, sample_size=3) == "YYYY-MM"
+
+
+def test_parse_date_column_exact_formats():
+    dates, fallback = parse_date_column(["09/2025", " 2025-10 ", "Nov-25", "settembre-2025", "13/2025"])
+    assert dates == [date(2025, 9, 1), date(2025, 10, 1), date(2025, 11, 1), date(2025, 9, 1), None]
+    assert fallback == [False, False, False, False, True]
+
+
+def test_parse_date_column_cells():
+    dates, fallback = parse_date_column([None, float("nan"), "", "nan", datetime(2025, 9, 3, 12), date(2025, 9, 4)])
+    assert dates == [None, None, None, None, date(2025, 9, 3), date(2025, 9, 4)]
+    assert fallback == [False] * 6
+
+
+def test_parse_date_column_fuzzy_fallback():
+    dates, fallback = parse_date_column(["09/2025", "September 3, 2025"])
+    assert dates == [date(2025, 9, 1), date(2025, 9, 3)]
+    assert fallback == [False, True]
+
+
+@pytest.mark.parametrize("value", ["2025-09-01", "2025-09-01T00:00:00", date(2025, 9, 1),
+                                   datetime(2025, 9, 1, 12), pd.Timestamp("2025-09-01")])
+def test_date_key(value):
+    assert date_key(value) == 20250901
+
+
+def test_calendar_is_filled_once_across_a_year_boundary(monkeypatch):
+    monkeypatch.setattr(db, "_calendar_years", set())
+    assert db.ensure_calendar([date(2025, 12, 31), date(2026, 1, 1), None]) == 2
+    # every day of both years, nothing sent for years already filled
+    assert db.ensure_calendar([date(2025, 3, 1), date(2026, 12, 31)]) == 0
+    # a new process fills them again: the days already there are skipped
+    db._calendar_years.clear()
+    assert db.ensure_calendar([date(2026, 6, 1), date(2025, 6, 1)]) == 2
+    with db.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*), min(date_id), max(date_id) FROM dates.dates "
+                        "WHERE date_id BETWEEN 20250101 AND 20261231")
+            assert cur.fetchone() == (730, 20250101, 20261231)
+            cur.execute("SELECT date_id, year, quarter, month, month_name FROM dates.dates "
+                        "WHERE date_id IN (20251231, 20260101) ORDER BY 1")
+            assert cur.fetchall() == [(20251231, 2025, 4, 12, "December"), (20260101, 2026, 1, 1, "January")]
@@ -0,0 +1,21 @@
+import logging
+
+from openpyxl import Workbook
+
+from extractor import iter_sheet_chunks, sheet_names
+
+
+def test_streaming_logs_each_skipped_sheet_once(tmp_path, caplog):
+    wb = Workbook()
+    wb.active.title = "public.overview"
+    wb.create_sheet("notes")
+    ws = wb.create_sheet("needs.rents")
+    ws.append(["id", "rent_value"])
+    ws.append([1, 500.0])
+    path = str(tmp_path / "book.xlsx")
+    wb.save(path)
+
+    with caplog.at_level(logging.INFO, logger="extractor"):
+        assert sheet_names(path) == [("needs", "rents")]
+        assert [(s, t) for s, t, _, chunks in iter_sheet_chunks(path) if list(chunks)] == [("needs", "rents")]
+    assert caplog.text.count("Skipping sheet (not schema.table): notes") == 1
@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+
+import etl
+from column_plan import build_sheet_plan
+from db import connection, exec_statements
+from ddl_builder import build_create_schema, build_table_definition
+
+
+def _table(schema, table, df):
+    """
+    Create an empty schema.table for df (dropping the schema and its stored fingerprints).
+    """
+    plan = build_sheet_plan(schema, table, df)
+    etl.ensure_state_tables()
+    exec_statements(
+        ["DROP SCHEMA IF EXISTS %s CASCADE" % schema, build_create_schema(schema)]
+        + build_table_definition(schema, table, plan.names, plan)
+        + ["DELETE FROM etl_state.sheet_state WHERE schema_name = '%s'" % schema,
+           "DELETE FROM etl_state.row_state WHERE schema_name = '%s'" % schema]
+    )
+
+
+def _query(query):
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query)
+            return cur.fetchall()
+
+
+def _load(schema, table, df):
+    etl.load_dataframe_incremental(schema, table, df, plan=build_sheet_plan(schema, table, df))
+
+
+@pytest.fixture
+def rents():
+    df = pd.DataFrame({"id": [1, 2, 3], "rent_value": [500.0, 510.5, 520.0]})
+    _table("needs", "rents", df)
+    _load("needs", "rents", df)
+    return df
+
+
+def test_unchanged_sheet_is_skipped(rents, caplog):
+    with caplog.at_level("INFO", logger="etl"):
+        _load("needs", "rents", rents)
+    assert "Unchanged sheet, skipping needs.rents" in caplog.text
+    assert _query("SELECT id, rent_value FROM needs.rents ORDER BY id") == [(1, 500.0), (2, 510.5), (3, 520.0)]
+
+
+def test_changed_and_removed_keys(rents):
+    _load("needs", "rents", pd.DataFrame({"id": [1, 3, 4], "rent_value": [500.0, 525.0, 530.0]}))
+    assert _query("SELECT id, rent_value FROM needs.rents ORDER BY id") == [(1, 500.0), (3, 525.0), (4, 530.0)]
+    assert _query("SELECT row_count FROM etl_state.sheet_state "
+                  "WHERE schema_name = 'needs' AND table_name = 'rents'") == [(3,)]
+    assert _query("SELECT count(*) FROM etl_state.row_state "
+                  "WHERE schema_name = 'needs' AND table_name = 'rents'") == [(3,)]
+
+
+def test_removed_date_keys_match_their_date_id():
+    df = pd.DataFrame({"pay_date": ["09/2025", "10/2025", "01/2026"], "amount": [10.0, 20.0, 30.0]})
+    _table("income", "salary", df)
+    _load("income", "salary", df)
+    assert _query("SELECT pay_date, amount FROM income.salary ORDER BY pay_date") == [
+        (20250901, 10.0), (20251001, 20.0), (20260101, 30.0)]
+
+    _load("income", "salary", pd.DataFrame({"pay_date": ["09/2025", "01/2026"], "amount": [10.0, 35.0]}))
+    assert _query("SELECT pay_date, amount FROM income.salary ORDER BY pay_date") == [(20250901, 10.0), (20260101, 35.0)]
+
+
+@pytest.mark.parametrize("tamper", [
+    "DELETE FROM needs.rents WHERE id = 2",
+    "INSERT INTO needs.rents (id, rent_value) VALUES (9, 600.0)",
+])
+def test_table_out_of_step_with_its_fingerprints_is_reloaded(rents, tamper):
+    exec_statements([tamper])
+    _load("needs", "rents", rents)
+    assert _query("SELECT id, rent_value FROM needs.rents ORDER BY id") == [(1, 500.0), (2, 510.5), (3, 520.0)]
+
+
+def test_full_load_then_incremental_does_not_duplicate():
+    df = pd.DataFrame({"id": [1, 2], "rent_value": [500.0, 510.5]})
+    _table("needs", "rents", df)
+    exec_statements(["INSERT INTO needs.rents (id, rent_value) VALUES (1, 500.0), (2, 510.5)"])
+    _load("needs", "rents", df)
+    assert _query("SELECT id, rent_value FROM needs.rents ORDER BY id") == [(1, 500.0), (2, 510.5)]
@@ -0,0 +1,129 @@
+import pandas as pd
+import pytest
+
+import db
+import etl
+from column_plan import build_sheet_plan
+from db import connection, exec_statements
+from ddl_builder import build_create_schema, build_table_definition
+
+LOAD_COLUMNS = etl.load_columns
+
+
+@pytest.fixture
+def sheet(monkeypatch):
+    """
+    An empty needs.rents table and its sheet, loaded LOAD_CHUNK_ROWS=2 rows at a time.
+    """
+    monkeypatch.setattr(etl, "LOAD_CHUNK_ROWS", 2)
+    df = pd.DataFrame({"id": range(1, 8), "rent_value": [500.0, 510.5, 520.0, 530.25, 540.0, 550.0, 560.0]})
+    plan = build_sheet_plan("needs", "rents", df)
+    exec_statements(
+        ["DROP SCHEMA IF EXISTS needs CASCADE", build_create_schema("needs")]
+        + build_table_definition("needs", "rents", plan.names, plan)
+    )
+    etl.reset_journal([("needs", "rents"), ("needs", "bills")])
+    return df, plan
+
+
+def _ids():
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM needs.rents ORDER BY id")
+            return [r[0] for r in cur.fetchall()]
+
+
+def _journal():
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT rows_loaded, chunks_loaded, status FROM etl_state.load_journal "
+                        "WHERE schema_name = 'needs' AND table_name = 'rents'")
+            return cur.fetchone()
+
+
+def _fail_on_chunk(monkeypatch, n):
+    calls = []
+
+    def failing(cur, *args, **kwargs):
+        calls.append(1)
+        if len(calls) == n:
+            raise ConnectionError("pooler timeout")
+        return LOAD_COLUMNS(cur, *args, **kwargs)
+    monkeypatch.setattr(etl, "load_columns", failing)
+
+
+def test_resume_after_a_partial_load(sheet, monkeypatch):
+    df, plan = sheet
+    _fail_on_chunk(monkeypatch, 3)
+    with pytest.raises(ConnectionError):
+        etl.load_dataframe_to_table("needs", "rents", df, plan=plan, mode="full", resume=True)
+    assert _ids() == [1, 2, 3, 4]
+    assert _journal() == (4, 2, "failed")
+
+    monkeypatch.setattr(etl, "load_columns", LOAD_COLUMNS)
+    etl.load_dataframe_to_table("needs", "rents", df, plan=plan, mode="full", resume=True)
+    assert _ids() == list(range(1, 8))
+    assert _journal() == (7, 4, "done")
+
+    # a done table is skipped
+    etl.load_dataframe_to_table("needs", "rents", df, plan=plan, mode="full", resume=True)
+    assert _ids() == list(range(1, 8))
+
+
+def test_changed_sheet_replaces_the_partial_rows(sheet, monkeypatch):
+    df, plan = sheet
+    _fail_on_chunk(monkeypatch, 2)
+    with pytest.raises(ConnectionError):
+        etl.load_dataframe_to_table("needs", "rents", df, plan=plan, mode="full", resume=True)
+    assert _ids() == [1, 2]
+    monkeypatch.setattr(etl, "load_columns", LOAD_COLUMNS)
+
+    changed = df.assign(rent_value=df.rent_value + 1)
+    etl.load_dataframe_to_table("needs", "rents", changed, plan=plan, mode="full", resume=True)
+    assert _ids() == list(range(1, 8))
+    assert _journal() == (7, 4, "done")
+
+
+def test_load_without_resume_is_not_journaled(sheet):
+    df, plan = sheet
+    etl.load_dataframe_to_table("needs", "rents", df, plan=plan, mode="full", resume=False)
+    assert _ids() == list(range(1, 8))
+    assert _journal() is None
+
+    # the rows of that load are replaced, not duplicated, by a resumed load
+    etl.load_dataframe_to_table("needs", "rents", df, plan=plan, mode="full", resume=True)
+    assert _ids() == list(range(1, 8))
+    assert _journal() == (7, 4, "done")
+
+
+def test_plain_load_run_twice_replaces_the_rows(sheet):
+    df, plan = sheet
+    etl.load_dataframe_to_table("needs", "rents", df, plan=plan, mode="full", resume=False)
+    etl.load_dataframe_to_table("needs", "rents", df, plan=plan, mode="full", resume=False)
+    assert _ids() == list(range(1, 8))
+
+    etl.load_dataframe_to_table("needs", "rents", df.iloc[:3], plan=plan, mode="full", resume=False)
+    assert _ids() == [1, 2, 3]
+    etl.load_dataframe_to_table("needs", "rents", df.iloc[:0], plan=plan, mode="full", resume=False)
+    assert _ids() == []
+
+
+def test_failed_plain_load_keeps_the_earlier_rows(sheet, monkeypatch):
+    df, plan = sheet
+    etl.load_dataframe_to_table("needs", "rents", df, plan=plan, mode="full", resume=False)
+
+    def failing(*args, **kwargs):
+        raise ConnectionError("pooler timeout")
+    monkeypatch.setattr(db, "load_columns", failing)
+    with pytest.raises(ConnectionError):
+        etl.load_dataframe_to_table("needs", "rents", df.iloc[:3], plan=plan, mode="full", resume=False)
+    assert _ids() == list(range(1, 8))
+
+
+def test_reset_journal_keeps_the_tables_not_loaded(sheet):
+    df, plan = sheet
+    etl.load_dataframe_to_table("needs", "rents", df, plan=plan, mode="full", resume=True)
+    etl.reset_journal([("needs", "bills")])
+    assert _journal() == (7, 4, "done")
+    etl.reset_journal([("needs", "rents")])
+    assert _journal() is None
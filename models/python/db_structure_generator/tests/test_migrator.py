@@ -0,0 +1,113 @@
+import pandas as pd
+import pytest
+
+from column_plan import build_sheet_plan
+from migrator import CatalogSnapshot, catalog_type, legacy_dates, rekey_dates, widened_type
+
+
+@pytest.mark.parametrize("sql_type, spelled", [
+    ("DECIMAL(18,2)", "numeric(18,2)"),
+    ("DECIMAL(18, 4)", "numeric(18,4)"),
+    ("NUMERIC(20,0)", "numeric(20,0)"),
+    ("VARCHAR(50)", "character varying(50)"),
+    ("SMALLINT", "smallint"),
+    ("SERIAL", "integer"),
+    ("NUMERIC", "numeric"),
+    ("TEXT", "text"),
+])
+def test_catalog_type(sql_type, spelled):
+    assert catalog_type(sql_type) == spelled
+
+
+@pytest.mark.parametrize("current, desired, merged", [
+    # integers only grow
+    ("smallint", "integer", "integer"),
+    ("integer", "smallint", None),
+    ("integer", "bigint", "bigint"),
+    # integers into amounts keep their integer digits
+    ("smallint", "numeric(18,4)", "numeric(18,4)"),
+    ("bigint", "numeric(18,4)", "numeric(23,4)"),
+    # amounts keep the widest integer part and the widest scale
+    ("numeric(18,2)", "numeric(18,4)", "numeric(20,4)"),
+    ("numeric(18,4)", "numeric(18,2)", "numeric(20,4)"),
+    ("numeric(18,4)", "numeric(18,4)", None),
+    ("numeric(18,4)", "numeric", "numeric"),
+    ("numeric", "numeric(18,4)", None),
+    # text
+    ("character varying(50)", "character varying(255)", "character varying(255)"),
+    ("character varying(255)", "character varying(50)", None),
+    ("character varying(50)", "text", "text"),
+    ("integer", "character varying(50)", "text"),
+    ("numeric(18,2)", "text", "text"),
+    ("text", "integer", None),
+    # kinds that don't mix are left alone
+    ("date", "integer", None),
+    ("boolean", "numeric(18,4)", None),
+    ("date", "text", None),
+])
+def test_widened_type(current, desired, merged):
+    assert widened_type(current, desired) == merged
+
+
+LEGACY = CatalogSnapshot(
+    schemas={"dates", "needs"},
+    tables={("dates", "dates"): {"date_id": "integer", "date": "date"},
+            ("needs", "rents"): {"id": "integer", "date": "integer", "amount": "numeric(18,2)"},
+            ("needs", "bills"): {"id": "integer", "due_date": "integer"}},
+    constraints={("needs", "rents", "rents_date_dates_fk"), ("reports", "notes", "notes_day_fkey")},
+    indexes=set(),
+    partitioned={},
+    # reports.notes is not in the workbook, and needs.bills lost its foreign key
+    date_references=[("needs", "rents", "rents_date_dates_fk", "date", False),
+                     ("reports", "notes", "notes_day_fkey", "day", False)],
+)
+
+
+def _legacy(**changes):
+    snapshot = LEGACY._replace(**changes)
+    return snapshot._replace(constraints=set(snapshot.constraints))
+
+
+@pytest.fixture
+def postgres(monkeypatch):
+    import db
+    monkeypatch.setattr(db, "embedded", lambda: False)
+
+
+def test_rekey_dates_rekeys_every_table_referencing_the_dimension(postgres):
+    plans = {("needs", "rents"): build_sheet_plan("needs", "rents", pd.DataFrame({"id": [1], "date": ["09/2025"]})),
+             ("needs", "bills"): build_sheet_plan("needs", "bills", pd.DataFrame({"id": [1], "due_date": ["10/2025"]}))}
+    snapshot = _legacy()
+    assert legacy_dates(snapshot)
+    statements = rekey_dates(snapshot, plans)
+    rekey = "UPDATE {0} AS t SET {1} = to_char(d.date, 'YYYYMMDD')::integer FROM dates.dates AS d WHERE t.{1} = d.date_id;"
+    assert statements[:5] == [
+        rekey.format('"needs"."bills"', '"due_date"'),
+        'ALTER TABLE "needs"."rents" DROP CONSTRAINT "rents_date_dates_fk";',
+        rekey.format('"needs"."rents"', '"date"'),
+        'ALTER TABLE "reports"."notes" DROP CONSTRAINT "notes_day_fkey";',
+        rekey.format('"reports"."notes"', '"day"'),
+    ]
+    assert statements[5:9] == [
+        "ALTER TABLE dates.dates ALTER COLUMN date_id DROP DEFAULT;",
+        "DROP SEQUENCE IF EXISTS dates.dates_date_id_seq;",
+        "DELETE FROM dates.dates WHERE date IS NULL;",
+        "UPDATE dates.dates SET date_id = to_char(date, 'YYYYMMDD')::integer;",
+    ]
+    assert statements[9].startswith("ALTER TABLE dates.dates ADD COLUMN IF NOT EXISTS year")
+    assert statements[11].startswith("ALTER TABLE dates.dates ALTER COLUMN date SET NOT NULL")
+    # the diff adds the workbook's key back, the other table's key is added back here
+    assert statements[12:] == ['ALTER TABLE "reports"."notes" ADD CONSTRAINT "notes_day_fkey" '
+                               'FOREIGN KEY ("day") REFERENCES "dates"."dates"("date_id");']
+    assert snapshot.constraints == {("reports", "notes", "notes_day_fkey")}
+
+
+def test_rekey_dates_refuses_partitioned_tables(postgres):
+    snapshot = _legacy(date_references=[("needs", "rents", "rents_date_dates_fk", "date", True)])
+    with pytest.raises(ValueError, match="needs.rents is partitioned"):
+        rekey_dates(snapshot, {})
+
+
+def test_rekey_dates_refuses_the_embedded_backend():
+    with pytest.raises(ValueError, match="DUCKDB_PATH"):
+        rekey_dates(_legacy(), {})
@@ -0,0 +1,60 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import format_fixed, normalize_decimal, parse_money_column, _scale_floats
+
+
+def _expected(value, scale):
+    # what Postgres stores in DECIMAL(18,scale): the decimal literal rounded half away from zero
+    return int(normalize_decimal(value).scaleb(scale).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+@pytest.mark.parametrize("scale", [2, 4])
+def test_float_ties_round_like_their_decimal_repr(scale):
+    values = [1.00005, -1.00005, 2.675, -2.675, 0.125, 1.005, 0.5, -0.5, 1234567.125, 0.0]
+    scaled, null = _scale_floats(np.array(values), scale)
+    assert scaled.tolist() == [_expected(v, scale) for v in values]
+    assert not null.any()
+
+
+def test_float_nan_and_infinity_are_null():
+    scaled, null = _scale_floats(np.array([np.nan, np.inf, 1.5]), 2)
+    assert null.tolist() == [True, True, False]
+    assert scaled[2] == 150
+
+
+def test_out_of_range_values_raise():
+    with pytest.raises(ValueError):
+        _scale_floats(np.array([1e17]), 2)
+    with pytest.raises(ValueError):
+        parse_money_column(["12345678901234567,00"], 2)
+
+
+def test_text_amounts():
+    values = ["12.345,67 €", "12345,67", "1.5", "-0,005", "0,004", " ", "nan", "abc", None]
+    scaled, null = parse_money_column(values, 2)
+    assert null.tolist() == [False] * 5 + [True] * 4
+    assert scaled[:5].tolist() == [1234567, 1234567, 150, -1, 0]
+
+
+def test_mixed_column_keeps_booleans_out():
+    scaled, null = parse_money_column(pd.Series([1, 2.5, "3,25", True, Decimal("4.125")], dtype=object), 2)
+    assert scaled.tolist()[:3] == [100, 250, 325]
+    assert scaled[4] == 413
+    assert null.tolist() == [False, False, False, True, False]
+
+
+def test_typed_columns():
+    assert parse_money_column(pd.Series([1, -2]), 2)[0].tolist() == [100, -200]
+    scaled, null = parse_money_column(pd.Series([True, False]), 2)
+    assert null.all()
+
+
+def test_format_fixed():
+    scaled = np.array([-12345, 5, 0, 100], dtype=np.int64)
+    null = np.array([False, False, True, False])
+    assert format_fixed(scaled, null, 2) == ["-123.45", "0.05", None, "1.00"]
+    assert format_fixed(scaled, null, 0) == ["-12345", "5", None, "100"]
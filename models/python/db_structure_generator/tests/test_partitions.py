@@ -0,0 +1,94 @@
+import re
+
+import pandas as pd
+import pytest
+
+import etl
+from column_plan import build_sheet_plan
+from ddl_builder import build_partition, build_table_definition
+from ddl_plan import compile_ddl_plan, partition_column, render_sql
+
+
+def _plan(df, partition=None):
+    return build_sheet_plan("needs", "rents", df)._replace(partition_column=partition)
+
+
+@pytest.fixture
+def created(monkeypatch):
+    """
+    Record the partitions ensure_partitions creates, as (lo, hi) date_id bounds, instead of running them.
+    """
+    bounds = []
+
+    def exec_statements(statements, grouped=False):
+        for st in statements:
+            lo, hi = re.search(r"FROM \((\d+)\) TO \((\d+)\)", render_sql(st)).groups()
+            bounds.append((int(lo), int(hi)))
+
+    monkeypatch.setattr(etl, "exec_statements", exec_statements)
+    monkeypatch.setattr(etl, "_partitions", {})
+    return bounds
+
+
+DATED = pd.DataFrame({"date": ["09/2025", "10/2025"], "amount": [1.0, 2.0]})
+
+
+def test_partition_column_is_the_first_date_column_of_large_sheets():
+    plan = _plan(pd.DataFrame({"date": ["09/2025"], "due_date": ["10/2025"], "amount": [1.0]}))
+    assert partition_column(plan, 1000, 500) == "date"
+    assert partition_column(plan, 499, 500) is None
+    assert partition_column(plan, 1000, 0) is None
+    assert partition_column(_plan(pd.DataFrame({"amount": [1.0]})), 1000, 500) is None
+
+
+def test_tables_with_a_primary_key_are_never_partitioned():
+    plan = _plan(pd.DataFrame({"id": [1, 2], "date": ["09/2025", "10/2025"]}))
+    assert any(c.primary_key for c in plan.columns)
+    assert partition_column(plan, 1000, 1) is None
+    ddl = compile_ddl_plan({("needs", "rents"): pd.DataFrame({"id": [1, 2], "date": ["09/2025", "10/2025"]}),
+                            ("needs", "bills"): DATED}, partition_min_rows=2)
+    assert ddl.sheet_plans[("needs", "rents")].partition_column is None
+    assert ddl.sheet_plans[("needs", "bills")].partition_column == "date"
+
+
+def test_partitioned_table_definition_has_a_default_partition():
+    create, default = [render_sql(s) for s in build_table_definition("needs", "rents", list(DATED.columns),
+                                                                     _plan(DATED, "date"))]
+    assert create.endswith('PARTITION BY RANGE ("date");')
+    assert default == 'CREATE TABLE IF NOT EXISTS "needs"."rents_default" PARTITION OF "needs"."rents" DEFAULT;'
+    assert len(build_table_definition("needs", "rents", list(DATED.columns), _plan(DATED))) == 1
+
+
+def test_build_partition():
+    assert render_sql(build_partition("needs", "rents", 20250101, 20260101)) == (
+        'CREATE TABLE IF NOT EXISTS "needs"."rents_p20250101" PARTITION OF "needs"."rents" '
+        "FOR VALUES FROM (20250101) TO (20260101);"
+    )
+
+
+def test_yearly_partitions(created, monkeypatch):
+    monkeypatch.setattr(etl, "PARTITION_MONTHS", 12)
+    etl.ensure_partitions(_plan(DATED, "date"), {20250901, 20251231, 20260101, None})
+    assert created == [(20250101, 20260101), (20260101, 20270101)]
+
+
+def test_partitions_are_aligned_on_partition_months(created, monkeypatch):
+    monkeypatch.setattr(etl, "PARTITION_MONTHS", 3)
+    etl.ensure_partitions(_plan(DATED, "date"), {20250815, 20251115, 20251231})
+    assert created == [(20250701, 20251001), (20251001, 20260101)]
+
+
+def test_partition_bounds_across_a_year_boundary(created, monkeypatch):
+    # 5 months don't divide the year: partitions are counted from year 0, so one straddles January
+    monkeypatch.setattr(etl, "PARTITION_MONTHS", 5)
+    etl.ensure_partitions(_plan(DATED, "date"), {20251201, 20260301})
+    assert created == [(20251101, 20260401)]
+
+
+def test_existing_partitions_are_not_created_again(created, monkeypatch):
+    monkeypatch.setattr(etl, "PARTITION_MONTHS", 12)
+    plan = _plan(DATED, "date")
+    etl.ensure_partitions(plan, {20250901})
+    etl.ensure_partitions(plan, {20251001, None})
+    etl.ensure_partitions(_plan(DATED), {20300101})
+    assert created == [(20250101, 20260101)]
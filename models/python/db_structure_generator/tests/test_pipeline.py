@@ -0,0 +1,151 @@
+import threading
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+import pytest
+
+import main
+from pipeline import run_pipeline
+
+
+class Source:
+    """
+    Pipeline source counting the items read and whether it was closed.
+    """
+    def __init__(self, n, fail_at=None):
+        self.read = 0
+        self.closed = False
+        self.items = self._items(n, fail_at)
+
+    def _items(self, n, fail_at):
+        try:
+            for i in range(n):
+                if i == fail_at:
+                    raise ValueError("bad item %d" % i)
+                self.read += 1
+                yield i
+        finally:
+            self.closed = True
+
+    def __iter__(self):
+        return self.items
+
+    def close(self):
+        self.items.close()
+
+
+def test_items_flow_through_every_stage_in_order():
+    out = []
+    run_pipeline(range(20), [("double", lambda x: x * 2), ("odd", lambda x: x if x % 4 else None),
+                             ("sink", out.append)], maxsize=1)
+    assert out == [x * 2 for x in range(20) if x % 2]
+
+
+def test_stage_error_stops_the_source_and_is_reraised():
+    source = Source(1000)
+
+    def load(item):
+        if item == 3:
+            raise RuntimeError("load failed")
+
+    with pytest.raises(RuntimeError, match="load failed"):
+        run_pipeline(source, [("transform", lambda x: x), ("load", load)], maxsize=2)
+    assert source.closed
+    # bounded queues: the source can't get far ahead of the failed stage
+    assert source.read < 20
+
+
+def test_source_error_stops_the_stages_and_is_reraised():
+    seen = []
+    with pytest.raises(ValueError, match="bad item 5"):
+        run_pipeline(Source(100, fail_at=5), [("load", seen.append)], maxsize=2)
+    assert seen == list(range(len(seen))) and len(seen) <= 5
+
+
+def test_every_stage_thread_enters_the_thread_context():
+    entered = []
+
+    @contextmanager
+    def context():
+        entered.append(threading.current_thread().name)
+        yield
+
+    run_pipeline(range(3), [("a", lambda x: x), ("b", lambda x: x)], thread_context=context)
+    assert sorted(entered) == ["etl-a", "etl-b"]
+
+
+class StubDDL:
+    def ensure_schema(self, schema):
+        pass
+
+    def dates_sheet(self, columns):
+        pass
+
+    def table(self, schema, table, columns, sample):
+        from column_plan import build_sheet_plan
+        return build_sheet_plan(schema, table, sample if sample is not None else pd.DataFrame(columns=columns))
+
+    def finish(self):
+        self.finished = True
+
+
+@pytest.fixture
+def workbook(monkeypatch):
+    """
+    Stub the reading, DDL and writes of main_pipelined: two sheets of chunks, and the
+    batches written recorded per table (fail_on: the table whose write fails).
+    """
+    sheets = {
+        ("needs", "rents"): [pd.DataFrame({"id": [1, 2], "amount": [1.5, 2.5]}),
+                             pd.DataFrame({"id": [3], "amount": [3.5]})],
+        ("needs", "empty"): [],
+        ("wishes", "trips"): [pd.DataFrame({"id": [1], "amount": [9.0]})],
+    }
+    state = {"written": {}, "cleared": [], "fail_on": None, "sheets_read": [], "ddl": StubDDL()}
+
+    def iter_sheet_chunks(path):
+        for (schema, table), chunks in sheets.items():
+            state["sheets_read"].append((schema, table))
+            yield schema, table, ["id", "amount"], iter(chunks)
+
+    def bulk_insert_columns(schema, table, cols, batches):
+        if (schema, table) == state["fail_on"]:
+            raise RuntimeError("write failed on %s.%s" % (schema, table))
+        for column_values in batches:
+            state["written"].setdefault((schema, table), []).extend(zip(*column_values))
+
+    monkeypatch.setattr(main, "iter_sheet_chunks", iter_sheet_chunks)
+    monkeypatch.setattr(main, "bulk_insert_columns", bulk_insert_columns)
+    monkeypatch.setattr(main, "clear_table", lambda schema, table: state["cleared"].append((schema, table)))
+    monkeypatch.setattr(main, "_streaming_ddl", lambda: state["ddl"])
+    monkeypatch.setattr(main, "run_session", nullcontext)
+    monkeypatch.setattr(main, "worker_connection", nullcontext)
+    monkeypatch.setattr(main, "resolve_date_columns", lambda plan, column_values, date_values: column_values)
+    monkeypatch.setattr(main, "LOAD_MODE", "full")
+    return state
+
+
+def test_main_pipelined_writes_every_chunk(workbook):
+    main.main_pipelined()
+    assert {k: [r[0] for r in v] for k, v in workbook["written"].items()} == {
+        ("needs", "rents"): [1, 2, 3],
+        ("wishes", "trips"): [1],
+    }
+    # the rows of an earlier run are deleted, also for a sheet left empty
+    assert workbook["cleared"] == [("needs", "rents"), ("needs", "empty"), ("wishes", "trips")]
+    assert workbook["ddl"].finished
+
+
+def test_main_pipelined_stage_error_stops_the_run(workbook):
+    workbook["fail_on"] = ("needs", "rents")
+    with pytest.raises(RuntimeError, match="write failed on needs.rents"):
+        main.main_pipelined()
+    assert ("wishes", "trips") not in workbook["written"]
+    assert not hasattr(workbook["ddl"], "finished")
+
+
+def test_main_pipelined_incremental_uses_the_streaming_path(workbook, monkeypatch):
+    monkeypatch.setattr(main, "LOAD_MODE", "incremental")
+    monkeypatch.setattr(main, "main_streaming", lambda: workbook.setdefault("streamed", True))
+    main.main_pipelined()
+    assert workbook["streamed"] and workbook["sheets_read"] == []
@@ -0,0 +1,18 @@
+import db
+
+
+def test_single_transaction_run_holds_a_pool_slot(monkeypatch):
+    monkeypatch.setattr(db, "POOL_MAX_CONN", 2)
+    db.close_pool()
+    db.get_pool()
+    slots = db._pool_slots
+    with db.run_session(single_transaction=True):
+        # one slot left for the other threads of the run
+        assert slots.acquire(blocking=False)
+        assert not slots.acquire(blocking=False)
+        slots.release()
+    # released at the end of the run
+    assert slots.acquire(blocking=False) and slots.acquire(blocking=False)
+    slots.release()
+    slots.release()
+
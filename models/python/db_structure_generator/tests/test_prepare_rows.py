@@ -0,0 +1,55 @@
+from datetime import date
+from decimal import Decimal
+
+import pandas as pd
+
+from column_plan import build_sheet_plan, plan_from_names
+from etl import prepare_table_columns, prepare_table_rows
+
+
+def _frame():
+    return pd.DataFrame({
+        "id": [1, 2, 3],
+        "payment_date": ["01/2024", "02/2024", None],
+        "rent_value": [500.5, "1.234,00", None],
+        "paid": [True, False, None],
+        "note": ["a", None, "c"],
+    })
+
+
+def test_rows_are_converted_per_column_kind():
+    cols, rows, date_values = prepare_table_rows(_frame())
+    assert cols == ["id", "payment_date", "rent_value", "paid", "note"]
+    assert rows == [
+        (1, "2024-01-01", Decimal("500.50"), True, "a"),
+        (2, "2024-02-01", Decimal("1234.00"), False, None),
+        (3, None, None, None, "c"),
+    ]
+    assert sorted(date_values) == [date(2024, 1, 1), date(2024, 2, 1)]
+
+
+def test_columns_match_rows():
+    df = _frame()
+    plan = build_sheet_plan("s", "t", df)
+    cols, column_values, _ = prepare_table_columns(df, plan)
+    _, rows, _ = prepare_table_rows(df, plan)
+    assert cols == list(plan.names)
+    assert [tuple(r) for r in zip(*column_values)] == rows
+
+
+def test_text_integers_parse_like_int():
+    df = pd.DataFrame({"amount_id": ["17", " 42", "2,50", "1.234", None]})
+    _, rows, _ = prepare_table_rows(df, plan_from_names("s", "t", ["amount_id"]))
+    assert rows == [(17,), (42,), (None,), (None,), (None,)]
+
+
+def test_missing_text_amounts_are_null():
+    _, rows, _ = prepare_table_rows(pd.DataFrame({"amount": ["2,50", None]}))
+    assert rows == [(Decimal("2.50"),), (None,)]
+
+
+def test_empty_frame_keeps_columns():
+    cols, rows, date_values = prepare_table_rows(pd.DataFrame({"note": []}))
+    assert cols == ["note"]
+    assert rows == []
+    assert date_values == []
@@ -0,0 +1,95 @@
+import threading
+
+import pandas as pd
+import pytest
+
+import scheduler
+from scheduler import TableLoadError, build_dependency_graph, run_tables
+
+MODES = ["sequential", "thread"]
+
+
+class Recorder:
+    """
+    Stub task: records the order tables run in and fails the tables in fail.
+    """
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.order = []
+        self.lock = threading.Lock()
+
+    def __call__(self, schema, table, df):
+        with self.lock:
+            self.order.append((schema, table))
+        if (schema, table) in self.fail:
+            raise RuntimeError("boom %s.%s" % (schema, table))
+
+
+def _frames(*names):
+    return {tuple(n.split(".")): pd.DataFrame({"id": [1]}) for n in names}
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    """
+    Replace the foreign-key graph with an explicit { "schema.table": ["schema.table", ...] }.
+    """
+    def use(edges):
+        deps = {tuple(k.split(".")): {tuple(d.split(".")) for d in v} for k, v in edges.items()}
+        monkeypatch.setattr(scheduler, "build_dependency_graph", lambda frames: {n: deps.get(n, set()) for n in frames})
+    return use
+
+
+def test_date_columns_depend_on_the_dates_table():
+    frames = {
+        ("dates", "dates"): pd.DataFrame({"date": ["2025-09-01"]}),
+        ("needs", "rents"): pd.DataFrame({"id": [1], "date": ["09/2025"]}),
+        ("needs", "notes"): pd.DataFrame({"id": [1], "text": ["x"]}),
+    }
+    assert build_dependency_graph(frames) == {
+        ("dates", "dates"): set(),
+        ("needs", "rents"): {("dates", "dates")},
+        ("needs", "notes"): set(),
+    }
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_dependencies_run_first(graph, mode):
+    graph({"a.child": ["a.parent"], "a.grandchild": ["a.child"]})
+    task = Recorder()
+    run_tables(_frames("a.grandchild", "a.child", "a.parent", "a.other"), task=task, mode=mode, workers=4)
+    assert sorted(task.order) == [("a", "child"), ("a", "grandchild"), ("a", "other"), ("a", "parent")]
+    order = task.order.index
+    assert order(("a", "parent")) < order(("a", "child")) < order(("a", "grandchild"))
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_dependency_cycle_is_refused(graph, mode):
+    graph({"a.x": ["a.y"], "a.y": ["a.x"]})
+    task = Recorder()
+    with pytest.raises(ValueError, match="Dependency cycle"):
+        run_tables(_frames("a.x", "a.y", "a.free"), task=task, mode=mode, workers=2)
+    assert task.order == [("a", "free")]
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_failures_are_collected_and_dependents_skipped(graph, mode):
+    graph({"a.child": ["a.parent"], "a.grandchild": ["a.child"]})
+    task = Recorder(fail={("a", "parent"), ("a", "broken")})
+    with pytest.raises(TableLoadError) as exc:
+        run_tables(_frames("a.parent", "a.child", "a.grandchild", "a.broken", "a.other"), task=task, mode=mode,
+                   workers=3)
+    failures = exc.value.failures
+    assert sorted(failures) == [("a", "broken"), ("a", "child"), ("a", "grandchild"), ("a", "parent")]
+    assert str(failures[("a", "parent")]) == "boom a.parent"
+    assert "skipped, depends on failed" in str(failures[("a", "child")])
+    assert "skipped, depends on failed" in str(failures[("a", "grandchild")])
+    # independent tables still run, dependents of a failure never do
+    assert ("a", "other") in task.order
+    assert ("a", "child") not in task.order and ("a", "grandchild") not in task.order
+    assert str(exc.value) == "4 table(s) failed: a.broken, a.child, a.grandchild, a.parent"
+
+
+def test_unknown_mode_is_refused():
+    with pytest.raises(ValueError, match="Unknown ETL_PARALLEL mode"):
+        run_tables(_frames("a.x"), task=Recorder(), mode="fibers", workers=2)
@@ -0,0 +1,83 @@
+from contextlib import nullcontext
+
+import pandas as pd
+import pytest
+
+import main
+
+
+class StubDDL:
+    def ensure_schema(self, schema):
+        pass
+
+    def dates_sheet(self, columns):
+        pass
+
+    def table(self, schema, table, columns, sample):
+        from column_plan import build_sheet_plan
+        return build_sheet_plan(schema, table, sample if sample is not None else pd.DataFrame(columns=columns))
+
+    def finish(self):
+        self.finished = True
+
+
+@pytest.fixture
+def workbook(monkeypatch):
+    """
+    Stub the reading, DDL and loads of main_streaming: a dates sheet and two sheets of
+    chunks; every load records the chunks it consumed (fail_on: the table whose load fails).
+    """
+    sheets = {
+        ("dates", "dates"): [pd.DataFrame({"date": ["2025-09-01"]})],
+        ("needs", "rents"): [pd.DataFrame({"id": [1, 2], "amount": [1.5, 2.5]}),
+                             pd.DataFrame({"id": [3], "amount": [3.5]})],
+        ("needs", "empty"): [],
+        ("wishes", "trips"): [pd.DataFrame({"id": [1], "amount": [9.0]})],
+    }
+    state = {"loaded": {}, "cleared": [], "calendar": [], "fail_on": None, "sheets_read": [], "ddl": StubDDL()}
+
+    def iter_sheet_chunks(path):
+        for (schema, table), chunks in sheets.items():
+            state["sheets_read"].append((schema, table))
+            yield schema, table, list(chunks[0].columns) if chunks else ["id"], iter(chunks)
+
+    def load_frames_to_table(schema, table, frames, plan):
+        if (schema, table) == state["fail_on"]:
+            raise RuntimeError("load failed on %s.%s" % (schema, table))
+        state["loaded"][(schema, table)] = [list(f["id"]) for f in frames]
+        return sum(map(len, state["loaded"][(schema, table)]))
+
+    def load_dataframe_to_table(schema, table, df, plan=None):
+        state["loaded"][(schema, table)] = [list(df["id"])]
+
+    monkeypatch.setattr(main, "iter_sheet_chunks", iter_sheet_chunks)
+    monkeypatch.setattr(main, "load_frames_to_table", load_frames_to_table)
+    monkeypatch.setattr(main, "load_dataframe_to_table", load_dataframe_to_table)
+    monkeypatch.setattr(main, "clear_table", lambda schema, table: state["cleared"].append((schema, table)))
+    monkeypatch.setattr(main, "prefill_calendar", state["calendar"].append)
+    monkeypatch.setattr(main, "_streaming_ddl", lambda: state["ddl"])
+    monkeypatch.setattr(main, "run_session", nullcontext)
+    monkeypatch.setattr(main, "LOAD_MODE", "full")
+    return state
+
+
+def test_each_sheet_is_one_load_fed_by_its_chunks(workbook):
+    main.main_streaming()
+    assert workbook["loaded"] == {("needs", "rents"): [[1, 2], [3]], ("wishes", "trips"): [[1]]}
+    assert workbook["cleared"] == [("needs", "empty")]
+    assert len(workbook["calendar"]) == 1
+    assert workbook["ddl"].finished
+
+
+def test_incremental_loads_the_whole_sheet(workbook, monkeypatch):
+    monkeypatch.setattr(main, "LOAD_MODE", "incremental")
+    main.main_streaming()
+    assert workbook["loaded"] == {("needs", "rents"): [[1, 2, 3]], ("wishes", "trips"): [[1]]}
+
+
+def test_load_error_stops_the_run_and_is_reraised(workbook):
+    workbook["fail_on"] = ("needs", "rents")
+    with pytest.raises(RuntimeError, match="load failed on needs.rents"):
+        main.main_streaming()
+    assert ("wishes", "trips") not in workbook["sheets_read"]
+    assert not hasattr(workbook["ddl"], "finished")
@@ -3,9 +3,11 @@ Utility helpers: sanitization, inference, parsing.
 """
 
 import re
-from datetime import datetime
+from datetime import datetime, date
 from decimal import Decimal
+from functools import lru_cache
 import logging
+from config import DATE_PARSE_CACHE_SIZE, MONEY_SCALE
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +29,8 @@ def sanitize_identifier(name: str) -> str:
 def infer_column_type(col_name: str, sample_values=None) -> str:
     """
     Infer column type from header name and sample values.
+    Returns INTEGER, DATE, DECIMAL, BOOLEAN or STRING; with sample_values the
+    values are profiled as in column_plan.profile_column.
     """
     name = col_name.lower()
     if name == "id" or name.endswith("_id") or name == "identifier":
@@ -34,24 +38,14 @@ def infer_column_type(col_name: str, sample_values=None) -> str:
     if "id" == name or name.lower().endswith("id"):
         return "INTEGER"
     if "date" in name:
-        return "VARCHAR(50)"
-    
-    # fallback: controlla se i valori sembrano numerici
+        return "DATE"
+
+    # fallback: controlla il tipo dei valori
     if sample_values:
-        from decimal import Decimal
-        numeric_count = 0
-        total = 0
-        for v in sample_values:
-            total += 1
-            try:
-                Decimal(str(v))
-                numeric_count += 1
-            except Exception:
-                pass
-        # se la maggior parte sono numerici → DECIMAL
-        if total > 0 and numeric_count / total > 0.7:
-            return "DECIMAL"
-    
+        import pandas as pd
+        from column_plan import profile_column
+        return profile_column(col_name, pd.Series(list(sample_values), dtype=object)).kind
+
     # altrimenti → STRING
     return "STRING"
 
@@ -87,13 +81,138 @@ def parse_date_mm_yyyy(value):
                 return None
     return None
 
+# --- date parsing engine -------------------------------------------------------
+# Exact parsers for the formats found in the workbooks; a column is sampled once to
+# pick the cheapest one, and fuzzy dateutil parsing is only the last resort.
+
+_MONTHS = {
+    "january": 1, "february": 2, "march": 3, "april": 4, "may": 5, "june": 6, "july": 7,
+    "august": 8, "september": 9, "october": 10, "november": 11, "december": 12,
+    "gennaio": 1, "febbraio": 2, "marzo": 3, "aprile": 4, "maggio": 5, "giugno": 6, "luglio": 7,
+    "agosto": 8, "settembre": 9, "ottobre": 10, "novembre": 11, "dicembre": 12,
+}
+_MONTHS.update({k[:3]: v for k, v in list(_MONTHS.items())})
+_MONTHS["sept"] = 9
+
+_MM_YYYY_RE = re.compile(r'^(\d{1,2})[/\-.](\d{4})$')
+_YYYY_MM_RE = re.compile(r'^(\d{4})[/\-.](\d{1,2})(?:[/\-.](\d{1,2}))?$')
+_MONTH_YY_RE = re.compile(r'^([A-Za-z]+)[\s\-/.]+(\d{2}|\d{4})$')
+
+def _safe_date(y, m, d=1):
+    try:
+        return date(y, m, d)
+    except ValueError:
+        return None
+
+def _parse_mm_yyyy(s):
+    m = _MM_YYYY_RE.match(s)
+    return _safe_date(int(m.group(2)), int(m.group(1))) if m else None
+
+def _parse_yyyy_mm(s):
+    m = _YYYY_MM_RE.match(s)
+    if not m:
+        return None
+    return _safe_date(int(m.group(1)), int(m.group(2)), int(m.group(3) or 1))
+
+def _parse_month_yy(s):
+    """
+    'September-25', 'Sep 2025', 'settembre-25' -> first day of the month.
+    """
+    m = _MONTH_YY_RE.match(s)
+    if not m:
+        return None
+    month = _MONTHS.get(m.group(1).lower())
+    if month is None:
+        return None
+    year = int(m.group(2))
+    return _safe_date(year + 2000 if year < 100 else year, month)
+
+DATE_PARSERS = {
+    "MM/YYYY": _parse_mm_yyyy,
+    "YYYY-MM": _parse_yyyy_mm,
+    "MONTH-YY": _parse_month_yy,
+}
+
+def detect_date_format(values, sample_size=50):
+    """
+    Sample the non-empty values of a column and return its format:
+    "EXCEL" (datetime cells), one of DATE_PARSERS keys, or None if nothing matches.
+    """
+    counts = {}
+    n = 0
+    for v in values:
+        if v is None or (isinstance(v, float) and v != v):
+            continue
+        if isinstance(v, (datetime, date)):
+            fmt = "EXCEL"
+        else:
+            s = str(v).strip()
+            fmt = next((name for name, parse in DATE_PARSERS.items() if parse(s) is not None), None)
+        if fmt is not None:
+            counts[fmt] = counts.get(fmt, 0) + 1
+        n += 1
+        if n >= sample_size:
+            break
+    return max(counts, key=counts.get) if counts else None
+
+@lru_cache(maxsize=DATE_PARSE_CACHE_SIZE)
+def _parse_date_text(s, fmt):
+    """
+    Parse a date string trying the detected format first, then the other exact formats,
+    then fuzzy parsing. Returns (date or None, used_fallback). Memoized: month strings
+    repeat across rows and sheets.
+    """
+    order = [fmt] + [f for f in DATE_PARSERS if f != fmt] if fmt in DATE_PARSERS else list(DATE_PARSERS)
+    for name in order:
+        d = DATE_PARSERS[name](s)
+        if d is not None:
+            return d, False
+    return parse_date_mm_yyyy(s), True
+
+def parse_date_column(values):
+    """
+    Parse a whole column of date cells with the cheapest exact parser for its format.
+    Returns (dates, fallback_flags): one datetime.date (or None) per value, and per value
+    whether it needed the fuzzy fallback (or could not be parsed at all).
+    """
+    values = list(values)
+    fmt = detect_date_format(values)
+    dates = []
+    flags = []
+    for v in values:
+        if v is None or (isinstance(v, float) and v != v):
+            dates.append(None)
+            flags.append(False)
+        elif isinstance(v, datetime):
+            d = v.date()
+            dates.append(None if d != d else d)  # NaT
+            flags.append(False)
+        elif isinstance(v, date):
+            dates.append(v)
+            flags.append(False)
+        elif isinstance(v, str):
+            s = v.strip()
+            if s == "" or s.lower() in ("nan", "none"):
+                dates.append(None)
+                flags.append(False)
+                continue
+            d, fallback = _parse_date_text(s, fmt)
+            dates.append(d)
+            flags.append(fallback or d is None)
+        else:
+            # numbers and other objects: only the fuzzy parser can try
+            d = parse_date_mm_yyyy(v)
+            dates.append(d)
+            flags.append(True)
+    return dates, flags
+
 def normalize_decimal(value):
     """
     Normalize numeric strings like '12.345,67 €' or '12345.67' to Decimal('12345.67').
     If value already numeric return Decimal.
     Returns None if empty or not parseable.
     """
-    if value is None:
+    if value is None or (isinstance(value, float) and value != value):
         return None
     if isinstance(value, (int, float, Decimal)):
         try:
@@ -119,4 +238,133 @@ def normalize_decimal(value):
         logger.debug("Could not parse decimal from %r", value)
         return None
 
+# --- fixed-point money columns ---------------------------------------------------
+# Monetary columns as scaled int64 (MONEY_SCALE decimal places, like DECIMAL(18,4))
+# held in NumPy arrays instead of one Decimal per cell.
+
+def parse_money_column(values, scale=MONEY_SCALE):
+    """
+    Vectorized, locale-aware parse of a monetary column ('12.345,67 €', '12345,67',
+    floats, ints) into (scaled, null) NumPy arrays: scaled int64 = round(value * 10**scale)
+    half away from zero (as Postgres rounds into DECIMAL(18,4)), null = True for empty,
+    NaN or unparseable cells. Accepts a pandas Series or any sequence.
+    """
+    import numpy as np
+    import pandas as pd
+    series = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype=object)
+    n = len(series)
+
+    if pd.api.types.is_bool_dtype(series):
+        return np.zeros(n, dtype=np.int64), np.ones(n, dtype=bool)
+    if pd.api.types.is_integer_dtype(series):
+        return _scale_ints(series.to_numpy(dtype=np.int64), scale), np.zeros(n, dtype=bool)
+    if pd.api.types.is_float_dtype(series):
+        return _scale_floats(series.to_numpy(dtype=np.float64), scale)
+
+    # mixed/object columns: classify the distinct values once, then convert each group
+    # booleans are never money (normalize_decimal rejects them too); drop them before
+    # factorizing, since pandas would otherwise merge True with 1
+    obj = series.astype(object)
+    obj = obj.mask(obj.map(lambda v: isinstance(v, bool)), None)
+    codes, uniques = pd.factorize(obj, use_na_sentinel=False)
+    uniques = uniques.tolist()
+    u_scaled = np.zeros(len(uniques), dtype=np.int64)
+    u_null = np.ones(len(uniques), dtype=bool)
+    idx_int, idx_float, idx_str = [], [], []
+    for i, v in enumerate(uniques):
+        if isinstance(v, str) or isinstance(v, Decimal):
+            idx_str.append(i)
+        elif isinstance(v, float):
+            idx_float.append(i)
+        elif isinstance(v, int):
+            idx_int.append(i)
+    if idx_int:
+        u_scaled[idx_int] = _scale_ints(np.array([uniques[i] for i in idx_int], dtype=np.int64), scale)
+        u_null[idx_int] = False
+    if idx_float:
+        sc, nl = _scale_floats(np.array([uniques[i] for i in idx_float], dtype=np.float64), scale)
+        u_scaled[idx_float] = sc
+        u_null[idx_float] = nl
+    if idx_str:
+        sc, nl = _parse_money_strings([uniques[i] for i in idx_str], scale)
+        u_scaled[idx_str] = sc
+        u_null[idx_str] = nl
+    return u_scaled[codes], u_null[codes]
+
+def _scale_ints(arr, scale):
+    import numpy as np
+    if len(arr) and np.abs(arr).max() >= 10 ** (18 - scale):
+        raise ValueError("Monetary value out of range for DECIMAL(18,%d)" % scale)
+    return arr * (10 ** scale)
+
+def _scale_floats(arr, scale):
+    """
+    Scale float64 values to int64, rounding half away from zero. Values that land
+    (almost) exactly on a rounding tie are re-rounded from their shortest repr, so
+    e.g. 1.00005 rounds like Decimal('1.00005') rather than like its binary value.
+    """
+    import numpy as np
+    null = ~np.isfinite(arr)
+    scaled = np.where(null, 0.0, arr) * (10 ** scale)
+    mag = np.abs(scaled)
+    frac = mag - np.floor(mag)
+    rounded = np.floor(mag + 0.5)
+    ties = np.flatnonzero(~null & (np.abs(frac - 0.5) < 1e-6))
+    if len(ties):
+        sc, _ = _parse_money_strings([format(Decimal(repr(abs(float(arr[i])))), 'f') for i in ties], scale)
+        rounded[ties] = sc
+    if (mag >= 10.0 ** 18).any():
+        raise ValueError("Monetary value out of range for DECIMAL(18,%d)" % scale)
+    return (np.sign(scaled) * rounded).astype(np.int64), null
+
+_MONEY_NUM_RE = re.compile(r'^(-?)(\d*)(?:\.(\d*))?$')
+_MONEY_STRIP_RE = re.compile(r'[^\d\.\-]')
+
+def _parse_money_text(value, scale):
+    """
+    Parse one monetary string to a scaled int (None if empty or not parseable),
+    following the separator rules of normalize_decimal, without building a Decimal.
+    """
+    s = value.strip()
+    if s == "" or s.lower() in ("nan", "none"):
+        return None
+    s = s.replace('€', '').replace(' ', '')
+    commas = s.count(',')
+    if commas == 1:
+        s = s.replace('.', '').replace(',', '.') if '.' in s else s.replace(',', '.')
+    m = _MONEY_NUM_RE.match(_MONEY_STRIP_RE.sub('', s))
+    if m is None:
+        return None
+    sign, int_part, frac_part = m.group(1), m.group(2).lstrip('0'), m.group(3) or ""
+    if not (m.group(2) or frac_part):
+        return None
+    if len(int_part) > 18 - scale:
+        raise ValueError("Monetary value %r out of range for DECIMAL(18,%d)" % (value, scale))
+    frac_part = frac_part.ljust(scale + 1, '0')
+    n = int((int_part + frac_part[:scale]) or '0') + (frac_part[scale] >= '5')
+    return -n if sign else n
+
+def _parse_money_strings(strings, scale):
+    """
+    String path of parse_money_column: one regex match per distinct string.
+    """
+    import numpy as np
+    parsed = [_parse_money_text(str(v), scale) for v in strings]
+    null = np.fromiter((p is None for p in parsed), dtype=bool, count=len(parsed))
+    scaled = np.fromiter((0 if p is None else p for p in parsed), dtype=np.int64, count=len(parsed))
+    return scaled, null
 
+def format_fixed(scaled, null, scale=MONEY_SCALE):
+    """
+    Render scaled int64 money values as numeric text ('-123.4500', None for nulls),
+    vectorized. Postgres accepts the text as-is for DECIMAL columns in every load path.
+    """
+    import numpy as np
+    factor = 10 ** scale
+    mag = np.abs(scaled)
+    text = np.char.add(np.where(scaled < 0, "-", ""), (mag // factor).astype(str))
+    if scale:
+        text = np.char.add(np.char.add(text, "."), np.char.zfill((mag % factor).astype(str), scale))
+    out = text.astype(object)
+    out[null] = None
+    return out.tolist()
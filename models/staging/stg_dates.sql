@@ -0,0 +1,13 @@
+-- The calendar dimension the ETL fills: one row per day of the workbook's years, keyed
+-- by its YYYYMMDD date_id, with the month attributes the rollups group by
+
+select
+    date_id,
+    date,
+    year::integer * 100 + month as month_id,
+    make_date(year, month, 1) as month_start,
+    year::integer as year,
+    quarter,
+    month,
+    month_name
+from {{ source('dates', 'dates') }}
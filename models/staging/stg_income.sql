@@ -0,0 +1,40 @@
+
+-- Salary, savings and invested capital by date_id, one row per date
+
+with salaries as (
+    select
+        date as date_id,
+        sum({{ money('salary_value') }}) as net_income,
+        sum({{ money('gross_salary') }}) as gross_income
+    from {{ source('salaries', 'salaries') }}
+    where date is not null
+    group by 1
+),
+
+savings as (
+    select
+        date as date_id,
+        sum({{ money('saving_value') }}) as savings
+    from {{ source('savings', 'savings') }}
+    where date is not null
+    group by 1
+),
+
+investments as (
+    select
+        date as date_id,
+        sum({{ money('"Totale"') }}) as invested
+    from {{ source('savings', 'investments') }}
+    where date is not null
+    group by 1
+)
+
+select
+    coalesce(s.date_id, v.date_id, i.date_id) as date_id,
+    coalesce(s.net_income, 0) as net_income,
+    coalesce(s.gross_income, 0) as gross_income,
+    coalesce(v.savings, 0) as savings,
+    coalesce(i.invested, 0) as invested
+from salaries as s
+full outer join savings as v on v.date_id = s.date_id
+full outer join investments as i on i.date_id = coalesce(s.date_id, v.date_id)
@@ -0,0 +1,20 @@
+
+-- One row per expense sheet row: the sheet total (its *_value column) by date_id,
+-- tagged with its area (needs/wishes) and category (the sheet). The sheets come from
+-- the spend_categories var in dbt_project.yml.
+
+{% set areas = var('spend_categories') %}
+
+{% for area, categories in areas.items() %}
+{% for category, amount_column in categories.items() %}
+select
+    date as date_id,
+    '{{ area }}'::text as area,
+    '{{ category }}'::text as category,
+    {{ money(adapter.quote(amount_column)) }} as amount
+from {{ source(area, category) }}
+where date is not null
+{% if not loop.last %}union all{% endif %}
+{% endfor %}
+{% if not loop.last %}union all{% endif %}
+{% endfor %}
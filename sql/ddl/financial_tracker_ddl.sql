@@ -1,309 +1,243 @@
 -- =====================================
 -- FINANCIAL TRACKER DATABASE DDL
 -- =====================================
--- Generato automaticamente il 2025-08-21 15:38:15
--- 
+-- Generato automaticamente da main.py (financialTracker.xlsx)
+--
 -- Questo script crea la struttura completa del database
 -- per il Financial Tracker. La transazione è atomica:
 -- o vengono create tutte le strutture o nessuna.
 -- =====================================
 
-
 BEGIN;
 
 -- =====================================
 -- CREAZIONE SCHEMI
 -- =====================================
 
-CREATE SCHEMA IF NOT EXISTS dates;
-CREATE SCHEMA IF NOT EXISTS needs;
-CREATE SCHEMA IF NOT EXISTS salaries;
-CREATE SCHEMA IF NOT EXISTS savings;
-CREATE SCHEMA IF NOT EXISTS wishes;
+CREATE SCHEMA IF NOT EXISTS "dates";
+CREATE SCHEMA IF NOT EXISTS "needs";
+CREATE SCHEMA IF NOT EXISTS "salaries";
+CREATE SCHEMA IF NOT EXISTS "savings";
+CREATE SCHEMA IF NOT EXISTS "wishes";
 
 -- =====================================
--- CREAZIONE TABELLE
+-- DIMENSIONE DATE
 -- =====================================
 
--- Tabella: dates.dates
-CREATE TABLE dates.dates (
-    id DECIMAL(15,2),
-    date VARCHAR(50) NOT NULL
-,
-    CONSTRAINT pk_dates_dates PRIMARY KEY (date)
+CREATE TABLE IF NOT EXISTS dates.dates (
+    date_id INTEGER PRIMARY KEY,
+    date DATE NOT NULL UNIQUE,
+    year SMALLINT NOT NULL,
+    quarter SMALLINT NOT NULL,
+    month SMALLINT NOT NULL,
+    month_name TEXT NOT NULL
 );
 
--- Tabella: needs.cdc
-CREATE TABLE needs.cdc (
-    date VARCHAR(50) NOT NULL,
-    installment DECIMAL(15,2),
-    cdc_value DECIMAL(15,2)
-,
-    CONSTRAINT pk_needs_cdc PRIMARY KEY (date)
-);
+-- =====================================
+-- CREAZIONE TABELLE
+-- =====================================
 
--- Tabella: needs.connections
-CREATE TABLE needs.connections (
-    date VARCHAR(50) NOT NULL,
-    sim DECIMAL(15,2),
-    internet DECIMAL(15,2),
-    connection_value DECIMAL(15,2)
-,
-    CONSTRAINT pk_needs_connections PRIMARY KEY (date)
-);
+-- Tabella: salaries.salaries
+CREATE TABLE IF NOT EXISTS "salaries"."salaries" ( "date" INTEGER, "ral" DECIMAL(18,4), "gross_salary" DECIMAL(18,4), "net_salary" DECIMAL(18,4), "thirteenth" DECIMAL(18,4), "salary_value" DECIMAL(18,4) );
+
+-- Tabella: savings.savings
+CREATE TABLE IF NOT EXISTS "savings"."savings" ( "date" INTEGER, "ral" DECIMAL(18,4), "gross_salary" DECIMAL(18,4), "net_salary" DECIMAL(18,4), "thirteenth" DECIMAL(18,4), "saving_value" DECIMAL(18,4) );
+
+-- Tabella: savings.investments
+CREATE TABLE IF NOT EXISTS "savings"."investments" ( "date" INTEGER, "Importo" DECIMAL(18,4), "Azioni" DECIMAL(18,4), "Obbligazioni" DECIMAL(18,4), "Materie" DECIMAL(18,4), "Crypto" DECIMAL(18,4), "Contanti" DECIMAL(18,4), "Totale" DECIMAL(18,4) );
 
 -- Tabella: needs.financials
-CREATE TABLE needs.financials (
-    date VARCHAR(50) NOT NULL,
-    car_financial DECIMAL(15,2),
-    car_gas DECIMAL(15,2),
-    telephone_financial DECIMAL(15,2),
-    financial_value DECIMAL(15,2)
-,
-    CONSTRAINT pk_needs_financials PRIMARY KEY (date)
-);
+CREATE TABLE IF NOT EXISTS "needs"."financials" ( "date" INTEGER, "car_financial" DECIMAL(18,4), "car_gas" DECIMAL(18,4), "telephone_financial" DECIMAL(18,4), "financial_value" DECIMAL(18,4) );
+
+-- Tabella: needs.insurances
+CREATE TABLE IF NOT EXISTS "needs"."insurances" ( "date" INTEGER, "car_insurance" DECIMAL(18,4), "insurance_value" DECIMAL(18,4) );
+
+-- Tabella: needs.rents
+CREATE TABLE IF NOT EXISTS "needs"."rents" ( "date" INTEGER, "rent_value" DECIMAL(18,4) );
+
+-- Tabella: needs.loans
+CREATE TABLE IF NOT EXISTS "needs"."loans" ( "date" INTEGER, "silvia_loan" DECIMAL(18,4), "mom_loan" DECIMAL(18,4), "dad_loan" DECIMAL(18,4), "andrea_loan" DECIMAL(18,4), "loan_value" DECIMAL(18,4) );
 
 -- Tabella: needs.fines
-CREATE TABLE needs.fines (
-    date VARCHAR(50) NOT NULL,
-    fine DECIMAL(15,2),
-    stamp DECIMAL(15,2),
-    fines_value DECIMAL(15,2)
-,
-    CONSTRAINT pk_needs_fines PRIMARY KEY (date)
-);
+CREATE TABLE IF NOT EXISTS "needs"."fines" ( "date" INTEGER, "fine" DECIMAL(18,4), "stamp" DECIMAL(18,4), "fines_value" DECIMAL(18,4) );
+
+-- Tabella: needs.connections
+CREATE TABLE IF NOT EXISTS "needs"."connections" ( "date" INTEGER, "sim" DECIMAL(18,4), "internet" DECIMAL(18,4), "connection_value" DECIMAL(18,4) );
+
+-- Tabella: needs.cdc
+CREATE TABLE IF NOT EXISTS "needs"."cdc" ( "date" INTEGER, "used" DECIMAL(18,4), "installment" DECIMAL(18,4), "cdc_value" DECIMAL(18,4) );
 
 -- Tabella: needs.installments
-CREATE TABLE needs.installments (
-    date VARCHAR(50) NOT NULL,
-    klarna DECIMAL(15,2),
-    scalapay DECIMAL(15,2),
-    cofidis DECIMAL(15,2),
-    installment_value DECIMAL(15,2)
-,
-    CONSTRAINT pk_needs_installments PRIMARY KEY (date)
-);
+CREATE TABLE IF NOT EXISTS "needs"."installments" ( "date" INTEGER, "klarna" DECIMAL(18,4), "scalapay" DECIMAL(18,4), "cofidis" DECIMAL(18,4), "installment_value" DECIMAL(18,4) );
 
--- Tabella: needs.insurances
-CREATE TABLE needs.insurances (
-    date VARCHAR(50) NOT NULL,
-    car_insurance DECIMAL(15,2),
-    insurance_value DECIMAL(15,2)
-,
-    CONSTRAINT pk_needs_insurances PRIMARY KEY (date)
-);
+-- Tabella: wishes.holidays
+CREATE TABLE IF NOT EXISTS "wishes"."holidays" ( "date" INTEGER, "flight" DECIMAL(18,4), "home" DECIMAL(18,4), "taxes" DECIMAL(18,4), "holidays_value" DECIMAL(18,4) );
 
--- Tabella: needs.loans
-CREATE TABLE needs.loans (
-    date VARCHAR(50) NOT NULL,
-    silvia_loan DECIMAL(15,2),
-    mom_loan DECIMAL(15,2),
-    dad_loan DECIMAL(15,2),
-    andrea_loan DECIMAL(15,2),
-    loan_value DECIMAL(15,2)
-,
-    CONSTRAINT pk_needs_loans PRIMARY KEY (date)
-);
+-- Tabella: wishes.subscriptions
+CREATE TABLE IF NOT EXISTS "wishes"."subscriptions" ( "date" INTEGER, "cigars" DECIMAL(18,4), "Prime" DECIMAL(18,4), "Netflix" DECIMAL(18,4), "iCloud" DECIMAL(18,4), "ChatGPT" DECIMAL(18,4), "Nintendo" DECIMAL(18,4), "Microsoft" DECIMAL(18,4), "subscriptions_value" DECIMAL(18,4) );
 
--- Tabella: needs.rents
-CREATE TABLE needs.rents (
-    date VARCHAR(50) NOT NULL,
-    rent_value DECIMAL(15,2)
-,
-    CONSTRAINT pk_needs_rents PRIMARY KEY (date)
-);
+-- Tabella: wishes.parties
+CREATE TABLE IF NOT EXISTS "wishes"."parties" ( "date" INTEGER, "Monday" DECIMAL(18,4), "Tuesday" DECIMAL(18,4), "Wednesday" DECIMAL(18,4), "Thursday" DECIMAL(18,4), "Friday" DECIMAL(18,4), "Saturday" DECIMAL(18,4), "Sunday" DECIMAL(18,4), "parties_value" DECIMAL(18,4) );
+
+-- Tabella: wishes.beauty
+CREATE TABLE IF NOT EXISTS "wishes"."beauty" ( "date" INTEGER, "hair" DECIMAL(18,4), "profume" DECIMAL(18,4), "beauty_value" DECIMAL(18,4) );
+
+-- =====================================
+-- CHIAVI ESTERNE
+-- =====================================
 
 -- Tabella: salaries.salaries
-CREATE TABLE salaries.salaries (
-    date VARCHAR(50) NOT NULL,
-    ral DECIMAL(15,2),
-    gross_salary DECIMAL(15,2),
-    net_salary DECIMAL(15,2),
-    thirteenth DECIMAL(15,2),
-    salary_value DECIMAL(15,2)
-,
-    CONSTRAINT pk_salaries_salaries PRIMARY KEY (date)
-);
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '"salaries"."salaries"'::regclass AND conname = 'salaries_date_dates_fk') THEN
+        ALTER TABLE "salaries"."salaries" ADD CONSTRAINT "salaries_date_dates_fk" FOREIGN KEY ("date") REFERENCES "dates"."dates"("date_id");
+    END IF;
+END $$;
 
 -- Tabella: savings.savings
-CREATE TABLE savings.savings (
-    date VARCHAR(50) NOT NULL,
-    ral DECIMAL(15,2),
-    gross_salary DECIMAL(15,2),
-    net_salary DECIMAL(15,2),
-    thirteenth DECIMAL(15,2),
-    saving_value DECIMAL(15,2)
-,
-    CONSTRAINT pk_savings_savings PRIMARY KEY (date)
-);
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '"savings"."savings"'::regclass AND conname = 'savings_date_dates_fk') THEN
+        ALTER TABLE "savings"."savings" ADD CONSTRAINT "savings_date_dates_fk" FOREIGN KEY ("date") REFERENCES "dates"."dates"("date_id");
+    END IF;
+END $$;
+
+-- Tabella: savings.investments
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '"savings"."investments"'::regclass AND conname = 'investments_date_dates_fk') THEN
+        ALTER TABLE "savings"."investments" ADD CONSTRAINT "investments_date_dates_fk" FOREIGN KEY ("date") REFERENCES "dates"."dates"("date_id");
+    END IF;
+END $$;
 
--- Tabella: wishes.beauty
-CREATE TABLE wishes.beauty (
-    date VARCHAR(50) NOT NULL,
-    hair DECIMAL(15,2),
-    profume DECIMAL(15,2),
-    beauty_value DECIMAL(15,2)
-,
-    CONSTRAINT pk_wishes_beauty PRIMARY KEY (date)
-);
+-- Tabella: needs.financials
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '"needs"."financials"'::regclass AND conname = 'financials_date_dates_fk') THEN
+        ALTER TABLE "needs"."financials" ADD CONSTRAINT "financials_date_dates_fk" FOREIGN KEY ("date") REFERENCES "dates"."dates"("date_id");
+    END IF;
+END $$;
+
+-- Tabella: needs.insurances
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '"needs"."insurances"'::regclass AND conname = 'insurances_date_dates_fk') THEN
+        ALTER TABLE "needs"."insurances" ADD CONSTRAINT "insurances_date_dates_fk" FOREIGN KEY ("date") REFERENCES "dates"."dates"("date_id");
+    END IF;
+END $$;
+
+-- Tabella: needs.rents
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '"needs"."rents"'::regclass AND conname = 'rents_date_dates_fk') THEN
+        ALTER TABLE "needs"."rents" ADD CONSTRAINT "rents_date_dates_fk" FOREIGN KEY ("date") REFERENCES "dates"."dates"("date_id");
+    END IF;
+END $$;
+
+-- Tabella: needs.loans
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '"needs"."loans"'::regclass AND conname = 'loans_date_dates_fk') THEN
+        ALTER TABLE "needs"."loans" ADD CONSTRAINT "loans_date_dates_fk" FOREIGN KEY ("date") REFERENCES "dates"."dates"("date_id");
+    END IF;
+END $$;
+
+-- Tabella: needs.fines
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '"needs"."fines"'::regclass AND conname = 'fines_date_dates_fk') THEN
+        ALTER TABLE "needs"."fines" ADD CONSTRAINT "fines_date_dates_fk" FOREIGN KEY ("date") REFERENCES "dates"."dates"("date_id");
+    END IF;
+END $$;
+
+-- Tabella: needs.connections
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '"needs"."connections"'::regclass AND conname = 'connections_date_dates_fk') THEN
+        ALTER TABLE "needs"."connections" ADD CONSTRAINT "connections_date_dates_fk" FOREIGN KEY ("date") REFERENCES "dates"."dates"("date_id");
+    END IF;
+END $$;
+
+-- Tabella: needs.cdc
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '"needs"."cdc"'::regclass AND conname = 'cdc_date_dates_fk') THEN
+        ALTER TABLE "needs"."cdc" ADD CONSTRAINT "cdc_date_dates_fk" FOREIGN KEY ("date") REFERENCES "dates"."dates"("date_id");
+    END IF;
+END $$;
+
+-- Tabella: needs.installments
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '"needs"."installments"'::regclass AND conname = 'installments_date_dates_fk') THEN
+        ALTER TABLE "needs"."installments" ADD CONSTRAINT "installments_date_dates_fk" FOREIGN KEY ("date") REFERENCES "dates"."dates"("date_id");
+    END IF;
+END $$;
 
 -- Tabella: wishes.holidays
-CREATE TABLE wishes.holidays (
-    date VARCHAR(50) NOT NULL,
-    flight DECIMAL(15,2),
-    home DECIMAL(15,2),
-    holidays_value DECIMAL(15,2)
-,
-    CONSTRAINT pk_wishes_holidays PRIMARY KEY (date)
-);
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '"wishes"."holidays"'::regclass AND conname = 'holidays_date_dates_fk') THEN
+        ALTER TABLE "wishes"."holidays" ADD CONSTRAINT "holidays_date_dates_fk" FOREIGN KEY ("date") REFERENCES "dates"."dates"("date_id");
+    END IF;
+END $$;
+
+-- Tabella: wishes.subscriptions
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '"wishes"."subscriptions"'::regclass AND conname = 'subscriptions_date_dates_fk') THEN
+        ALTER TABLE "wishes"."subscriptions" ADD CONSTRAINT "subscriptions_date_dates_fk" FOREIGN KEY ("date") REFERENCES "dates"."dates"("date_id");
+    END IF;
+END $$;
 
 -- Tabella: wishes.parties
-CREATE TABLE wishes.parties (
-    date VARCHAR(50) NOT NULL,
-    Monday DECIMAL(15,2),
-    Tuesday DECIMAL(15,2),
-    Wednesday DECIMAL(15,2),
-    Thursday DECIMAL(15,2),
-    Friday DECIMAL(15,2),
-    Saturday DECIMAL(15,2),
-    Sunday DECIMAL(15,2),
-    parties_value DECIMAL(15,2)
-,
-    CONSTRAINT pk_wishes_parties PRIMARY KEY (date)
-);
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '"wishes"."parties"'::regclass AND conname = 'parties_date_dates_fk') THEN
+        ALTER TABLE "wishes"."parties" ADD CONSTRAINT "parties_date_dates_fk" FOREIGN KEY ("date") REFERENCES "dates"."dates"("date_id");
+    END IF;
+END $$;
 
--- Tabella: wishes.subscriptions
-CREATE TABLE wishes.subscriptions (
-    date VARCHAR(50) NOT NULL,
-    cigars DECIMAL(15,2),
-    Prime DECIMAL(15,2),
-    Netflix DECIMAL(15,2),
-    iCloud DECIMAL(15,2),
-    ChatGPT DECIMAL(15,2),
-    Nintendo DECIMAL(15,2),
-    Microsoft DECIMAL(15,2),
-    subscriptions_value DECIMAL(15,2)
-,
-    CONSTRAINT pk_wishes_subscriptions PRIMARY KEY (date)
-);
+-- Tabella: wishes.beauty
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '"wishes"."beauty"'::regclass AND conname = 'beauty_date_dates_fk') THEN
+        ALTER TABLE "wishes"."beauty" ADD CONSTRAINT "beauty_date_dates_fk" FOREIGN KEY ("date") REFERENCES "dates"."dates"("date_id");
+    END IF;
+END $$;
 
 -- =====================================
--- FOREIGN KEY CONSTRAINTS
+-- INDICI
 -- =====================================
 
--- Foreign Key: salaries.salaries.date -> dates.dates.date
-ALTER TABLE salaries.salaries
-    ADD CONSTRAINT fk_salaries_salaries_date
-    FOREIGN KEY (date)
-    REFERENCES dates.dates (date)
-    ON DELETE RESTRICT
-    ON UPDATE CASCADE;
-
--- Foreign Key: savings.savings.date -> dates.dates.date
-ALTER TABLE savings.savings
-    ADD CONSTRAINT fk_savings_savings_date
-    FOREIGN KEY (date)
-    REFERENCES dates.dates (date)
-    ON DELETE RESTRICT
-    ON UPDATE CASCADE;
-
--- Foreign Key: needs.financials.date -> dates.dates.date
-ALTER TABLE needs.financials
-    ADD CONSTRAINT fk_needs_financials_date
-    FOREIGN KEY (date)
-    REFERENCES dates.dates (date)
-    ON DELETE RESTRICT
-    ON UPDATE CASCADE;
-
--- Foreign Key: needs.insurances.date -> dates.dates.date
-ALTER TABLE needs.insurances
-    ADD CONSTRAINT fk_needs_insurances_date
-    FOREIGN KEY (date)
-    REFERENCES dates.dates (date)
-    ON DELETE RESTRICT
-    ON UPDATE CASCADE;
-
--- Foreign Key: needs.rents.date -> dates.dates.date
-ALTER TABLE needs.rents
-    ADD CONSTRAINT fk_needs_rents_date
-    FOREIGN KEY (date)
-    REFERENCES dates.dates (date)
-    ON DELETE RESTRICT
-    ON UPDATE CASCADE;
-
--- Foreign Key: needs.loans.date -> dates.dates.date
-ALTER TABLE needs.loans
-    ADD CONSTRAINT fk_needs_loans_date
-    FOREIGN KEY (date)
-    REFERENCES dates.dates (date)
-    ON DELETE RESTRICT
-    ON UPDATE CASCADE;
-
--- Foreign Key: needs.fines.date -> dates.dates.date
-ALTER TABLE needs.fines
-    ADD CONSTRAINT fk_needs_fines_date
-    FOREIGN KEY (date)
-    REFERENCES dates.dates (date)
-    ON DELETE RESTRICT
-    ON UPDATE CASCADE;
-
--- Foreign Key: needs.cdc.date -> dates.dates.date
-ALTER TABLE needs.cdc
-    ADD CONSTRAINT fk_needs_cdc_date
-    FOREIGN KEY (date)
-    REFERENCES dates.dates (date)
-    ON DELETE RESTRICT
-    ON UPDATE CASCADE;
-
--- Foreign Key: needs.installments.date -> dates.dates.date
-ALTER TABLE needs.installments
-    ADD CONSTRAINT fk_needs_installments_date
-    FOREIGN KEY (date)
-    REFERENCES dates.dates (date)
-    ON DELETE RESTRICT
-    ON UPDATE CASCADE;
-
--- Foreign Key: wishes.holidays.date -> dates.dates.date
-ALTER TABLE wishes.holidays
-    ADD CONSTRAINT fk_wishes_holidays_date
-    FOREIGN KEY (date)
-    REFERENCES dates.dates (date)
-    ON DELETE RESTRICT
-    ON UPDATE CASCADE;
-
--- Foreign Key: wishes.subscriptions.date -> dates.dates.date
-ALTER TABLE wishes.subscriptions
-    ADD CONSTRAINT fk_wishes_subscriptions_date
-    FOREIGN KEY (date)
-    REFERENCES dates.dates (date)
-    ON DELETE RESTRICT
-    ON UPDATE CASCADE;
-
--- Foreign Key: wishes.parties.date -> dates.dates.date
-ALTER TABLE wishes.parties
-    ADD CONSTRAINT fk_wishes_parties_date
-    FOREIGN KEY (date)
-    REFERENCES dates.dates (date)
-    ON DELETE RESTRICT
-    ON UPDATE CASCADE;
-
--- Foreign Key: wishes.beauty.date -> dates.dates.date
-ALTER TABLE wishes.beauty
-    ADD CONSTRAINT fk_wishes_beauty_date
-    FOREIGN KEY (date)
-    REFERENCES dates.dates (date)
-    ON DELETE RESTRICT
-    ON UPDATE CASCADE;
-
--- Foreign Key: needs.connections.date -> dates.dates.date
-ALTER TABLE needs.connections
-    ADD CONSTRAINT fk_needs_connections_date
-    FOREIGN KEY (date)
-    REFERENCES dates.dates (date)
-    ON DELETE RESTRICT
-    ON UPDATE CASCADE;
+-- Tabella: salaries.salaries
+CREATE INDEX IF NOT EXISTS "salaries_date_idx" ON "salaries"."salaries" ("date");
+
+-- Tabella: savings.savings
+CREATE INDEX IF NOT EXISTS "savings_date_idx" ON "savings"."savings" ("date");
+
+-- Tabella: savings.investments
+CREATE INDEX IF NOT EXISTS "investments_date_idx" ON "savings"."investments" ("date");
+
+-- Tabella: needs.financials
+CREATE INDEX IF NOT EXISTS "financials_date_idx" ON "needs"."financials" ("date");
+
+-- Tabella: needs.insurances
+CREATE INDEX IF NOT EXISTS "insurances_date_idx" ON "needs"."insurances" ("date");
+
+-- Tabella: needs.rents
+CREATE INDEX IF NOT EXISTS "rents_date_idx" ON "needs"."rents" ("date");
+
+-- Tabella: needs.loans
+CREATE INDEX IF NOT EXISTS "loans_date_idx" ON "needs"."loans" ("date");
+
+-- Tabella: needs.fines
+CREATE INDEX IF NOT EXISTS "fines_date_idx" ON "needs"."fines" ("date");
+
+-- Tabella: needs.connections
+CREATE INDEX IF NOT EXISTS "connections_date_idx" ON "needs"."connections" ("date");
+
+-- Tabella: needs.cdc
+CREATE INDEX IF NOT EXISTS "cdc_date_idx" ON "needs"."cdc" ("date");
+
+-- Tabella: needs.installments
+CREATE INDEX IF NOT EXISTS "installments_date_idx" ON "needs"."installments" ("date");
+
+-- Tabella: wishes.holidays
+CREATE INDEX IF NOT EXISTS "holidays_date_idx" ON "wishes"."holidays" ("date");
+
+-- Tabella: wishes.subscriptions
+CREATE INDEX IF NOT EXISTS "subscriptions_date_idx" ON "wishes"."subscriptions" ("date");
+
+-- Tabella: wishes.parties
+CREATE INDEX IF NOT EXISTS "parties_date_idx" ON "wishes"."parties" ("date");
+
+-- Tabella: wishes.beauty
+CREATE INDEX IF NOT EXISTS "beauty_date_idx" ON "wishes"."beauty" ("date");
 
--- =====================================
--- COMMIT TRANSAZIONE
--- =====================================
 COMMIT;
@@ -0,0 +1,14 @@
+
+-- The composite keys of the spend rollups identify one row each
+
+select 'fct_monthly_spend' as model, month_id::text as period, area, category, count(*) as rows
+from {{ ref('fct_monthly_spend') }}
+group by month_id, area, category
+having count(*) > 1
+
+union all
+
+select 'fct_yearly_spend', year::text, area, category, count(*)
+from {{ ref('fct_yearly_spend') }}
+group by year, area, category
+having count(*) > 1
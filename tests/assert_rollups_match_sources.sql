@@ -0,0 +1,35 @@
+
+-- Incremental refreshes must not drift from a full recomputation: each month's spend
+-- equals the staging total, and each year equals the sum of its months
+
+with staged as (
+    select d.month_id, sum(s.amount) as amount
+    from {{ ref('stg_spend') }} as s
+    join {{ ref('stg_dates') }} as d on d.date_id = s.date_id
+    group by d.month_id
+),
+
+monthly as (
+    select month_id, sum(amount) as amount
+    from {{ ref('fct_monthly_spend') }}
+    group by month_id
+),
+
+yearly_from_months as (
+    select year, sum(total_spend) as total_spend, sum(net_income) as net_income
+    from {{ ref('fct_monthly_cashflow') }}
+    group by year
+)
+
+select 'month ' || coalesce(s.month_id, m.month_id) as period
+from staged as s
+full outer join monthly as m on m.month_id = s.month_id
+where s.amount is distinct from m.amount
+
+union all
+
+select 'year ' || coalesce(f.year, y.year)
+from yearly_from_months as f
+full outer join {{ ref('fct_yearly_cashflow') }} as y on y.year = f.year
+where f.total_spend is distinct from y.total_spend
+   or f.net_income is distinct from y.net_income